@@ -1,9 +1,28 @@
 """AI Assistant Adapters Package"""
 
-from .base import AIAdapter, Message, MessageRole
+from .base import AIAdapter, Message, MessageRole, PromptUsage, collect_usage
+from .health import AdapterHealth, CircuitState, ProviderUnavailableError
+from .cache import CachingAdapter, ResponseCache
+from .failover import AllProvidersFailedError, FailoverAdapter
+from .ollama_gateway import GatewayOverloadedError, OllamaGateway, get_ollama_gateway
+from .registry import AdapterRegistry, adapter_registry
 
 __all__ = [
     "AIAdapter",
     "Message",
     "MessageRole",
-]
\ No newline at end of file
+    "PromptUsage",
+    "collect_usage",
+    "AdapterHealth",
+    "CircuitState",
+    "ProviderUnavailableError",
+    "ResponseCache",
+    "CachingAdapter",
+    "FailoverAdapter",
+    "AllProvidersFailedError",
+    "OllamaGateway",
+    "GatewayOverloadedError",
+    "get_ollama_gateway",
+    "AdapterRegistry",
+    "adapter_registry",
+]
@@ -5,37 +5,124 @@ This module implements the AIAdapter interface for Anthropic Claude models.
 """
 import asyncio
 import anthropic
-from typing import List, Dict, AsyncGenerator
-from .base import AIAdapter
+from typing import List, Dict, Any, AsyncGenerator
+from .base import AIAdapter, PromptUsage, report_usage
+from .health import AdapterHealth
 import logging
 import os
 from anthropic import AsyncAnthropic
 
 logger = logging.getLogger(__name__)
 
+# Anthropic caches the prompt up to and including a block marked with this
+CACHE_CONTROL = {"type": "ephemeral"}
+
 
 class AnthropicAdapter(AIAdapter):
     """Adapter for Anthropic Claude models."""
 
-    def __init__(self, api_key: str = None, model: str = "claude-3-5-sonnet-20241022"):
+    def __init__(
+        self,
+        api_key: str = None,
+        model: str = "claude-3-5-sonnet-20241022",
+        prompt_cache: bool = True
+    ):
         """
         Initialize the Anthropic adapter.
 
         Args:
             api_key: Anthropic API key (defaults to ANTHROPIC_API_KEY environment variable)
             model: The model name to use (default: claude-3-5-sonnet-20241022)
+            prompt_cache: Mark stable prompt prefixes for Anthropic prompt caching
         """
         self.api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
         if not self.api_key:
             raise ValueError("Anthropic API key is required. Set ANTHROPIC_API_KEY environment variable.")
 
         self.model = model
+        self.prompt_cache = prompt_cache
         self.client = AsyncAnthropic(api_key=self.api_key)
+        self.health = AdapterHealth(f"anthropic:{self.model}")
+
+    def _build_params(self, messages: List[Dict[str, str]], **kwargs) -> Dict[str, Any]:
+        """
+        Convert messages to Anthropic request parameters.
+
+        System messages (the system prompt, then e.g. a compacted summary) become
+        system blocks. With prompt caching on, a cache breakpoint is placed after
+        the system blocks and after the last message before the newest turn, so
+        everything but the new user message is read from the cache next time.
+
+        Args:
+            messages: List of messages in the format {'role': str, 'content': str}
+            **kwargs: Additional parameters like temperature, max_tokens, etc.
+
+        Returns:
+            Keyword arguments for client.messages.create / stream
+        """
+        # Anthropic takes system content separately from the conversation
+        system_blocks = []
+        processed_messages = []
+
+        for msg in messages:
+            if msg.get("role") == "system":
+                system_blocks.append({"type": "text", "text": msg.get("content", "")})
+            else:
+                processed_messages.append({
+                    "role": msg.get("role"),
+                    "content": msg.get("content")
+                })
+
+        if self.prompt_cache:
+            if system_blocks:
+                system_blocks[-1]["cache_control"] = CACHE_CONTROL
+            if len(processed_messages) > 1:
+                prefix_end = processed_messages[-2]
+                prefix_end["content"] = [
+                    {"type": "text", "text": prefix_end["content"], "cache_control": CACHE_CONTROL}
+                ]
+
+        # Prepare the parameters for the API call
+        params = {
+            "model": self.model,
+            "messages": processed_messages,
+            "max_tokens": kwargs.get("max_tokens", 1024),
+        }
+
+        # Add system message if present
+        if system_blocks:
+            if self.prompt_cache:
+                params["system"] = system_blocks
+            else:
+                params["system"] = "\n\n".join(block["text"] for block in system_blocks)
+
+        # Add other parameters from kwargs
+        if "temperature" in kwargs:
+            params["temperature"] = kwargs["temperature"]
+        if "top_p" in kwargs:
+            params["top_p"] = kwargs["top_p"]
+        return params
+
+    def _report_usage(self, usage) -> None:
+        """Report the token counts of a response, including prompt cache reads and writes."""
+        if usage is None:
+            return
+        report_usage(PromptUsage(
+            provider="anthropic",
+            model=self.model,
+            input_tokens=usage.input_tokens or 0,
+            output_tokens=usage.output_tokens or 0,
+            cache_read_tokens=getattr(usage, "cache_read_input_tokens", None) or 0,
+            cache_write_tokens=getattr(usage, "cache_creation_input_tokens", None) or 0
+        ))
 
     async def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
         """
         Send messages to the Anthropic API and get a response.
 
+        Token usage, including prompt cache reads and writes, is reported to
+        the enclosing collect_usage block.
+
         Args:
             messages: List of messages in the format {'role': str, 'content': str}
             **kwargs: Additional parameters like temperature, max_tokens, etc.
@@ -44,43 +131,13 @@ class AnthropicAdapter(AIAdapter):
             The AI model's response as a string
         """
         try:
-            # Anthropic requires the first message to be from the user
-            # If the first message is from the system, we need to convert it appropriately
-            system_message = ""
-            processed_messages = []
-
-            for msg in messages:
-                if msg.get("role") == "system":
-                    if not system_message:
-                        system_message = msg.get("content", "")
-                    else:
-                        # If there are multiple system messages, append them
-                        system_message += "\n\n" + msg.get("content", "")
-                else:
-                    processed_messages.append({
-                        "role": msg.get("role"),
-                        "content": msg.get("content")
-                    })
-
-            # Prepare the parameters for the API call
-            params = {
-                "model": self.model,
-                "messages": processed_messages,
-                "max_tokens": kwargs.get("max_tokens", 1024),
-            }
-
-            # Add system message if present
-            if system_message:
-                params["system"] = system_message
-
-            # Add other parameters from kwargs
-            if "temperature" in kwargs:
-                params["temperature"] = kwargs["temperature"]
-            if "top_p" in kwargs:
-                params["top_p"] = kwargs["top_p"]
+            params = self._build_params(messages, **kwargs)
 
             # Make the API call
-            response = await self.client.messages.create(**params)
+            async with self.health.guard():
+                response = await self.client.messages.create(**params)
+
+            self._report_usage(getattr(response, "usage", None))
 
             # Return the content of the response
             return "".join([block.text for block in response.content if block.type == "text"])
@@ -97,6 +154,8 @@ class AnthropicAdapter(AIAdapter):
         """
         Stream response from the Anthropic API.
 
+        Token usage is reported once the stream has finished.
+
         Args:
             messages: List of messages in the format {'role': str, 'content': str}
             **kwargs: Additional parameters like temperature, max_tokens, etc.
@@ -105,43 +164,16 @@ class AnthropicAdapter(AIAdapter):
             Chunks of the AI model's response
         """
         try:
-            # Process messages the same way as in chat method
-            system_message = ""
-            processed_messages = []
-
-            for msg in messages:
-                if msg.get("role") == "system":
-                    if not system_message:
-                        system_message = msg.get("content", "")
-                    else:
-                        system_message += "\n\n" + msg.get("content", "")
-                else:
-                    processed_messages.append({
-                        "role": msg.get("role"),
-                        "content": msg.get("content")
-                    })
-
-            # Prepare the parameters for the API call
-            params = {
-                "model": self.model,
-                "messages": processed_messages,
-                "max_tokens": kwargs.get("max_tokens", 1024),
-            }
-
-            # Add system message if present
-            if system_message:
-                params["system"] = system_message
-
-            # Add other parameters from kwargs
-            if "temperature" in kwargs:
-                params["temperature"] = kwargs["temperature"]
-            if "top_p" in kwargs:
-                params["top_p"] = kwargs["top_p"]
+            params = self._build_params(messages, **kwargs)
 
             # Make the streaming API call
-            async with self.client.messages.stream(**params) as stream:
-                async for text_chunk in stream.text_stream:
-                    yield text_chunk
+            async with self.health.guard():
+                async with self.client.messages.stream(**params) as stream:
+                    async for text_chunk in stream.text_stream:
+                        yield text_chunk
+                    final_message = await stream.get_final_message()
+
+            self._report_usage(getattr(final_message, "usage", None))
 
         except Exception as e:
             logger.error(f"Error streaming from Anthropic API: {str(e)}")
@@ -149,26 +181,20 @@ class AnthropicAdapter(AIAdapter):
 
     async def is_available(self) -> bool:
         """
-        Check if the Anthropic service is available by attempting a minimal API call.
+        Check if the Anthropic service is available.
+
+        Uses the free model list endpoint rather than a completion, and caches
+        the result; returns False immediately while the circuit is open.
 
         Returns:
             True if the service is reachable and functional, False otherwise
         """
-        try:
-            # Attempt a minimal API call to validate the API key and connectivity
-            # Using a minimal request to reduce cost and time
-            response = await self.client.messages.create(
-                model=self.model,
-                max_tokens=10,
-                messages=[{"role": "user", "content": "Hi"}],
-                temperature=0
-            )
+        return await self.health.probe(self._probe)
 
-            # If we got a response, the service is available
-            return True
-
-        except Exception:
-            return False
+    async def _probe(self) -> bool:
+        """List models to validate the API key and connectivity."""
+        await self.client.models.list(limit=1)
+        return True
 
     def is_configured(self) -> bool:
         """
@@ -177,4 +203,8 @@ class AnthropicAdapter(AIAdapter):
         Returns:
             True if the adapter has necessary configuration, False otherwise
         """
-        return bool(self.api_key and self.model and self.api_key.startswith("sk-ant-"))
\ No newline at end of file
+        return bool(self.api_key and self.model and self.api_key.startswith("sk-ant-"))
+
+    async def aclose(self) -> None:
+        """Close the underlying HTTP client and its pooled connections."""
+        await self.client.close()
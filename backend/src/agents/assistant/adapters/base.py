@@ -4,7 +4,9 @@ Base interface for AI adapters.
 This module defines the unified interface that all AI model adapters must implement.
 """
 from abc import ABC, abstractmethod
-from typing import Protocol, List, Dict, AsyncGenerator, Union
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Protocol, List, Dict, AsyncGenerator, Iterator, Optional, Union
 from dataclasses import dataclass
 from enum import Enum
 
@@ -23,6 +25,61 @@ class Message:
     content: str
 
 
+@dataclass
+class PromptUsage:
+    """
+    Token usage reported by a provider for one request.
+
+    Attributes:
+        provider: Provider name (e.g. 'anthropic', 'openai')
+        model: The model that served the request
+        input_tokens: Uncached prompt tokens
+        output_tokens: Generated tokens
+        cache_read_tokens: Prompt tokens served from the provider's prompt cache
+        cache_write_tokens: Prompt tokens written to the provider's prompt cache
+    """
+    provider: str
+    model: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+
+
+_usage_sink: ContextVar[Optional[List[PromptUsage]]] = ContextVar("adapter_usage_sink", default=None)
+
+
+@contextmanager
+def collect_usage() -> Iterator[List[PromptUsage]]:
+    """
+    Collect the PromptUsage reported by adapter calls made inside the block.
+
+    Works through wrapping adapters (failover, caching) and concurrent requests,
+    since each caller gets its own list. Cached responses report nothing.
+
+    Yields:
+        A list that receives one PromptUsage per completed provider request
+    """
+    sink: List[PromptUsage] = []
+    token = _usage_sink.set(sink)
+    try:
+        yield sink
+    finally:
+        _usage_sink.reset(token)
+
+
+def report_usage(usage: PromptUsage) -> None:
+    """
+    Report a provider's usage to the enclosing collect_usage block, if any.
+
+    Args:
+        usage: Usage of one completed request
+    """
+    sink = _usage_sink.get()
+    if sink is not None:
+        sink.append(usage)
+
+
 class AIAdapter(Protocol):
     """Unified interface for AI model adapters."""
 
@@ -72,4 +129,10 @@ class AIAdapter(Protocol):
         Returns:
             True if the adapter has necessary configuration, False otherwise
         """
-        ...
\ No newline at end of file
+        ...
+
+    async def aclose(self) -> None:
+        """
+        Release network resources (pooled HTTP clients) held by the adapter.
+        """
+        ...
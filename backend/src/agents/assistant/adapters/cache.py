@@ -0,0 +1,282 @@
+"""
+Response cache for AI adapters.
+
+This module provides an opt-in exact-match cache for deterministic requests
+(temperature=0). Entries are keyed by provider, model, messages and
+sampling parameters, kept in an in-memory LRU with TTLs and optionally persisted
+to SQLite so they survive restarts.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+
+from .base import AIAdapter
+
+logger = logging.getLogger(__name__)
+
+# Parameters that change the output and therefore belong in the cache key
+SAMPLING_PARAMS = ("temperature", "top_p", "max_tokens", "frequency_penalty", "presence_penalty", "seed")
+
+
+def is_deterministic(params: Dict[str, Any]) -> bool:
+    """
+    Check whether a request's sampling parameters make its output reproducible.
+
+    Args:
+        params: The keyword arguments passed to the adapter
+
+    Returns:
+        True only if temperature is explicitly 0
+    """
+    return params.get("temperature") == 0
+
+
+def make_cache_key(provider: str, model: str, messages: List[Dict[str, str]], params: Dict[str, Any]) -> str:
+    """
+    Build the cache key for a request.
+
+    Message content is only stripped of leading and trailing whitespace;
+    inner whitespace is significant (e.g. indentation in code or YAML).
+
+    Args:
+        provider: Provider name, e.g. 'openai'
+        model: Model name
+        messages: List of messages in the format {'role': str, 'content': str}
+        params: The keyword arguments passed to the adapter
+
+    Returns:
+        A hex SHA-256 digest
+    """
+    normalized = {
+        "provider": provider,
+        "model": model,
+        "messages": [
+            [str(msg.get("role", "")).lower(), str(msg.get("content", "")).strip()]
+            for msg in messages
+        ],
+        "params": {name: params[name] for name in SAMPLING_PARAMS if name in params},
+    }
+    encoded = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    LRU cache of AI responses with TTLs and optional SQLite persistence.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0, path: Optional[str] = None):
+        """
+        Initialize the response cache.
+
+        Args:
+            max_entries: Maximum number of responses kept in memory
+            ttl: Seconds a cached response stays valid
+            path: Optional SQLite file used to persist entries
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+
+        if self.path:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS response_cache "
+                    "(key TEXT PRIMARY KEY, response TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+
+    async def get(self, key: str) -> Optional[str]:
+        """
+        Look up a response, counting the hit or miss.
+
+        Args:
+            key: Key built by make_cache_key
+
+        Returns:
+            The cached response or None
+        """
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            del self._entries[key]
+
+        if self.path:
+            entry = await asyncio.to_thread(self._load, key, now)
+            if entry is not None:
+                self._remember(key, *entry)
+                self.hits += 1
+                return entry[0]
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, response: str) -> None:
+        """
+        Store a response.
+
+        Args:
+            key: Key built by make_cache_key
+            response: The AI model's response
+        """
+        expires_at = time.time() + self.ttl
+        self._remember(key, response, expires_at)
+        if self.path:
+            await asyncio.to_thread(self._store, key, response, expires_at)
+
+    def record_bypass(self) -> None:
+        """Count a request that skipped the cache (non-deterministic or opted out)."""
+        self.bypasses += 1
+
+    def clear(self) -> None:
+        """Drop all in-memory entries (persisted entries are kept)."""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit-rate metrics."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypasses": self.bypasses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "size": len(self._entries),
+            "persistent": bool(self.path),
+        }
+
+    def _remember(self, key: str, response: str, expires_at: float) -> None:
+        self._entries[key] = (response, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path)
+
+    def _load(self, key: str, now: float) -> Optional[Tuple[str, float]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT response, expires_at FROM response_cache WHERE key = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def _store(self, key: str, response: str, expires_at: float) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, response, expires_at) VALUES (?, ?, ?)",
+                (key, response, expires_at)
+            )
+            conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (time.time(),))
+
+
+class CachingAdapter(AIAdapter):
+    """
+    Adapter wrapper that serves deterministic requests from a ResponseCache.
+
+    Requests without temperature=0, or called with cache=False, bypass the cache.
+    Other attributes (model, health, ...) are delegated to the wrapped adapter.
+    """
+
+    def __init__(self, adapter: AIAdapter, cache: ResponseCache, provider: str):
+        """
+        Initialize the caching adapter.
+
+        Args:
+            adapter: The adapter to wrap
+            cache: The cache to use (may be shared between adapters)
+            provider: Provider name used in the cache key
+        """
+        self.adapter = adapter
+        self.cache = cache
+        self.provider = provider
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "adapter":
+            raise AttributeError(name)
+        return getattr(self.adapter, name)
+
+    def _key_for(self, messages: List[Dict[str, str]], kwargs: Dict[str, Any]) -> Optional[str]:
+        use_cache = kwargs.pop("cache", True)
+        if not use_cache or not is_deterministic(kwargs):
+            self.cache.record_bypass()
+            return None
+        return make_cache_key(self.provider, getattr(self.adapter, "model", ""), messages, kwargs)
+
+    async def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """
+        Return a cached response if available, otherwise call the wrapped adapter.
+
+        Args:
+            messages: List of messages in the format {'role': str, 'content': str}
+            **kwargs: Additional parameters; cache=False skips the cache
+
+        Returns:
+            The AI model's response as a string
+        """
+        key = self._key_for(messages, kwargs)
+        if key is not None:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        response = await self.adapter.chat(messages, **kwargs)
+        if key is not None:
+            await self.cache.set(key, response)
+        return response
+
+    async def stream(
+        self,
+        messages: List[Dict[str, str]],
+        **kwargs
+    ) -> AsyncGenerator[str, None]:
+        """
+        Stream a cached response in one chunk, or stream and cache the full response.
+
+        Args:
+            messages: List of messages in the format {'role': str, 'content': str}
+            **kwargs: Additional parameters; cache=False skips the cache
+
+        Yields:
+            Chunks of the AI model's response
+        """
+        key = self._key_for(messages, kwargs)
+        if key is not None:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        chunks = []
+        async for chunk in self.adapter.stream(messages, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+
+        # Only complete streams are cached
+        if key is not None:
+            await self.cache.set(key, "".join(chunks))
+
+    async def is_available(self) -> bool:
+        return await self.adapter.is_available()
+
+    def is_configured(self) -> bool:
+        return self.adapter.is_configured()
+
+    async def aclose(self) -> None:
+        close = getattr(self.adapter, "aclose", None)
+        if close is not None:
+            await close()
@@ -0,0 +1,266 @@
+"""
+Failover AI Adapter.
+
+This module implements a composite AIAdapter over an ordered list of adapters.
+Calls go to the first adapter and fail over to the next one on error. With
+hedging enabled, the next adapter is also fired if no token has arrived after
+hedge_after seconds, and whichever answers first wins.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncGenerator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from .base import AIAdapter
+from .health import ProviderUnavailableError
+
+logger = logging.getLogger(__name__)
+
+
+class AllProvidersFailedError(ProviderUnavailableError):
+    """Raised when every adapter of a FailoverAdapter failed."""
+
+    def __init__(self, errors: List[Tuple[str, Exception]]):
+        self.errors = errors
+        details = "; ".join(f"{name}: {error}" for name, error in errors)
+        super().__init__(f"All AI providers failed ({details})")
+
+
+@dataclass
+class ProviderStats:
+    """Latency and outcome counters for one provider of a FailoverAdapter."""
+    calls: int = 0
+    failures: int = 0
+    hedged: int = 0
+    wins: int = 0
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=200))
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Return the given percentile of recent latencies in seconds."""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "hedged": self.hedged,
+            "wins": self.wins,
+            "p50_ms": _to_ms(self.percentile(50)),
+            "p95_ms": _to_ms(self.percentile(95)),
+            "p99_ms": _to_ms(self.percentile(99)),
+        }
+
+
+def _to_ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+def _adapter_name(adapter: AIAdapter) -> str:
+    health = getattr(adapter, "health", None)
+    if health is not None:
+        return health.name
+    return f"{type(adapter).__name__}:{getattr(adapter, 'model', 'unknown')}"
+
+
+class FailoverAdapter(AIAdapter):
+    """Composite adapter with ordered failover and optional hedged requests."""
+
+    def __init__(
+        self,
+        adapters: List[AIAdapter],
+        hedge_after: Optional[float] = None,
+        max_in_flight: int = 2
+    ):
+        """
+        Initialize the failover adapter.
+
+        Args:
+            adapters: Adapters in order of preference
+            hedge_after: Seconds to wait for a first token before also firing the
+                next adapter; None disables hedging
+            max_in_flight: Maximum number of adapters running concurrently when hedging
+        """
+        if not adapters:
+            raise ValueError("FailoverAdapter requires at least one adapter")
+
+        self.adapters = list(adapters)
+        self.hedge_after = hedge_after
+        self.max_in_flight = max(1, max_in_flight)
+        self.model = getattr(self.adapters[0], "model", "unknown")
+        self._stats: Dict[str, ProviderStats] = {
+            _adapter_name(adapter): ProviderStats() for adapter in self.adapters
+        }
+
+    async def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """
+        Send messages to the first adapter that answers.
+
+        Args:
+            messages: List of messages in the format {'role': str, 'content': str}
+            **kwargs: Additional parameters passed to every adapter
+
+        Returns:
+            The AI model's response as a string
+
+        Raises:
+            AllProvidersFailedError: If every adapter failed
+        """
+        _, response = await self._race(lambda adapter: adapter.chat(messages, **kwargs))
+        return response
+
+    async def stream(
+        self,
+        messages: List[Dict[str, str]],
+        **kwargs
+    ) -> AsyncGenerator[str, None]:
+        """
+        Stream from the first adapter that produces a token.
+
+        Failover and hedging only apply until the first token; once output has
+        been yielded the stream is bound to that adapter.
+
+        Args:
+            messages: List of messages in the format {'role': str, 'content': str}
+            **kwargs: Additional parameters passed to every adapter
+
+        Yields:
+            Chunks of the AI model's response
+        """
+        streams: Dict[int, AsyncGenerator[str, None]] = {}
+
+        async def first_chunk(adapter: AIAdapter) -> Tuple[bool, Optional[str]]:
+            generator = adapter.stream(messages, **kwargs)
+            streams[id(adapter)] = generator
+            try:
+                return True, await generator.__anext__()
+            except StopAsyncIteration:
+                return False, None
+
+        winner = None
+        try:
+            winner, (has_chunk, chunk) = await self._race(first_chunk)
+        finally:
+            # Close the generators of every adapter that lost the race
+            for key, generator in streams.items():
+                if winner is None or key != id(winner):
+                    await generator.aclose()
+
+        generator = streams[id(winner)]
+        if not has_chunk:
+            return
+        try:
+            yield chunk
+            async for chunk in generator:
+                yield chunk
+        finally:
+            await generator.aclose()
+
+    async def _race(self, attempt: Callable[[AIAdapter], Awaitable[Any]]) -> Tuple[AIAdapter, Any]:
+        """
+        Run attempt against the adapters in order until one succeeds.
+
+        Args:
+            attempt: Coroutine function called with an adapter
+
+        Returns:
+            The winning adapter and the result of its attempt
+        """
+        candidates = iter(self.adapters)
+        pending: Dict[asyncio.Task, Tuple[AIAdapter, float]] = {}
+        errors: List[Tuple[str, Exception]] = []
+
+        def launch(hedge: bool = False) -> bool:
+            adapter = next(candidates, None)
+            if adapter is None:
+                return False
+            stats = self._stats[_adapter_name(adapter)]
+            stats.calls += 1
+            if hedge:
+                stats.hedged += 1
+                logger.info(f"Hedging AI request to {_adapter_name(adapter)}")
+            pending[asyncio.ensure_future(attempt(adapter))] = (adapter, time.monotonic())
+            return True
+
+        launch()
+        exhausted = False
+        try:
+            while pending:
+                can_hedge = (
+                    self.hedge_after is not None
+                    and not exhausted
+                    and len(pending) < self.max_in_flight
+                )
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=self.hedge_after if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not done:
+                    exhausted = not launch(hedge=True)
+                    continue
+
+                for task in done:
+                    adapter, started = pending.pop(task)
+                    name = _adapter_name(adapter)
+                    stats = self._stats[name]
+                    error = task.exception()
+                    if error is None:
+                        stats.latencies.append(time.monotonic() - started)
+                        stats.wins += 1
+                        return adapter, task.result()
+
+                    stats.failures += 1
+                    errors.append((name, error))
+                    if not isinstance(error, ProviderUnavailableError):
+                        logger.warning(f"AI provider {name} failed, failing over: {str(error)}")
+
+                # Fail over right away instead of waiting for the hedge timer
+                hedging = self.hedge_after is not None
+                if not exhausted and (not pending or (hedging and len(pending) < self.max_in_flight)):
+                    exhausted = not launch()
+
+            raise AllProvidersFailedError(errors)
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    async def is_available(self) -> bool:
+        """
+        Check if any of the adapters is available.
+
+        Returns:
+            True if at least one adapter is reachable, False otherwise
+        """
+        for adapter in self.adapters:
+            if await adapter.is_available():
+                return True
+        return False
+
+    def is_configured(self) -> bool:
+        """
+        Check if any of the adapters is configured.
+
+        Returns:
+            True if at least one adapter has necessary configuration, False otherwise
+        """
+        return any(adapter.is_configured() for adapter in self.adapters)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return per-provider call counts and latency percentiles."""
+        return {name: stats.to_dict() for name, stats in self._stats.items()}
+
+    async def aclose(self) -> None:
+        """Close all wrapped adapters."""
+        for adapter in self.adapters:
+            close = getattr(adapter, "aclose", None)
+            if close is not None:
+                await close()
@@ -0,0 +1,172 @@
+"""
+Health tracking for AI adapters.
+
+This module implements a per-adapter circuit breaker (closed/open/half-open) fed
+by the outcomes of real calls, plus TTL-cached availability probes. While a
+provider's circuit is open, calls fail fast instead of waiting out a timeout.
+"""
+import logging
+import time
+from contextlib import asynccontextmanager
+from enum import Enum
+from typing import AsyncIterator, Awaitable, Callable, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(str, Enum):
+    """States of an adapter's circuit breaker."""
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class ProviderUnavailableError(Exception):
+    """Raised when a call is rejected because the provider's circuit is open."""
+
+
+class AdapterHealth:
+    """
+    Circuit breaker and probe cache for a single adapter.
+
+    After failure_threshold consecutive failures the circuit opens and calls are
+    rejected. Once recovery_timeout has elapsed a single trial call is let
+    through (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        recovery_timeout: float = 30.0,
+        probe_ttl: float = 30.0
+    ):
+        """
+        Initialize the health tracker.
+
+        Args:
+            name: Name used in logs and errors, e.g. 'openai:gpt-4o'
+            failure_threshold: Consecutive failures before the circuit opens
+            recovery_timeout: Seconds the circuit stays open before a trial call
+            probe_ttl: Seconds an availability probe result is cached
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.probe_ttl = probe_ttl
+
+        self.state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._probe_result: Optional[bool] = None
+        self._probe_at = 0.0
+
+    def allow_request(self) -> bool:
+        """
+        Check whether a call may go through, moving open -> half-open when due.
+
+        Returns:
+            True if the call may proceed, False if it should fail fast
+        """
+        if self.state == CircuitState.CLOSED:
+            return True
+
+        if self.state == CircuitState.OPEN:
+            if time.monotonic() - self._opened_at < self.recovery_timeout:
+                return False
+            self.state = CircuitState.HALF_OPEN
+            self._trial_in_flight = False
+
+        # Half-open: only one trial call at a time
+        if self._trial_in_flight:
+            return False
+        self._trial_in_flight = True
+        return True
+
+    def record_success(self) -> None:
+        """Record a successful call or probe and close the circuit."""
+        if self.state != CircuitState.CLOSED:
+            logger.info(f"Circuit for {self.name} closed")
+        self.state = CircuitState.CLOSED
+        self._failures = 0
+        self._trial_in_flight = False
+        self._probe_result = True
+        self._probe_at = time.monotonic()
+
+    def record_failure(self) -> None:
+        """Record a failed call or probe, opening the circuit if needed."""
+        self._trial_in_flight = False
+        self._failures += 1
+
+        if self.state == CircuitState.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self.state != CircuitState.OPEN:
+                logger.warning(f"Circuit for {self.name} opened after {self._failures} failures")
+            self.state = CircuitState.OPEN
+            self._opened_at = time.monotonic()
+            self._probe_result = False
+            self._probe_at = self._opened_at
+
+    @asynccontextmanager
+    async def guard(self) -> AsyncIterator[None]:
+        """
+        Wrap a call to the provider, failing fast when the circuit is open.
+
+        Raises:
+            ProviderUnavailableError: If the circuit does not allow the call
+        """
+        if not self.allow_request():
+            raise ProviderUnavailableError(f"AI provider {self.name} is unavailable")
+        try:
+            yield
+        except ProviderUnavailableError:
+            # Rejected locally (e.g. an overloaded gateway): no verdict on the provider
+            self._trial_in_flight = False
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:
+            # Cancelled or closed early: no verdict on the provider
+            self._trial_in_flight = False
+            raise
+        else:
+            self.record_success()
+
+    async def probe(self, check: Callable[[], Awaitable[bool]]) -> bool:
+        """
+        Run a cheap availability check, caching its result for probe_ttl seconds.
+
+        Args:
+            check: Coroutine function returning True if the provider responds
+
+        Returns:
+            True if the provider is considered available
+        """
+        now = time.monotonic()
+        if self.state == CircuitState.OPEN and now - self._opened_at < self.recovery_timeout:
+            return False
+        if self._probe_result is not None and now - self._probe_at < self.probe_ttl:
+            return self._probe_result
+
+        try:
+            available = await check()
+        except Exception as e:
+            logger.debug(f"Availability probe for {self.name} failed: {str(e)}")
+            available = False
+
+        if available:
+            self.record_success()
+        else:
+            self.record_failure()
+        self._probe_result = available
+        self._probe_at = time.monotonic()
+        return available
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the current state for health endpoints."""
+        return {
+            "circuit": self.state.value,
+            "consecutive_failures": self._failures,
+            "last_probe": self._probe_result,
+        }
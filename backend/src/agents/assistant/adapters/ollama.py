@@ -1,12 +1,15 @@
 """
 Ollama AI Adapter.
 
-This module implements the AIAdapter interface for Ollama models.
+This module implements the AIAdapter interface for Ollama models. Requests go
+through the shared OllamaGateway for the server, which owns the connection pool,
+timeouts, keep_alive and the concurrency limit.
 """
 import asyncio
-import aiohttp
-from typing import List, Dict, AsyncGenerator
+from typing import List, Dict, Any, AsyncGenerator
 from .base import AIAdapter
+from .health import AdapterHealth
+from .ollama_gateway import OllamaGateway, get_ollama_gateway
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,50 +18,33 @@ logger = logging.getLogger(__name__)
 class OllamaAdapter(AIAdapter):
     """Adapter for Ollama AI models."""
 
-    def __init__(self, base_url: str = "http://localhost:11434", model: str = "deepseek-r1"):
+    def __init__(
+        self,
+        base_url: str = "http://localhost:11434",
+        model: str = "deepseek-r1",
+        gateway: OllamaGateway = None
+    ):
         """
         Initialize the Ollama adapter.
 
         Args:
             base_url: The base URL for the Ollama API server
             model: The model name to use (default: deepseek-r1)
+            gateway: Gateway to send requests through (defaults to the shared one for base_url)
         """
         self.base_url = base_url.rstrip('/')
         self.model = model
-        self._session = None
-        self._own_session = True  # Track if we own the session
-
-    async def _get_session(self) -> aiohttp.ClientSession:
-        """Get or create an aiohttp client session."""
-        if self._session is None or self._session.closed:
-            timeout = aiohttp.ClientTimeout(total=30)  # 30 second timeout
-            self._session = aiohttp.ClientSession(timeout=timeout)
-        return self._session
-
-    async def _close_session(self):
-        """Close the aiohttp client session if we own it."""
-        if self._session and self._own_session and not self._session.closed:
-            await self._session.close()
-            self._session = None
+        self.gateway = gateway or get_ollama_gateway(self.base_url)
+        self.health = AdapterHealth(f"ollama:{self.model}")
 
-    async def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
-        """
-        Send messages to the Ollama API and get a response.
+    async def aclose(self) -> None:
+        """Release adapter resources; the shared gateway stays open for other users."""
 
-        Args:
-            messages: List of messages in the format {'role': str, 'content': str}
-            **kwargs: Additional parameters like temperature, max_tokens, etc.
-
-        Returns:
-            The AI model's response as a string
-        """
-        session = await self._get_session()
-
-        # Prepare the payload for Ollama API
+    def _build_payload(self, messages: List[Dict[str, str]], **kwargs) -> Dict[str, Any]:
+        """Build an /api/chat request body from messages and generation options."""
         payload = {
             "model": self.model,
             "messages": messages,
-            "stream": False,
             "options": {}
         }
 
@@ -69,13 +55,24 @@ class OllamaAdapter(AIAdapter):
             payload["options"]["num_predict"] = kwargs["max_tokens"]
         if "top_p" in kwargs:
             payload["options"]["top_p"] = kwargs["top_p"]
+        return payload
 
-        try:
-            async with session.post(f"{self.base_url}/api/chat", json=payload) as response:
-                if response.status != 200:
-                    raise Exception(f"Ollama API request failed with status {response.status}")
+    async def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """
+        Send messages to the Ollama API and get a response.
 
-                result = await response.json()
+        Args:
+            messages: List of messages in the format {'role': str, 'content': str}
+            **kwargs: Additional parameters like temperature, max_tokens, etc.
+
+        Returns:
+            The AI model's response as a string
+        """
+        payload = self._build_payload(messages, **kwargs)
+
+        try:
+            async with self.health.guard():
+                result = await self.gateway.chat(payload)
                 return result.get("message", {}).get("content", "")
         except asyncio.TimeoutError:
             logger.error("Ollama API request timed out")
@@ -99,41 +96,14 @@ class OllamaAdapter(AIAdapter):
         Yields:
             Chunks of the AI model's response
         """
-        import json  # Moved import to top level
-        session = await self._get_session()
-
-        # Prepare the payload for Ollama API
-        payload = {
-            "model": self.model,
-            "messages": messages,
-            "stream": True,
-            "options": {}
-        }
-
-        # Add any additional parameters from kwargs
-        if "temperature" in kwargs:
-            payload["options"]["temperature"] = kwargs["temperature"]
-        if "max_tokens" in kwargs:
-            payload["options"]["num_predict"] = kwargs["max_tokens"]
-        if "top_p" in kwargs:
-            payload["options"]["top_p"] = kwargs["top_p"]
+        payload = self._build_payload(messages, **kwargs)
 
         try:
-            async with session.post(f"{self.base_url}/api/chat", json=payload) as response:
-                if response.status != 200:
-                    raise Exception(f"Ollama API request failed with status {response.status}")
-
-                async for line in response.content:
-                    if line.strip():
-                        try:
-                            chunk_data = json.loads(line.decode('utf-8'))
-                            if chunk_data.get("done", False):
-                                break
-                            message_content = chunk_data.get("message", {}).get("content", "")
-                            if message_content:
-                                yield message_content
-                        except json.JSONDecodeError:
-                            continue
+            async with self.health.guard():
+                async for chunk_data in self.gateway.stream_chat(payload):
+                    message_content = chunk_data.get("message", {}).get("content", "")
+                    if message_content:
+                        yield message_content
         except asyncio.TimeoutError:
             logger.error("Ollama API streaming request timed out")
             raise Exception("Streaming request to Ollama API timed out")
@@ -145,15 +115,13 @@ class OllamaAdapter(AIAdapter):
         """
         Check if the Ollama service is available.
 
+        The /api/tags probe result is cached; returns False immediately while
+        the circuit is open.
+
         Returns:
             True if the service is reachable and functional, False otherwise
         """
-        try:
-            session = await self._get_session()
-            async with session.get(f"{self.base_url}/api/tags") as response:
-                return response.status == 200
-        except Exception:
-            return False
+        return await self.health.probe(self.gateway.is_up)
 
     def is_configured(self) -> bool:
         """
@@ -166,12 +134,8 @@ class OllamaAdapter(AIAdapter):
 
     async def __aenter__(self):
         """Async context manager entry."""
-        self._session = await self._get_session()
-        self._own_session = True
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async context manager exit."""
-        if self._session and self._own_session and not self._session.closed:
-            await self._session.close()
-            self._session = None
\ No newline at end of file
+        await self.aclose()
@@ -0,0 +1,363 @@
+"""
+Shared gateway to a local Ollama server.
+
+Every component talking to the same Ollama server (assistant adapters, the news
+summarizer) goes through one OllamaGateway, which:
+
+- reuses a pooled HTTP session with separate connect and read timeouts,
+- pins models in memory by sending keep_alive with every request,
+- caps concurrent generations to what the box can serve, and
+- applies backpressure: requests beyond the bounded wait queue are rejected
+  with GatewayOverloadedError instead of piling up.
+
+The gateway is process-wide and is used both from the application's event loop
+and from the sync conversation manager's background loop. aiohttp sessions are
+bound to the loop that created them, so there is one session per running loop;
+the generation limit and wait queue are shared by all loops.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, AsyncIterator, Deque, Dict, Optional, Tuple
+
+import aiohttp
+
+from ....core.config import settings
+from .health import ProviderUnavailableError
+
+logger = logging.getLogger(__name__)
+
+
+class GatewayOverloadedError(ProviderUnavailableError):
+    """Raised when the gateway's wait queue is full or the wait timed out."""
+
+
+class _SlotLimiter:
+    """
+    Counting semaphore that can be shared by several event loops.
+
+    asyncio.Semaphore binds to the first loop that waits on it, so waiters
+    here park on a future of their own loop and are woken with
+    call_soon_threadsafe. Slots are handed to waiters in FIFO order.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def locked(self) -> bool:
+        return self.active >= self.limit
+
+    async def acquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.active < self.limit and not self._waiters:
+                self.active += 1
+                return
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter[1]
+        except BaseException:
+            with self._lock:
+                try:
+                    self._waiters.remove(waiter)
+                    granted = False
+                except ValueError:
+                    granted = True  # release() already handed us the slot
+            if granted:
+                self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            while self._waiters:
+                loop, future = self._waiters.popleft()
+                if loop.is_closed():
+                    continue
+                # Hand the slot over directly; active stays the same
+                loop.call_soon_threadsafe(_grant, future)
+                return
+            self.active -= 1
+
+
+def _grant(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+def _percentile(samples: Deque[float], pct: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    value = ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+    return round(value * 1000, 1)
+
+
+class OllamaGateway:
+    """Concurrency-limited, keep-alive client for one Ollama server."""
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost:11434",
+        keep_alive: str = "30m",
+        max_concurrency: int = 2,
+        max_queue: int = 16,
+        queue_timeout: float = 30.0,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 300.0,
+        max_connections: int = 10
+    ):
+        """
+        Initialize the gateway.
+
+        Args:
+            base_url: The base URL for the Ollama API server
+            keep_alive: How long Ollama keeps a model loaded after a request (e.g. '30m', '-1')
+            max_concurrency: Maximum number of generations running at once
+            max_queue: Maximum number of requests waiting for a slot
+            queue_timeout: Seconds a request may wait for a slot
+            connect_timeout: Seconds allowed to establish a connection
+            read_timeout: Seconds allowed between two reads (not the whole generation)
+            max_connections: Maximum number of pooled connections
+        """
+        self.base_url = base_url.rstrip('/')
+        self.keep_alive = keep_alive
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_connections = max_connections
+
+        # One pooled session per event loop that uses the gateway
+        self._sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+        self._limiter = _SlotLimiter(max_concurrency)
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._latencies: Deque[float] = deque(maxlen=500)
+        self._queue_waits: Deque[float] = deque(maxlen=500)
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Get or create the pooled client session for the running loop."""
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            await self._discard_stale_sessions(loop)
+            timeout = aiohttp.ClientTimeout(
+                total=None,
+                sock_connect=self.connect_timeout,
+                sock_read=self.read_timeout
+            )
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+            session = aiohttp.ClientSession(timeout=timeout, connector=connector)
+            self._sessions[loop] = session
+        return session
+
+    async def _discard_stale_sessions(self, current: asyncio.AbstractEventLoop) -> None:
+        """Close sessions whose event loop is no longer running."""
+        stale = [
+            (loop, session) for loop, session in self._sessions.items()
+            if loop is not current and not loop.is_running()
+        ]
+        for loop, session in stale:
+            del self._sessions[loop]
+            await self._close_session(loop, session)
+
+    async def _close_session(self, loop: asyncio.AbstractEventLoop, session: aiohttp.ClientSession) -> None:
+        """Close a session, on its own loop if that loop is still running elsewhere."""
+        if session.closed:
+            return
+        try:
+            if loop is asyncio.get_running_loop() or not loop.is_running():
+                await session.close()
+            else:
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(session.close(), loop))
+        except Exception as e:
+            logger.debug(f"Error closing Ollama session: {str(e)}")
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Hold one generation slot, waiting in the bounded queue if necessary.
+
+        Raises:
+            GatewayOverloadedError: If the queue is full or the wait timed out
+        """
+        waiting = self._limiter.waiting
+        if self._limiter.locked() and waiting >= self.max_queue:
+            self.rejected += 1
+            raise GatewayOverloadedError(
+                f"Ollama gateway {self.base_url} is overloaded ({waiting} requests queued)"
+            )
+
+        queued_at = time.monotonic()
+        try:
+            await asyncio.wait_for(self._limiter.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise GatewayOverloadedError(
+                f"Timed out after {self.queue_timeout}s waiting for an Ollama slot"
+            )
+
+        started = time.monotonic()
+        self._queue_waits.append(started - queued_at)
+        try:
+            yield
+        except Exception:
+            self.failed += 1
+            raise
+        else:
+            self.completed += 1
+        finally:
+            self._latencies.append(time.monotonic() - started)
+            self._limiter.release()
+
+    def _with_keep_alive(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return {"keep_alive": self.keep_alive, **payload}
+
+    async def _post_json(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        session = await self._get_session()
+        async with session.post(f"{self.base_url}{path}", json=self._with_keep_alive(payload)) as response:
+            if response.status != 200:
+                raise Exception(f"Ollama API request failed with status {response.status}")
+            return await response.json()
+
+    async def chat(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Run a non-streaming /api/chat request in a generation slot.
+
+        Args:
+            payload: The /api/chat request body
+
+        Returns:
+            The decoded response body
+        """
+        async with self.slot():
+            return await self._post_json("/api/chat", {**payload, "stream": False})
+
+    async def generate(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Run a non-streaming /api/generate request in a generation slot.
+
+        Args:
+            payload: The /api/generate request body
+
+        Returns:
+            The decoded response body
+        """
+        async with self.slot():
+            return await self._post_json("/api/generate", {**payload, "stream": False})
+
+    async def stream_chat(self, payload: Dict[str, Any]) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Run a streaming /api/chat request, holding a slot until the stream ends.
+
+        Args:
+            payload: The /api/chat request body
+
+        Yields:
+            Decoded response chunks, up to and excluding the final 'done' chunk
+        """
+        async with self.slot():
+            session = await self._get_session()
+            body = self._with_keep_alive({**payload, "stream": True})
+            async with session.post(f"{self.base_url}/api/chat", json=body) as response:
+                if response.status != 200:
+                    raise Exception(f"Ollama API request failed with status {response.status}")
+
+                async for line in response.content:
+                    if not line.strip():
+                        continue
+                    try:
+                        chunk_data = json.loads(line.decode('utf-8'))
+                    except json.JSONDecodeError:
+                        continue
+                    if chunk_data.get("done", False):
+                        break
+                    yield chunk_data
+
+    async def is_up(self) -> bool:
+        """
+        Check that the server responds on /api/tags (does not use a slot).
+
+        Returns:
+            True if the server answered with status 200
+        """
+        session = await self._get_session()
+        async with session.get(f"{self.base_url}/api/tags") as response:
+            return response.status == 200
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return queue depth, throughput counters and latency percentiles."""
+        return {
+            "active": self._limiter.active,
+            "queued": self._limiter.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "latency_p50_ms": _percentile(self._latencies, 50),
+            "latency_p95_ms": _percentile(self._latencies, 95),
+            "queue_wait_p95_ms": _percentile(self._queue_waits, 95),
+        }
+
+    async def aclose(self) -> None:
+        """Close the pooled client sessions of every loop."""
+        sessions, self._sessions = self._sessions, {}
+        for loop, session in sessions.items():
+            await self._close_session(loop, session)
+
+
+_gateways: Dict[str, OllamaGateway] = {}
+
+
+def get_ollama_gateway(base_url: str = "http://localhost:11434") -> OllamaGateway:
+    """
+    Get the process-wide gateway for an Ollama server, creating it on first use.
+
+    Limits come from the OLLAMA_KEEP_ALIVE, OLLAMA_MAX_CONCURRENCY,
+    OLLAMA_MAX_QUEUE and OLLAMA_READ_TIMEOUT settings.
+
+    Args:
+        base_url: The base URL for the Ollama API server
+
+    Returns:
+        The shared OllamaGateway
+    """
+    key = base_url.rstrip('/')
+    gateway = _gateways.get(key)
+    if gateway is None:
+        gateway = OllamaGateway(
+            key,
+            keep_alive=settings.OLLAMA_KEEP_ALIVE,
+            max_concurrency=settings.OLLAMA_MAX_CONCURRENCY,
+            max_queue=settings.OLLAMA_MAX_QUEUE,
+            read_timeout=settings.OLLAMA_READ_TIMEOUT,
+        )
+        _gateways[key] = gateway
+    return gateway
+
+
+def ollama_gateway_metrics() -> Dict[str, Dict[str, Any]]:
+    """Return metrics for every gateway, keyed by base URL."""
+    return {base_url: gateway.metrics() for base_url, gateway in _gateways.items()}
+
+
+async def close_ollama_gateways() -> None:
+    """Close all gateways; call on application shutdown."""
+    for gateway in _gateways.values():
+        await gateway.aclose()
+    _gateways.clear()
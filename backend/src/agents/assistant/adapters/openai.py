@@ -5,8 +5,9 @@ This module implements the AIAdapter interface for OpenAI GPT models.
 """
 import asyncio
 from openai import AsyncOpenAI
-from typing import List, Dict, AsyncGenerator
-from .base import AIAdapter
+from typing import List, Dict, Any, AsyncGenerator
+from .base import AIAdapter, PromptUsage, report_usage
+from .health import AdapterHealth
 import logging
 import os
 
@@ -30,11 +31,64 @@ class OpenAIAdapter(AIAdapter):
 
         self.model = model
         self.client = AsyncOpenAI(api_key=self.api_key)
+        self.health = AdapterHealth(f"openai:{self.model}")
+
+    def _build_params(self, messages: List[Dict[str, str]], **kwargs) -> Dict[str, Any]:
+        """
+        Build chat completion parameters.
+
+        OpenAI caches long prompt prefixes automatically; messages are passed
+        through unchanged so the prefix stays byte-identical between turns. A
+        prompt_cache_key (e.g. the conversation ID) improves cache routing.
+
+        Args:
+            messages: List of messages in the format {'role': str, 'content': str}
+            **kwargs: Additional parameters like temperature, max_tokens, etc.
+
+        Returns:
+            Keyword arguments for client.chat.completions.create
+        """
+        params = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": kwargs.get("max_tokens", 1024),
+        }
+
+        # Add other parameters from kwargs
+        if "temperature" in kwargs:
+            params["temperature"] = kwargs["temperature"]
+        if "top_p" in kwargs:
+            params["top_p"] = kwargs["top_p"]
+        if "frequency_penalty" in kwargs:
+            params["frequency_penalty"] = kwargs["frequency_penalty"]
+        if "presence_penalty" in kwargs:
+            params["presence_penalty"] = kwargs["presence_penalty"]
+        if "prompt_cache_key" in kwargs:
+            # Sent in the request body so SDK versions without the keyword accept it
+            params["extra_body"] = {"prompt_cache_key": kwargs["prompt_cache_key"]}
+        return params
+
+    def _report_usage(self, usage) -> None:
+        """Report the token counts of a response, including cached prompt tokens."""
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = (getattr(details, "cached_tokens", None) or 0) if details else 0
+        report_usage(PromptUsage(
+            provider="openai",
+            model=self.model,
+            input_tokens=(usage.prompt_tokens or 0) - cached,
+            output_tokens=usage.completion_tokens or 0,
+            cache_read_tokens=cached
+        ))
 
     async def chat(self, messages: List[Dict[str, str]], **kwargs) -> str:
         """
         Send messages to the OpenAI API and get a response.
 
+        Token usage, including cached prompt tokens, is reported to the
+        enclosing collect_usage block.
+
         Args:
             messages: List of messages in the format {'role': str, 'content': str}
             **kwargs: Additional parameters like temperature, max_tokens, etc.
@@ -43,25 +97,13 @@ class OpenAIAdapter(AIAdapter):
             The AI model's response as a string
         """
         try:
-            # Prepare the parameters for the API call
-            params = {
-                "model": self.model,
-                "messages": messages,
-                "max_tokens": kwargs.get("max_tokens", 1024),
-            }
-
-            # Add other parameters from kwargs
-            if "temperature" in kwargs:
-                params["temperature"] = kwargs["temperature"]
-            if "top_p" in kwargs:
-                params["top_p"] = kwargs["top_p"]
-            if "frequency_penalty" in kwargs:
-                params["frequency_penalty"] = kwargs["frequency_penalty"]
-            if "presence_penalty" in kwargs:
-                params["presence_penalty"] = kwargs["presence_penalty"]
+            params = self._build_params(messages, **kwargs)
 
             # Make the API call
-            response = await self.client.chat.completions.create(**params)
+            async with self.health.guard():
+                response = await self.client.chat.completions.create(**params)
+
+            self._report_usage(getattr(response, "usage", None))
 
             # Return the content of the response
             return response.choices[0].message.content or ""
@@ -78,6 +120,8 @@ class OpenAIAdapter(AIAdapter):
         """
         Stream response from the OpenAI API.
 
+        Token usage is requested with the stream and reported from its final chunk.
+
         Args:
             messages: List of messages in the format {'role': str, 'content': str}
             **kwargs: Additional parameters like temperature, max_tokens, etc.
@@ -86,29 +130,21 @@ class OpenAIAdapter(AIAdapter):
             Chunks of the AI model's response
         """
         try:
-            # Prepare the parameters for the API call
-            params = {
-                "model": self.model,
-                "messages": messages,
-                "max_tokens": kwargs.get("max_tokens", 1024),
-            }
-
-            # Add other parameters from kwargs
-            if "temperature" in kwargs:
-                params["temperature"] = kwargs["temperature"]
-            if "top_p" in kwargs:
-                params["top_p"] = kwargs["top_p"]
-            if "frequency_penalty" in kwargs:
-                params["frequency_penalty"] = kwargs["frequency_penalty"]
-            if "presence_penalty" in kwargs:
-                params["presence_penalty"] = kwargs["presence_penalty"]
+            params = self._build_params(messages, **kwargs)
 
             # Make the streaming API call
-            async_stream = await self.client.chat.completions.create(**params, stream=True)
-
-            async for chunk in async_stream:
-                if chunk.choices and chunk.choices[0].delta.content:
-                    yield chunk.choices[0].delta.content
+            async with self.health.guard():
+                async_stream = await self.client.chat.completions.create(
+                    **params,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+
+                async for chunk in async_stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+                    if getattr(chunk, "usage", None) is not None:
+                        self._report_usage(chunk.usage)
 
         except Exception as e:
             logger.error(f"Error streaming from OpenAI API: {str(e)}")
@@ -116,26 +152,20 @@ class OpenAIAdapter(AIAdapter):
 
     async def is_available(self) -> bool:
         """
-        Check if the OpenAI service is available by attempting a minimal API call.
+        Check if the OpenAI service is available.
+
+        Uses the free model list endpoint rather than a completion, and caches
+        the result; returns False immediately while the circuit is open.
 
         Returns:
             True if the service is reachable and functional, False otherwise
         """
-        try:
-            # Attempt a minimal API call to validate the API key and connectivity
-            # Using a minimal request to reduce cost and time
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": "Hi"}],
-                max_tokens=10,
-                temperature=0
-            )
+        return await self.health.probe(self._probe)
 
-            # If we got a response, the service is available
-            return True
-
-        except Exception:
-            return False
+    async def _probe(self) -> bool:
+        """List models to validate the API key and connectivity."""
+        await self.client.models.list()
+        return True
 
     def is_configured(self) -> bool:
         """
@@ -144,4 +174,8 @@ class OpenAIAdapter(AIAdapter):
         Returns:
             True if the adapter has necessary configuration, False otherwise
         """
-        return bool(self.api_key and self.model and self.api_key.startswith("sk-"))
\ No newline at end of file
+        return bool(self.api_key and self.model and self.api_key.startswith("sk-"))
+
+    async def aclose(self) -> None:
+        """Close the underlying HTTP client and its pooled connections."""
+        await self.client.close()
@@ -0,0 +1,322 @@
+"""
+AI Adapter Registry.
+
+This module keeps a process-wide pool of AI adapters so that their HTTP clients
+(and the keep-alive connections they hold) are reused across requests instead of
+being created, and leaked, on every call.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from ....core.config import settings
+from .base import AIAdapter
+from .cache import CachingAdapter, ResponseCache
+
+logger = logging.getLogger(__name__)
+
+AdapterFactory = Callable[[Optional[str], Optional[str]], AIAdapter]
+AdapterKey = Tuple[str, str, str]
+
+
+def _openai_factory(model: Optional[str], api_key: Optional[str]) -> AIAdapter:
+    from .openai import OpenAIAdapter
+    return OpenAIAdapter(api_key=api_key, **({"model": model} if model else {}))
+
+
+def _anthropic_factory(model: Optional[str], api_key: Optional[str]) -> AIAdapter:
+    from .anthropic import AnthropicAdapter
+    return AnthropicAdapter(api_key=api_key, **({"model": model} if model else {}))
+
+
+def _ollama_factory(model: Optional[str], api_key: Optional[str]) -> AIAdapter:
+    from .ollama import OllamaAdapter
+    return OllamaAdapter(**({"model": model} if model else {}))  # Ollama doesn't require an API key
+
+
+def _failover_factory(model: Optional[str], api_key: Optional[str]) -> AIAdapter:
+    """
+    Build a FailoverAdapter over the providers listed in ASSISTANT_FAILOVER_PROVIDERS.
+
+    Providers that can't be configured (e.g. missing API key) are skipped.
+    ASSISTANT_HEDGE_AFTER_MS enables hedged requests.
+    """
+    from .failover import FailoverAdapter
+
+    names = settings.ASSISTANT_FAILOVER_PROVIDERS
+    adapters = []
+    for name in (n.strip().lower() for n in names.split(",")):
+        factory = _PROVIDER_FACTORIES.get(name)
+        if factory is None:
+            logger.warning(f"Unknown failover provider: {name}")
+            continue
+        try:
+            adapters.append(factory(None, None))
+        except ValueError as e:
+            logger.info(f"Skipping failover provider {name}: {str(e)}")
+
+    hedge_after_ms = settings.ASSISTANT_HEDGE_AFTER_MS
+    return FailoverAdapter(
+        adapters,
+        hedge_after=hedge_after_ms / 1000 if hedge_after_ms else None
+    )
+
+
+_PROVIDER_FACTORIES: Dict[str, AdapterFactory] = {
+    "openai": _openai_factory,
+    "anthropic": _anthropic_factory,
+    "ollama": _ollama_factory,
+}
+
+DEFAULT_FACTORIES: Dict[str, AdapterFactory] = {
+    **_PROVIDER_FACTORIES,
+    "auto": _failover_factory,
+}
+
+
+def fingerprint_api_key(api_key: Optional[str]) -> str:
+    """
+    Compute a short, non-reversible fingerprint of an API key.
+
+    Args:
+        api_key: The API key (or None)
+
+    Returns:
+        A hex digest prefix, or an empty string if no key was given
+    """
+    if not api_key:
+        return ""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+class AdapterRegistry:
+    """
+    Bounded, process-wide cache of AI adapters keyed by (provider, model, api-key fingerprint).
+
+    Entries are kept in least-recently-used order. When the registry is full the
+    least recently used adapter is evicted, and adapters idle for longer than
+    idle_ttl are evicted on the next lookup.
+
+    Every get() takes a lease on the adapter that must be returned with
+    release() (or use the lease() context manager). Evicted adapters are closed
+    once their last lease is released, so a request that is still streaming
+    from an adapter never sees its client closed underneath it.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 32,
+        idle_ttl: float = 600.0,
+        factories: Optional[Dict[str, AdapterFactory]] = None,
+        response_cache: Optional[ResponseCache] = None
+    ):
+        """
+        Initialize the adapter registry.
+
+        Args:
+            max_size: Maximum number of adapters kept alive at once
+            idle_ttl: Seconds after which an unused adapter is evicted
+            factories: Provider name -> factory(model, api_key); defaults to the built-in adapters
+            response_cache: Optional cache for deterministic responses, shared by all adapters
+        """
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self.response_cache = response_cache
+        self._factories: Dict[str, AdapterFactory] = dict(factories or DEFAULT_FACTORIES)
+        self._adapters: "OrderedDict[AdapterKey, Tuple[AIAdapter, float]]" = OrderedDict()
+        # Outstanding leases per adapter, keyed by id(adapter)
+        self._leases: Dict[int, int] = {}
+        # Evicted adapters that are still leased; closed on their last release
+        self._retired: Dict[int, AIAdapter] = {}
+        self._lock = asyncio.Lock()
+
+    def register_provider(self, provider: str, factory: AdapterFactory) -> None:
+        """
+        Register (or replace) the factory used for a provider.
+
+        Args:
+            provider: Provider name, e.g. 'openai'
+            factory: Callable taking (model, api_key) and returning an adapter
+        """
+        self._factories[provider.lower()] = factory
+
+    def providers(self) -> List[str]:
+        """Return the names of the supported providers."""
+        return list(self._factories)
+
+    async def get(self, provider: str, model: Optional[str] = None, api_key: Optional[str] = None) -> AIAdapter:
+        """
+        Get a pooled adapter, creating it on first use, and lease it.
+
+        The caller must pass the adapter to release() when it is done with it.
+
+        Args:
+            provider: Provider name ('openai', 'anthropic', 'ollama')
+            model: Optional model name (the adapter's default is used if omitted)
+            api_key: Optional API key for providers that require one
+
+        Returns:
+            A shared, leased adapter instance
+
+        Raises:
+            ValueError: If the provider is unknown or the adapter can't be configured
+        """
+        provider = provider.lower()
+        factory = self._factories.get(provider)
+        if factory is None:
+            raise ValueError(f"Unsupported model type: {provider}")
+
+        key = (provider, model or "", fingerprint_api_key(api_key))
+        now = time.monotonic()
+
+        async with self._lock:
+            evicted = self._pop_idle(now)
+
+            entry = self._adapters.get(key)
+            if entry is not None:
+                adapter = entry[0]
+                self._adapters[key] = (adapter, now)
+                self._adapters.move_to_end(key)
+            else:
+                adapter = factory(model, api_key)
+                if self.response_cache is not None:
+                    adapter = CachingAdapter(adapter, self.response_cache, provider)
+                self._adapters[key] = (adapter, now)
+                while len(self._adapters) > self.max_size:
+                    _, (old_adapter, _) = self._adapters.popitem(last=False)
+                    evicted.append(old_adapter)
+
+            self._leases[id(adapter)] = self._leases.get(id(adapter), 0) + 1
+            evicted = self._retire(evicted)
+
+        await self._close_adapters(evicted)
+        return adapter
+
+    async def release(self, adapter: AIAdapter) -> None:
+        """
+        Return a lease taken by get(); closes the adapter if it was evicted meanwhile.
+
+        Args:
+            adapter: The adapter returned by get()
+        """
+        async with self._lock:
+            count = self._leases.get(id(adapter), 0) - 1
+            if count > 0:
+                self._leases[id(adapter)] = count
+                return
+            self._leases.pop(id(adapter), None)
+            retired = self._retired.pop(id(adapter), None)
+        if retired is not None:
+            await self._close_adapters([retired])
+
+    @asynccontextmanager
+    async def lease(
+        self,
+        provider: str,
+        model: Optional[str] = None,
+        api_key: Optional[str] = None
+    ) -> AsyncIterator[AIAdapter]:
+        """
+        Lease a pooled adapter for the duration of an ``async with`` block.
+
+        Args:
+            provider: Provider name ('openai', 'anthropic', 'ollama')
+            model: Optional model name
+            api_key: Optional API key for providers that require one
+
+        Yields:
+            A shared adapter instance
+        """
+        adapter = await self.get(provider, model=model, api_key=api_key)
+        try:
+            yield adapter
+        finally:
+            await self.release(adapter)
+
+    async def evict_idle(self) -> int:
+        """
+        Close and remove adapters that have been idle for longer than idle_ttl.
+
+        Returns:
+            Number of adapters evicted
+        """
+        async with self._lock:
+            evicted = self._pop_idle(time.monotonic())
+            count = len(evicted)
+            evicted = self._retire(evicted)
+        await self._close_adapters(evicted)
+        return count
+
+    async def close_all(self) -> None:
+        """Close every pooled adapter; call on application shutdown."""
+        async with self._lock:
+            evicted = [adapter for adapter, _ in self._adapters.values()]
+            evicted.extend(self._retired.values())
+            self._adapters.clear()
+            self._retired.clear()
+            self._leases.clear()
+        await self._close_adapters(evicted)
+        logger.info(f"Closed {len(evicted)} pooled AI adapters")
+
+    def items(self) -> List[Tuple[AdapterKey, AIAdapter]]:
+        """Return the pooled adapters with their keys, least recently used first."""
+        return [(key, adapter) for key, (adapter, _) in self._adapters.items()]
+
+    def __len__(self) -> int:
+        return len(self._adapters)
+
+    def _pop_idle(self, now: float) -> List[AIAdapter]:
+        """Remove idle entries; they are ordered by last use, so stop at the first fresh one."""
+        evicted = []
+        while self._adapters:
+            key, (adapter, last_used) = next(iter(self._adapters.items()))
+            if now - last_used < self.idle_ttl:
+                break
+            del self._adapters[key]
+            evicted.append(adapter)
+        return evicted
+
+    def _retire(self, adapters: List[AIAdapter]) -> List[AIAdapter]:
+        """Park evicted adapters that are still leased; return the ones safe to close now."""
+        closable = []
+        for adapter in adapters:
+            if self._leases.get(id(adapter)):
+                self._retired[id(adapter)] = adapter
+            else:
+                closable.append(adapter)
+        return closable
+
+    async def _close_adapters(self, adapters: List[AIAdapter]) -> None:
+        for adapter in adapters:
+            close = getattr(adapter, "aclose", None)
+            if close is None:
+                continue
+            try:
+                await close()
+            except Exception as e:
+                logger.warning(f"Error closing AI adapter {adapter!r}: {str(e)}")
+
+
+def response_cache_from_settings() -> Optional[ResponseCache]:
+    """
+    Build the opt-in response cache from Settings.
+
+    ASSISTANT_RESPONSE_CACHE is unset (disabled), 'memory', or a SQLite file
+    path for persistence. ASSISTANT_RESPONSE_CACHE_TTL sets the TTL in seconds.
+
+    Returns:
+        A ResponseCache or None if caching is disabled
+    """
+    setting = settings.ASSISTANT_RESPONSE_CACHE.strip()
+    if not setting:
+        return None
+    ttl = settings.ASSISTANT_RESPONSE_CACHE_TTL
+    return ResponseCache(ttl=ttl, path=None if setting == "memory" else setting)
+
+
+# Process-wide registry shared by all requests
+adapter_registry = AdapterRegistry(response_cache=response_cache_from_settings())
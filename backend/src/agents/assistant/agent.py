@@ -4,9 +4,10 @@ AI Assistant Agent.
 This module implements the main AI Assistant agent that handles conversation
 management and AI model interaction.
 """
-from typing import Dict, Any, Optional
-from .adapters.base import AIAdapter, MessageRole
+from typing import Dict, Any, List, Optional
+from .adapters.base import AIAdapter, PromptUsage, collect_usage
 from .async_conversation_manager import AsyncConversationManager
+from .usage import UsageAggregator
 
 
 class AIAssistantAgent:
@@ -14,16 +15,20 @@ class AIAssistantAgent:
     Main AI Assistant Agent that orchestrates conversation management and AI interactions.
     """
 
-    def __init__(self, ai_adapter: AIAdapter, database_url: str):
+    def __init__(self, ai_adapter: AIAdapter, database_url: str, usage: Optional[UsageAggregator] = None):
         """
         Initialize the AI Assistant Agent.
 
         Args:
             ai_adapter: The AI adapter to use for model interactions
             database_url: URL for the database connection
+            usage: Optional aggregator to record token usage and enforce quotas
         """
         self.ai_adapter = ai_adapter
         self.conversation_manager = AsyncConversationManager(database_url)
+        self.usage = usage
+        # Provider-reported usage (incl. prompt cache reads/writes) of the last chat call
+        self.last_prompt_usage: List[PromptUsage] = []
 
     async def chat(self, conversation_id: str, message: str, user_id: str = None) -> str:
         """
@@ -36,39 +41,55 @@ class AIAssistantAgent:
 
         Returns:
             The AI's response to the message
+
+        Raises:
+            QuotaExceededError: If the user has reached their hard token quota
         """
-        # First, verify the conversation exists (and potentially verify user access)
-        conversation = await self.conversation_manager.get_conversation(conversation_id)
-        if not conversation:
-            # If conversation doesn't exist, create a new one
-            # This assumes we have model info, but in practice, we might want to pass this as well
-            # For now, we'll use the model from the adapter
-            conversation = await self.conversation_manager.create_conversation(
-                user_id=user_id or "anonymous",
-                model=getattr(self.ai_adapter, 'model', 'unknown')
-            )
-            conversation_id = conversation.id
-
-        # Add user message to conversation
-        await self.conversation_manager.add_message(
-            conversation_id=conversation_id,
-            role=MessageRole.USER,
-            content=message
-        )
+        # Reject over-quota users before spending anything on the provider
+        if self.usage is not None and user_id is not None and self.usage.quotas_enabled:
+            await self.usage.check_quota(user_id)
 
-        # Get conversation context with token limit
-        context = await self.conversation_manager.get_token_limited_context(conversation_id)
+        # Load the conversation and its context in one round trip; nothing is
+        # written until the AI has answered, so both messages share one commit
+        turn = await self.conversation_manager.begin_turn(conversation_id, message)
 
-        # Get response from AI
-        response = await self.ai_adapter.chat(context)
+        # Get response from AI; the conversation ID keys provider-side prompt caches
+        with collect_usage() as provider_usage:
+            response = await self.ai_adapter.chat(turn.context, prompt_cache_key=turn.conversation_id)
+        self.last_prompt_usage = provider_usage
 
-        # Add AI response to conversation
-        await self.conversation_manager.add_message(
-            conversation_id=conversation_id,
-            role=MessageRole.ASSISTANT,
-            content=response
+        # Persist both messages (creating the conversation if it doesn't exist)
+        model = getattr(self.ai_adapter, 'model', 'unknown')
+        assistant_message = await self.conversation_manager.commit_turn(
+            turn,
+            response,
+            user_id=user_id,
+            model=model
         )
 
+        if self.usage is not None and user_id is not None:
+            # Prefer the provider's own counts; fall back to our tiktoken estimate
+            if provider_usage:
+                self.usage.record(
+                    user_id,
+                    turn.conversation_id,
+                    model,
+                    prompt_tokens=sum(
+                        u.input_tokens + u.cache_read_tokens + u.cache_write_tokens for u in provider_usage
+                    ),
+                    completion_tokens=sum(u.output_tokens for u in provider_usage),
+                    cache_read_tokens=sum(u.cache_read_tokens for u in provider_usage),
+                    cache_write_tokens=sum(u.cache_write_tokens for u in provider_usage)
+                )
+            else:
+                self.usage.record(
+                    user_id,
+                    turn.conversation_id,
+                    model,
+                    prompt_tokens=turn.context_token_count,
+                    completion_tokens=assistant_message.token_count or 0
+                )
+
         return response
 
     async def create_conversation(self, user_id: str, model: str = None, initial_title: str = None) -> str:
@@ -96,7 +117,7 @@ class AIAssistantAgent:
 
     async def get_conversation_history(self, conversation_id: str) -> list:
         """
-        Get the full history of a conversation.
+        Get the recent history of a conversation.
 
         Args:
             conversation_id: The ID of the conversation
@@ -114,6 +135,39 @@ class AIAssistantAgent:
             for msg in messages
         ]
 
+    async def get_conversation_history_page(
+        self,
+        conversation_id: str,
+        limit: int = 50,
+        before: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Get one page of a conversation's history, newest first.
+
+        Args:
+            conversation_id: The ID of the conversation
+            limit: Maximum number of messages to return
+            before: Cursor (message ID) returned by the previous page
+
+        Returns:
+            Dictionary with the messages and the next_cursor (None on the last page)
+        """
+        messages, next_cursor = await self.conversation_manager.get_message_page(
+            conversation_id, limit=limit, before=before
+        )
+        return {
+            "messages": [
+                {
+                    "id": msg.id,
+                    "role": msg.role,
+                    "content": msg.content,
+                    "created_at": msg.created_at.isoformat() if msg.created_at else ""
+                }
+                for msg in messages
+            ],
+            "next_cursor": next_cursor,
+        }
+
     async def get_user_conversations(self, user_id: str, limit: int = 50) -> list:
         """
         Get all conversations for a user.
@@ -132,7 +186,10 @@ class AIAssistantAgent:
                 "title": conv.title,
                 "model": conv.model,
                 "created_at": conv.created_at.isoformat() if conv.created_at else None,
-                "updated_at": conv.updated_at.isoformat() if conv.updated_at else None
+                "updated_at": conv.updated_at.isoformat() if conv.updated_at else None,
+                "last_message_at": conv.last_message_at.isoformat() if conv.last_message_at else None,
+                "message_count": conv.message_count or 0,
+                "preview": conv.preview
             }
             for conv in conversations
         ]
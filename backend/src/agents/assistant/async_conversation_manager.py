@@ -3,14 +3,16 @@ Async Conversation Manager for the AI Assistant.
 
 This module handles conversation creation, retrieval, and management using async SQLAlchemy.
 """
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
+from dataclasses import dataclass, field
+from functools import lru_cache
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import select, desc, delete
-from ..models.conversation import Conversation as ConversationModel
-from ..models.message import Message as MessageModel
+from sqlalchemy import select, desc, delete, update, func, or_, and_
+from ...models.conversation import Conversation as ConversationModel
+from ...models.message import Message as MessageModel
 from .adapters.base import Message as MessageData, MessageRole
-from datetime import datetime
+from datetime import datetime, timezone
 import tiktoken
 import logging
 import uuid
@@ -18,6 +20,39 @@ import uuid
 
 logger = logging.getLogger(__name__)
 
+# Newest messages loaded per turn when building context. Older messages are
+# never sent to the model, even if they would fit within the token budget.
+MAX_CONTEXT_MESSAGES = 1000
+
+
+@lru_cache(maxsize=1)
+def _get_encoder():
+    """Load the tiktoken encoding once instead of on every message."""
+    return tiktoken.encoding_for_model("gpt-4")  # Use a common encoding
+
+
+@dataclass
+class ChatTurn:
+    """
+    State of a single chat turn between loading the context and persisting the reply.
+
+    Attributes:
+        conversation_id: The ID of the conversation the turn belongs to
+        conversation: The loaded Conversation model, or None if it does not exist yet
+        user_content: The content of the user's message
+        user_token_count: Number of tokens in the user's message
+        context: Token-limited context for the AI adapter, ending with the user's message
+        context_token_count: Number of tokens in the context (the prompt size)
+        started_at: Timestamp of the user's message
+    """
+    conversation_id: str
+    conversation: Optional[ConversationModel]
+    user_content: str
+    user_token_count: int
+    context: List[Dict[str, str]] = field(default_factory=list)
+    context_token_count: int = 0
+    started_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
 
 class AsyncConversationManager:
     """
@@ -85,7 +120,11 @@ class AsyncConversationManager:
 
     async def get_user_conversations(self, user_id: str, limit: int = 50) -> List[ConversationModel]:
         """
-        Retrieve all conversations for a user.
+        Retrieve all conversations for a user, most recently active first.
+
+        Served by the (user_id, updated_at DESC) index; the denormalized
+        preview, message_count and last_message_at columns mean callers need
+        no further queries to render a conversation list.
 
         Args:
             user_id: The ID of the user
@@ -132,18 +171,21 @@ class AsyncConversationManager:
                 )
                 session.add(message)
 
-                # Update the conversation's updated_at timestamp by fetching and updating
-                conversation_result = await session.execute(
-                    select(ConversationModel).filter(ConversationModel.id == conversation_id)
+                # Touch the conversation and its denormalized list fields in one UPDATE;
+                # the title is only set from the first message
+                now = datetime.now(timezone.utc)
+                message.created_at = now
+                await session.execute(
+                    update(ConversationModel)
+                    .where(ConversationModel.id == conversation_id)
+                    .values(
+                        updated_at=now,
+                        last_message_at=now,
+                        message_count=ConversationModel.message_count + 1,
+                        preview=self._derive_preview(content),
+                        title=func.coalesce(ConversationModel.title, self._derive_title(content))
+                    )
                 )
-                conversation = conversation_result.scalar_one_or_none()
-
-                if conversation and not conversation.title:
-                    # Set the title to the first 50 characters of the first message if not already set
-                    if len(content) <= 50:
-                        conversation.title = content
-                    else:
-                        conversation.title = content[:50] + "..."
 
                 await session.commit()
                 await session.refresh(message)
@@ -155,28 +197,90 @@ class AsyncConversationManager:
 
     async def get_conversation_messages(self, conversation_id: str, limit: int = 100) -> List[MessageModel]:
         """
-        Retrieve all messages in a conversation.
+        Retrieve the most recent messages in a conversation.
 
         Args:
             conversation_id: The ID of the conversation
-            limit: Maximum number of messages to return (most recent first)
+            limit: Maximum number of messages to return (the newest ones are kept)
 
         Returns:
-            List of Message models
+            List of Message models in chronological order
         """
         async with AsyncSession(self.engine) as session:
             try:
                 result = await session.execute(
                     select(MessageModel)
                     .filter(MessageModel.conversation_id == conversation_id)
-                    .order_by(MessageModel.created_at.asc())  # Order chronologically
+                    .order_by(MessageModel.created_at.desc(), MessageModel.id.desc())
                     .limit(limit)
                 )
-                return result.scalars().all()
+                messages = list(result.scalars().all())
+                messages.reverse()  # Order chronologically
+                return messages
             except Exception as e:
                 logger.error(f"Error retrieving messages for conversation {conversation_id}: {str(e)}")
                 return []
 
+    async def get_message_page(
+        self,
+        conversation_id: str,
+        limit: int = 50,
+        before: Optional[str] = None
+    ) -> Tuple[List[MessageModel], Optional[str]]:
+        """
+        Retrieve one page of a conversation's history, newest first.
+
+        Uses the (conversation_id, created_at) index; the cursor is the ID of
+        the oldest message of the previous page.
+
+        Args:
+            conversation_id: The ID of the conversation
+            limit: Maximum number of messages to return
+            before: Only return messages older than this message ID
+
+        Returns:
+            The messages (newest first) and the cursor for the next page, or None
+            if there are no older messages
+        """
+        query = (
+            select(MessageModel)
+            .filter(MessageModel.conversation_id == conversation_id)
+            .order_by(MessageModel.created_at.desc(), MessageModel.id.desc())
+            .limit(limit + 1)
+        )
+
+        if before:
+            cursor_created_at = (
+                select(MessageModel.created_at)
+                .filter(
+                    MessageModel.id == before,
+                    MessageModel.conversation_id == conversation_id
+                )
+                .scalar_subquery()
+            )
+            query = query.filter(
+                or_(
+                    MessageModel.created_at < cursor_created_at,
+                    and_(
+                        MessageModel.created_at == cursor_created_at,
+                        MessageModel.id < before
+                    )
+                )
+            )
+
+        async with AsyncSession(self.engine) as session:
+            try:
+                result = await session.execute(query)
+                messages = list(result.scalars().all())
+            except Exception as e:
+                logger.error(f"Error retrieving message page for conversation {conversation_id}: {str(e)}")
+                return [], None
+
+        if len(messages) > limit:
+            messages = messages[:limit]
+            return messages, messages[-1].id
+        return messages, None
+
     async def update_conversation_title(self, conversation_id: str, title: str):
         """
         Update the title of a conversation.
@@ -227,6 +331,186 @@ class AsyncConversationManager:
                 await session.rollback()
                 return False
 
+    async def begin_turn(self, conversation_id: str, content: str, max_tokens: int = None) -> ChatTurn:
+        """
+        Load a conversation and its token-limited context in a single query.
+
+        Nothing is written here; the user's message is only appended to the
+        returned context and persisted later by commit_turn, so no transaction
+        is held open while the AI adapter is generating.
+
+        Only the newest MAX_CONTEXT_MESSAGES messages are considered, so the
+        context of very long conversations is truncated to that window
+        before the token limit is applied.
+
+        Args:
+            conversation_id: The ID of the conversation
+            content: The content of the user's message
+            max_tokens: Maximum number of tokens to include (defaults to self.max_context_tokens)
+
+        Returns:
+            A ChatTurn holding the conversation (None if not found) and context
+        """
+        if max_tokens is None:
+            max_tokens = self.max_context_tokens
+
+        user_token_count = self._count_tokens(content)
+        turn = ChatTurn(
+            conversation_id=conversation_id,
+            conversation=None,
+            user_content=content,
+            user_token_count=user_token_count
+        )
+
+        async with AsyncSession(self.engine, expire_on_commit=False) as session:
+            # Conversation and its newest messages in one round trip
+            result = await session.execute(
+                select(ConversationModel, MessageModel)
+                .outerjoin(MessageModel, MessageModel.conversation_id == ConversationModel.id)
+                .filter(ConversationModel.id == conversation_id)
+                .order_by(MessageModel.created_at.desc())
+                .limit(MAX_CONTEXT_MESSAGES)
+            )
+            rows = result.all()
+
+        if not rows:
+            turn.context = [{"role": MessageRole.USER.value, "content": content}]
+            turn.context_token_count = user_token_count
+            return turn
+
+        turn.conversation = rows[0][0]
+
+        # The new message is the newest one, so it is always included
+        context_messages = [{"role": MessageRole.USER.value, "content": content}]
+        total_tokens = user_token_count
+
+        for _, message in rows:
+            if message is None:
+                break
+            message_tokens = message.token_count or self._count_tokens(message.content)
+            if total_tokens + message_tokens > max_tokens:
+                break
+            context_messages.append({
+                "role": message.role,
+                "content": message.content
+            })
+            total_tokens += message_tokens
+
+        context_messages.reverse()
+        turn.context = context_messages
+        turn.context_token_count = total_tokens
+        return turn
+
+    async def commit_turn(
+        self,
+        turn: ChatTurn,
+        response: str,
+        user_id: str = None,
+        model: str = None
+    ) -> MessageModel:
+        """
+        Persist both messages of a chat turn and touch the conversation in one commit.
+
+        If the conversation did not exist when the turn began, it is created in
+        the same transaction and turn.conversation_id is updated to its new ID.
+
+        Args:
+            turn: The ChatTurn returned by begin_turn
+            response: The AI's response to the user's message
+            user_id: Owner of the conversation if it has to be created
+            model: The AI model used if the conversation has to be created
+
+        Returns:
+            The created assistant Message model
+        """
+        now = datetime.now(timezone.utc)
+        title = self._derive_title(turn.user_content)
+
+        async with AsyncSession(self.engine, expire_on_commit=False) as session:
+            try:
+                preview = self._derive_preview(response)
+                if turn.conversation is None:
+                    conversation = ConversationModel(
+                        id=str(uuid.uuid4()),
+                        user_id=user_id or "anonymous",
+                        model=model or "unknown",
+                        title=title,
+                        updated_at=now,
+                        last_message_at=now,
+                        message_count=2,
+                        preview=preview
+                    )
+                    session.add(conversation)
+                    turn.conversation = conversation
+                    turn.conversation_id = conversation.id
+                else:
+                    await session.execute(
+                        update(ConversationModel)
+                        .where(ConversationModel.id == turn.conversation_id)
+                        .values(
+                            updated_at=now,
+                            last_message_at=now,
+                            message_count=ConversationModel.message_count + 2,
+                            preview=preview,
+                            title=func.coalesce(ConversationModel.title, title)
+                        )
+                    )
+
+                user_message = MessageModel(
+                    conversation_id=turn.conversation_id,
+                    role=MessageRole.USER.value,
+                    content=turn.user_content,
+                    token_count=turn.user_token_count,
+                    created_at=turn.started_at
+                )
+                assistant_message = MessageModel(
+                    conversation_id=turn.conversation_id,
+                    role=MessageRole.ASSISTANT.value,
+                    content=response,
+                    token_count=self._count_tokens(response),
+                    created_at=now
+                )
+                session.add_all([user_message, assistant_message])
+
+                await session.commit()
+                return assistant_message
+            except Exception as e:
+                logger.error(f"Error committing chat turn for conversation {turn.conversation_id}: {str(e)}")
+                await session.rollback()
+                raise
+
+    @staticmethod
+    def _derive_title(content: str) -> str:
+        """
+        Derive a conversation title from the first message.
+
+        Args:
+            content: The content of the first message
+
+        Returns:
+            The first 50 characters of the message
+        """
+        if len(content) <= 50:
+            return content
+        return content[:50] + "..."
+
+    @staticmethod
+    def _derive_preview(content: str, length: int = 100) -> str:
+        """
+        Derive the list preview from the newest message.
+
+        Args:
+            content: The content of the message
+            length: Maximum number of characters to keep
+
+        Returns:
+            The message collapsed to one line and truncated
+        """
+        preview = " ".join(content.split())
+        if len(preview) <= length:
+            return preview
+        return preview[:length] + "..."
+
     def _count_tokens(self, text: str) -> int:
         """
         Count the number of tokens in a text string.
@@ -239,8 +523,7 @@ class AsyncConversationManager:
         """
         try:
             # Use tiktoken to count tokens
-            encoder = tiktoken.encoding_for_model("gpt-4")  # Use a common encoding
-            return len(encoder.encode(text))
+            return len(_get_encoder().encode(text))
         except Exception:
             # Fallback: rough estimation (about 4 chars per token on average)
             return max(1, len(text) // 4)
@@ -1,21 +1,73 @@
 """
 Conversation Manager for the AI Assistant.
 
-This module handles conversation creation, retrieval, and management.
+This module provides a synchronous facade over AsyncConversationManager for
+scripts and tests. All database work runs on a dedicated background event loop,
+so there is a single (async) conversation store implementation and no code path
+uses a blocking engine inside the application's event loop.
 """
-from typing import List, Optional, Dict, Any
-from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy import create_engine, desc
-from ..models.conversation import Conversation as ConversationModel
-from ..models.message import Message as MessageModel
-from .adapters.base import Message as MessageData, MessageRole
-from datetime import datetime
-import tiktoken
+import asyncio
+import threading
+from typing import Any, Coroutine, List, Optional, Dict, TypeVar
+from ...models.conversation import Conversation as ConversationModel
+from ...models.message import Message as MessageModel
+from .adapters.base import MessageRole
+from .async_conversation_manager import AsyncConversationManager
+
+T = TypeVar("T")
+
+
+class _BackgroundLoop:
+    """An event loop running forever in a daemon thread."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever,
+            name="conversation-manager-loop",
+            daemon=True
+        )
+        self.thread.start()
+
+    def run(self, coro: Coroutine[Any, Any, T]) -> T:
+        """Run a coroutine on the background loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+
+_background_loop: Optional[_BackgroundLoop] = None
+_background_loop_lock = threading.Lock()
+
+
+def _get_background_loop() -> _BackgroundLoop:
+    """Return the shared background loop, starting it on first use."""
+    global _background_loop
+    with _background_loop_lock:
+        if _background_loop is None:
+            _background_loop = _BackgroundLoop()
+        return _background_loop
+
+
+def to_async_database_url(database_url: str) -> str:
+    """
+    Convert a synchronous SQLite URL to its aiosqlite equivalent.
+
+    Args:
+        database_url: URL for the database connection
+
+    Returns:
+        The URL with an async driver
+    """
+    if database_url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + database_url[len("sqlite://"):]
+    return database_url
 
 
 class ConversationManager:
     """
-    Manages conversations and messages for the AI Assistant.
+    Synchronous facade over AsyncConversationManager.
+
+    Intended for scripts and tests only. Calling it from a thread that is running
+    an event loop raises RuntimeError; use AsyncConversationManager there instead.
     """
 
     def __init__(self, database_url: str, max_context_tokens: int = 4000):
@@ -26,9 +78,27 @@ class ConversationManager:
             database_url: URL for the database connection
             max_context_tokens: Maximum number of tokens allowed in the context window
         """
-        self.engine = create_engine(database_url)
-        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
-        self.max_context_tokens = max_context_tokens
+        self._loop = _get_background_loop()
+        self.manager = AsyncConversationManager(
+            to_async_database_url(database_url),
+            max_context_tokens=max_context_tokens
+        )
+
+    @property
+    def max_context_tokens(self) -> int:
+        return self.manager.max_context_tokens
+
+    def _run(self, coro: Coroutine[Any, Any, T]) -> T:
+        """Run a coroutine on the background loop, refusing to block a running loop."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return self._loop.run(coro)
+        coro.close()
+        raise RuntimeError(
+            "ConversationManager would block the running event loop; "
+            "use AsyncConversationManager from async code"
+        )
 
     def create_conversation(self, user_id: str, model: str, initial_title: str = None) -> ConversationModel:
         """
@@ -42,19 +112,7 @@ class ConversationManager:
         Returns:
             The created Conversation model
         """
-        db = self.SessionLocal()
-        try:
-            conversation = ConversationModel(
-                user_id=user_id,
-                model=model,
-                title=initial_title
-            )
-            db.add(conversation)
-            db.commit()
-            db.refresh(conversation)
-            return conversation
-        finally:
-            db.close()
+        return self._run(self.manager.create_conversation(user_id, model, initial_title))
 
     def get_conversation(self, conversation_id: str) -> Optional[ConversationModel]:
         """
@@ -66,11 +124,7 @@ class ConversationManager:
         Returns:
             The Conversation model or None if not found
         """
-        db = self.SessionLocal()
-        try:
-            return db.query(ConversationModel).filter(ConversationModel.id == conversation_id).first()
-        finally:
-            db.close()
+        return self._run(self.manager.get_conversation(conversation_id))
 
     def get_user_conversations(self, user_id: str, limit: int = 50) -> List[ConversationModel]:
         """
@@ -83,17 +137,7 @@ class ConversationManager:
         Returns:
             List of Conversation models
         """
-        db = self.SessionLocal()
-        try:
-            return (
-                db.query(ConversationModel)
-                .filter(ConversationModel.user_id == user_id)
-                .order_by(desc(ConversationModel.updated_at))
-                .limit(limit)
-                .all()
-            )
-        finally:
-            db.close()
+        return self._run(self.manager.get_user_conversations(user_id, limit))
 
     def add_message(self, conversation_id: str, role: MessageRole, content: str) -> MessageModel:
         """
@@ -107,33 +151,7 @@ class ConversationManager:
         Returns:
             The created Message model
         """
-        db = self.SessionLocal()
-        try:
-            # Count tokens in the message
-            token_count = self._count_tokens(content)
-
-            message = MessageModel(
-                conversation_id=conversation_id,
-                role=role.value,  # Convert enum to string
-                content=content,
-                token_count=token_count
-            )
-            db.add(message)
-
-            # Update the conversation's updated_at timestamp
-            conversation = db.query(ConversationModel).filter(ConversationModel.id == conversation_id).first()
-            if conversation and not conversation.title:
-                # Set the title to the first 50 characters of the first message if not already set
-                if len(content) <= 50:
-                    conversation.title = content
-                else:
-                    conversation.title = content[:50] + "..."
-
-            db.commit()
-            db.refresh(message)
-            return message
-        finally:
-            db.close()
+        return self._run(self.manager.add_message(conversation_id, role, content))
 
     def get_conversation_messages(self, conversation_id: str, limit: int = 100) -> List[MessageModel]:
         """
@@ -141,22 +159,12 @@ class ConversationManager:
 
         Args:
             conversation_id: The ID of the conversation
-            limit: Maximum number of messages to return (most recent first)
+            limit: Maximum number of messages to return
 
         Returns:
             List of Message models
         """
-        db = self.SessionLocal()
-        try:
-            return (
-                db.query(MessageModel)
-                .filter(MessageModel.conversation_id == conversation_id)
-                .order_by(MessageModel.created_at.asc())  # Order chronologically
-                .limit(limit)
-                .all()
-            )
-        finally:
-            db.close()
+        return self._run(self.manager.get_conversation_messages(conversation_id, limit))
 
     def update_conversation_title(self, conversation_id: str, title: str):
         """
@@ -166,14 +174,7 @@ class ConversationManager:
             conversation_id: The ID of the conversation
             title: The new title
         """
-        db = self.SessionLocal()
-        try:
-            conversation = db.query(ConversationModel).filter(ConversationModel.id == conversation_id).first()
-            if conversation:
-                conversation.title = title
-                db.commit()
-        finally:
-            db.close()
+        return self._run(self.manager.update_conversation_title(conversation_id, title))
 
     def delete_conversation(self, conversation_id: str) -> bool:
         """
@@ -185,36 +186,7 @@ class ConversationManager:
         Returns:
             True if the conversation was deleted, False otherwise
         """
-        db = self.SessionLocal()
-        try:
-            # Delete all messages associated with the conversation first
-            db.query(MessageModel).filter(MessageModel.conversation_id == conversation_id).delete()
-
-            # Then delete the conversation itself
-            result = db.query(ConversationModel).filter(ConversationModel.id == conversation_id).delete()
-            db.commit()
-
-            return result > 0
-        finally:
-            db.close()
-
-    def _count_tokens(self, text: str) -> int:
-        """
-        Count the number of tokens in a text string.
-
-        Args:
-            text: The text to count tokens for
-
-        Returns:
-            Number of tokens in the text
-        """
-        try:
-            # Use tiktoken to count tokens
-            encoder = tiktoken.encoding_for_model("gpt-4")  # Use a common encoding
-            return len(encoder.encode(text))
-        except Exception:
-            # Fallback: rough estimation (about 4 chars per token on average)
-            return max(1, len(text) // 4)
+        return self._run(self.manager.delete_conversation(conversation_id))
 
     def get_conversation_context(self, conversation_id: str, max_messages: int = 10) -> List[Dict[str, str]]:
         """
@@ -227,16 +199,7 @@ class ConversationManager:
         Returns:
             List of message dictionaries in the format {'role': str, 'content': str}
         """
-        messages = self.get_conversation_messages(conversation_id, limit=max_messages)
-
-        # Convert to the format expected by AI adapters
-        return [
-            {
-                "role": msg.role,
-                "content": msg.content
-            }
-            for msg in messages
-        ]
+        return self._run(self.manager.get_conversation_context(conversation_id, max_messages))
 
     def get_token_limited_context(self, conversation_id: str, max_tokens: int = None) -> List[Dict[str, str]]:
         """
@@ -249,38 +212,7 @@ class ConversationManager:
         Returns:
             List of message dictionaries in the format {'role': str, 'content': str}
         """
-        if max_tokens is None:
-            max_tokens = self.max_context_tokens
-
-        all_messages = self.get_conversation_messages(conversation_id, limit=1000)  # Get up to 1000 messages
-        context_messages = []
-        total_tokens = 0
-
-        # Process messages in reverse chronological order (newest first)
-        for message in reversed(all_messages):
-            message_tokens = message.token_count or self._count_tokens(message.content)
-
-            # Check if adding this message would exceed the token limit
-            if total_tokens + message_tokens > max_tokens:
-                # If this is the first message (newest), we have to include it anyway
-                if len(context_messages) == 0:
-                    context_messages.append({
-                        "role": message.role,
-                        "content": message.content
-                    })
-                    break
-                else:
-                    # Otherwise, stop adding messages
-                    break
-
-            # Add the message to context (at the beginning to maintain chronological order)
-            context_messages.insert(0, {
-                "role": message.role,
-                "content": message.content
-            })
-            total_tokens += message_tokens
-
-        return context_messages
+        return self._run(self.manager.get_token_limited_context(conversation_id, max_tokens))
 
     def summarize_conversation(self, conversation_id: str, ai_adapter, max_summary_length: int = 200) -> str:
         """
@@ -288,41 +220,24 @@ class ConversationManager:
 
         Args:
             conversation_id: The ID of the conversation to summarize
-            ai_adapter: An AI adapter to use for summarization
+            ai_adapter: An (async) AI adapter to use for summarization
             max_summary_length: Maximum length of the summary in words
 
         Returns:
             A summary of the conversation
         """
-        # Get all messages in the conversation
-        all_messages = self.get_conversation_messages(conversation_id, limit=1000)
-
-        # Build the conversation text to summarize
-        conversation_text = "\n".join([
-            f"[{msg.role.upper()}]: {msg.content}"
-            for msg in all_messages
-        ])
+        return self._run(
+            self.manager.summarize_conversation(conversation_id, ai_adapter, max_summary_length)
+        )
 
-        if not conversation_text.strip():
-            return "Empty conversation"
+    def close(self) -> None:
+        """Dispose of the underlying engine and its connections."""
+        self._run(self.manager.engine.dispose())
 
-        # Create a prompt for the AI to summarize
-        prompt = f"""
-        Please provide a concise summary of the following conversation.
-        Limit the summary to approximately {max_summary_length} words.
+    def __enter__(self):
+        """Context manager entry."""
+        return self
 
-        Conversation:
-        {conversation_text[:4000]}  # Limit input to avoid exceeding token limits
-        """
-
-        try:
-            summary = ai_adapter.chat([{
-                "role": "user",
-                "content": prompt
-            }])
-
-            return summary
-        except Exception as e:
-            # Fallback: return a basic summary
-            first_few_words = all_messages[0].content[:50] if all_messages else "Empty conversation"
-            return f"Conversation starting with: {first_few_words}..."
\ No newline at end of file
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit."""
+        self.close()
@@ -0,0 +1,375 @@
+"""
+Token usage accounting and quotas for the AI Assistant.
+
+Chat turns are recorded in memory by UsageAggregator and flushed periodically
+to the token_usage ledger as per-bucket upserts. Quota checks read a cached
+per-user window total, so neither recording nor enforcement touches the
+messages table.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...core.config import settings
+from ...core.database import AsyncSessionLocal
+from ...models.token_usage import TokenUsage
+
+logger = logging.getLogger(__name__)
+
+_UsageKey = Tuple[str, str, str, datetime]  # (user_id, conversation_id, model, bucket_start)
+
+# Order of the in-memory counters of one ledger row
+COUNTER_FIELDS = ("prompt_tokens", "completion_tokens", "request_count", "cache_read_tokens", "cache_write_tokens")
+
+GROUP_BY_COLUMNS = {
+    "model": TokenUsage.model,
+    "conversation": TokenUsage.conversation_id,
+    "bucket": TokenUsage.bucket_start,
+}
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE, which the ledger upsert relies on
+UPSERT_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+
+def _upsert_insert(session: AsyncSession):
+    """Return the dialect-specific insert() that supports on_conflict_do_update."""
+    dialect = session.bind.dialect.name
+    if dialect not in UPSERT_INSERTS:
+        raise NotImplementedError(f"Token usage upsert is not supported on {dialect}")
+    return UPSERT_INSERTS[dialect]
+
+
+class QuotaExceededError(Exception):
+    """Raised when a user has used up their hard token quota for the window."""
+
+    def __init__(self, user_id: str, used: int, limit: int):
+        super().__init__(f"Token quota exceeded for user {user_id}: {used}/{limit}")
+        self.user_id = user_id
+        self.used = used
+        self.limit = limit
+
+
+@dataclass
+class QuotaStatus:
+    """
+    Result of a quota check.
+
+    Attributes:
+        used: Tokens used in the current window
+        soft_limit: Soft limit (warn only), or None
+        hard_limit: Hard limit (reject), or None
+        window_start: Start of the current quota window
+    """
+    used: int
+    soft_limit: Optional[int]
+    hard_limit: Optional[int]
+    window_start: datetime
+
+    @property
+    def soft_exceeded(self) -> bool:
+        return self.soft_limit is not None and self.used >= self.soft_limit
+
+    @property
+    def hard_exceeded(self) -> bool:
+        return self.hard_limit is not None and self.used >= self.hard_limit
+
+
+def _floor_time(moment: datetime, seconds: int) -> datetime:
+    """Round a UTC timestamp down to a multiple of seconds (naive UTC result)."""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    epoch = int(moment.replace(tzinfo=timezone.utc).timestamp())
+    return datetime.fromtimestamp(epoch - epoch % seconds, tz=timezone.utc).replace(tzinfo=None)
+
+
+class UsageAggregator:
+    """
+    In-memory token usage aggregator with periodic flushing and quota checks.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession] = None,
+        flush_interval: float = 30.0,
+        bucket_seconds: int = 3600,
+        soft_limit: Optional[int] = None,
+        hard_limit: Optional[int] = None,
+        quota_window_seconds: int = 86400
+    ):
+        """
+        Initialize the aggregator.
+
+        Args:
+            session_factory: Factory for database sessions (defaults to AsyncSessionLocal)
+            flush_interval: Seconds between background flushes
+            bucket_seconds: Width of a ledger time bucket
+            soft_limit: Tokens per window after which requests are logged as over quota
+            hard_limit: Tokens per window after which requests are rejected
+            quota_window_seconds: Length of the quota window (a multiple of bucket_seconds)
+        """
+        self.session_factory = session_factory or AsyncSessionLocal
+        self.flush_interval = flush_interval
+        self.bucket_seconds = bucket_seconds
+        self.soft_limit = soft_limit
+        self.hard_limit = hard_limit
+        self.quota_window_seconds = quota_window_seconds
+
+        self._pending: Dict[_UsageKey, List[int]] = {}
+        # user_id -> (window_start, tokens used in that window)
+        self._window_totals: Dict[str, Tuple[datetime, int]] = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def quotas_enabled(self) -> bool:
+        return self.soft_limit is not None or self.hard_limit is not None
+
+    def record(
+        self,
+        user_id: str,
+        conversation_id: str,
+        model: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cache_read_tokens: int = 0,
+        cache_write_tokens: int = 0,
+        at: datetime = None
+    ) -> None:
+        """
+        Record the tokens of one chat request in memory.
+
+        Args:
+            user_id: The user who made the request
+            conversation_id: The conversation the request belongs to
+            model: The AI model that served the request
+            prompt_tokens: Tokens sent to the model (including cached ones)
+            completion_tokens: Tokens generated by the model
+            cache_read_tokens: Prompt tokens served from the provider's prompt cache
+            cache_write_tokens: Prompt tokens written to the provider's prompt cache
+            at: Time of the request (defaults to now)
+        """
+        at = at or datetime.now(timezone.utc)
+        key = (str(user_id), conversation_id, model, _floor_time(at, self.bucket_seconds))
+        counters = self._pending.setdefault(key, [0] * len(COUNTER_FIELDS))
+        counters[0] += prompt_tokens
+        counters[1] += completion_tokens
+        counters[2] += 1
+        counters[3] += cache_read_tokens
+        counters[4] += cache_write_tokens
+
+        cached = self._window_totals.get(str(user_id))
+        if cached and cached[0] == _floor_time(at, self.quota_window_seconds):
+            self._window_totals[str(user_id)] = (cached[0], cached[1] + prompt_tokens + completion_tokens)
+
+    async def check_quota(self, user_id: str) -> QuotaStatus:
+        """
+        Check a user's usage in the current quota window.
+
+        Args:
+            user_id: The user about to make a request
+
+        Returns:
+            The user's QuotaStatus
+
+        Raises:
+            QuotaExceededError: If the hard limit has been reached
+        """
+        user_id = str(user_id)
+        window_start = _floor_time(datetime.now(timezone.utc), self.quota_window_seconds)
+        cached = self._window_totals.get(user_id)
+        if cached is None or cached[0] != window_start:
+            used = await self._load_window_total(user_id, window_start)
+            self._window_totals[user_id] = (window_start, used)
+        status = QuotaStatus(
+            used=self._window_totals[user_id][1],
+            soft_limit=self.soft_limit,
+            hard_limit=self.hard_limit,
+            window_start=window_start
+        )
+        if status.hard_exceeded:
+            raise QuotaExceededError(user_id, status.used, self.hard_limit)
+        if status.soft_exceeded:
+            logger.warning(f"User {user_id} is over the soft token quota: {status.used}/{self.soft_limit}")
+        return status
+
+    async def _load_window_total(self, user_id: str, window_start: datetime) -> int:
+        """Sum the ledger and unflushed counters for a user since window_start."""
+        async with self._lock:
+            async with self.session_factory() as session:
+                result = await session.execute(
+                    select(func.coalesce(func.sum(TokenUsage.prompt_tokens + TokenUsage.completion_tokens), 0))
+                    .where(TokenUsage.user_id == user_id, TokenUsage.bucket_start >= window_start)
+                )
+                used = int(result.scalar_one())
+            for (pending_user, _, _, bucket_start), counters in self._pending.items():
+                if pending_user == user_id and bucket_start >= window_start:
+                    used += counters[0] + counters[1]
+        return used
+
+    async def flush(self) -> int:
+        """
+        Write the pending counters to the ledger, adding to existing bucket rows.
+
+        Returns:
+            The number of bucket rows written
+        """
+        async with self._lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+            rows = [
+                {
+                    "user_id": user_id,
+                    "conversation_id": conversation_id,
+                    "model": model,
+                    "bucket_start": bucket_start,
+                    **dict(zip(COUNTER_FIELDS, counters)),
+                }
+                for (user_id, conversation_id, model, bucket_start), counters in pending.items()
+            ]
+            try:
+                async with self.session_factory() as session:
+                    stmt = _upsert_insert(session)(TokenUsage).values(rows)
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=["user_id", "bucket_start", "model", "conversation_id"],
+                        set_={
+                            name: getattr(TokenUsage, name) + getattr(stmt.excluded, name)
+                            for name in COUNTER_FIELDS
+                        }
+                    )
+                    await session.execute(stmt)
+                    await session.commit()
+            except Exception as e:
+                # Keep the counters for the next flush
+                logger.error(f"Error flushing token usage: {str(e)}")
+                for key, counters in pending.items():
+                    merged = self._pending.setdefault(key, [0] * len(COUNTER_FIELDS))
+                    for i, value in enumerate(counters):
+                        merged[i] += value
+                raise
+            return len(rows)
+
+    async def get_usage(
+        self,
+        user_id: str,
+        start: datetime,
+        end: datetime = None,
+        group_by: str = "model"
+    ) -> Dict[str, Any]:
+        """
+        Get a user's usage between two times, grouped by model, conversation or bucket.
+
+        Pending counters are flushed first. Times are rounded to whole buckets.
+
+        Args:
+            user_id: The user
+            start: Start of the time window
+            end: End of the time window (defaults to now)
+            group_by: 'model', 'conversation' or 'bucket'
+
+        Returns:
+            Dictionary with the window totals and the grouped breakdown
+        """
+        if group_by not in GROUP_BY_COLUMNS:
+            raise ValueError(f"Unsupported group_by: {group_by}")
+        await self.flush()
+
+        end = end or datetime.now(timezone.utc)
+        start_bucket = _floor_time(start, self.bucket_seconds)
+        end_bucket = _floor_time(end, self.bucket_seconds)
+        column = GROUP_BY_COLUMNS[group_by]
+
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(column, *(func.sum(getattr(TokenUsage, name)) for name in COUNTER_FIELDS))
+                .where(
+                    TokenUsage.user_id == str(user_id),
+                    TokenUsage.bucket_start >= start_bucket,
+                    TokenUsage.bucket_start <= end_bucket
+                )
+                .group_by(column)
+                .order_by(column)
+            )
+            groups = [
+                self._group_row(key, [int(value or 0) for value in sums])
+                for key, *sums in result.all()
+            ]
+
+        return {
+            "user_id": str(user_id),
+            "start": start_bucket,
+            "end": end,
+            "group_by": group_by,
+            "prompt_tokens": sum(g["prompt_tokens"] for g in groups),
+            "completion_tokens": sum(g["completion_tokens"] for g in groups),
+            "total_tokens": sum(g["total_tokens"] for g in groups),
+            "requests": sum(g["requests"] for g in groups),
+            "cache_read_tokens": sum(g["cache_read_tokens"] for g in groups),
+            "cache_write_tokens": sum(g["cache_write_tokens"] for g in groups),
+            "groups": groups,
+        }
+
+    @staticmethod
+    def _group_row(key: Any, sums: List[int]) -> Dict[str, Any]:
+        """Shape one grouped ledger row for the usage response."""
+        prompt, completion, requests, cache_read, cache_write = sums
+        return {
+            "key": key.isoformat() if isinstance(key, datetime) else key,
+            "prompt_tokens": prompt,
+            "completion_tokens": completion,
+            "total_tokens": prompt + completion,
+            "requests": requests,
+            "cache_read_tokens": cache_read,
+            "cache_write_tokens": cache_write,
+        }
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                pass  # Already logged; counters are retried on the next flush
+
+    def start(self) -> None:
+        """Start the background flush task."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Stop the background flush task and flush what is left."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+def usage_aggregator_from_settings() -> UsageAggregator:
+    """
+    Build the aggregator from ASSISTANT_USAGE_FLUSH_INTERVAL,
+    ASSISTANT_TOKEN_QUOTA_SOFT and ASSISTANT_TOKEN_QUOTA_HARD (tokens per day).
+
+    Returns:
+        A UsageAggregator using the application's database
+    """
+    return UsageAggregator(
+        flush_interval=settings.ASSISTANT_USAGE_FLUSH_INTERVAL,
+        soft_limit=settings.ASSISTANT_TOKEN_QUOTA_SOFT,
+        hard_limit=settings.ASSISTANT_TOKEN_QUOTA_HARD,
+    )
+
+
+usage_aggregator = usage_aggregator_from_settings()
@@ -3,22 +3,57 @@
 AgentManager - 智能体生命周期管理
 
 负责智能体的启动、终止、状态管理和消息发送。
+
+状态变化在调用方提交事务后才推送到 hub（及其他 worker），回滚的变化
+不会出现在 /ws/agents 快照中。
 """
 
+import asyncio
 import logging
 from datetime import datetime, timezone
 from enum import Enum
-from typing import Optional
+from typing import List, Optional, Set
 from uuid import uuid4
 
-from sqlalchemy import select
+from sqlalchemy import event, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..models.agent_session import AgentSession
 from ..models.agent_message import AgentMessage
+from ..websocket.hub import hub
 
 logger = logging.getLogger(__name__)
 
+# 会话 info 中待推送的状态变化，以及是否已注册提交监听
+_PENDING_STATES_KEY = "agent_manager.pending_states"
+_LISTENING_KEY = "agent_manager.listening"
+# 推送任务的引用，避免被回收
+_publish_tasks: Set[asyncio.Task] = set()
+
+
+async def _publish_states(states: List[dict]) -> None:
+    for state in states:
+        try:
+            await hub.update_agent_state(**state)
+        except Exception as e:
+            logger.error(f"Failed to publish agent state for {state['agent_id']}: {e}")
+
+
+def _on_commit(sync_session) -> None:
+    """事务提交后按顺序推送暂存的状态变化"""
+    states = sync_session.info.pop(_PENDING_STATES_KEY, None)
+    if not states:
+        return
+    task = asyncio.get_running_loop().create_task(_publish_states(states))
+    _publish_tasks.add(task)
+    task.add_done_callback(_publish_tasks.discard)
+
+
+def _on_transaction_end(sync_session, transaction) -> None:
+    """最外层事务结束但未提交（回滚或关闭）：丢弃暂存的状态变化"""
+    if transaction.parent is None:
+        sync_session.info.pop(_PENDING_STATES_KEY, None)
+
 
 class AgentStatus(Enum):
     """智能体状态枚举"""
@@ -80,6 +115,20 @@ class AgentManager:
     def __init__(self, session: AsyncSession):
         self.session = session
 
+    def _stage_state(self, agent_id: str, status: str, session_id: str, started_at: Optional[datetime]) -> None:
+        """暂存状态变化，在会话提交后推送（每个会话只注册一次监听）"""
+        sync_session = self.session.sync_session
+        if not sync_session.info.get(_LISTENING_KEY):
+            event.listen(sync_session, "after_commit", _on_commit)
+            event.listen(sync_session, "after_transaction_end", _on_transaction_end)
+            sync_session.info[_LISTENING_KEY] = True
+        sync_session.info.setdefault(_PENDING_STATES_KEY, []).append({
+            "agent_id": agent_id,
+            "status": status,
+            "session_id": session_id,
+            "started_at": started_at.isoformat() if started_at else None,
+        })
+
     async def spawn(
         self,
         agent_id: str,
@@ -144,6 +193,8 @@ class AgentManager:
         agent.status = "idle"
         await self.session.flush()
 
+        self._stage_state(agent_id, agent_session.status, session_id, agent_session.started_at)
+
         logger.info(f"Agent {agent_id} spawned with session {session_id}")
         return agent_session
 
@@ -200,6 +251,8 @@ class AgentManager:
         agent.status = "offline"
         await self.session.flush()
 
+        self._stage_state(agent_id, AgentStatus.TERMINATED.value, agent_session.id, agent_session.started_at)
+
         logger.info(f"Agent {agent_id} terminated. Reason: {reason or 'user request'}")
 
     async def get_status(self, agent_id: str) -> dict:
@@ -300,6 +353,9 @@ class AgentManager:
 
         await self.session.flush()
 
+        # 提交后更新 hub 中的状态快照，由 hub 合并后推送给 /ws/agents 客户端
+        self._stage_state(agent_id, new_status.value, agent_session.id, agent_session.started_at)
+
         logger.info(
             f"Agent {agent_id} status changed: {old_status} -> {new_status.value}"
         )
@@ -360,6 +416,25 @@ class AgentManager:
         )
         return result.scalars().all()
 
+    async def load_state_snapshot(self) -> int:
+        """
+        用数据库中的活动会话初始化 hub 的状态快照（启动时调用一次）
+
+        Returns:
+            int: 载入的会话数
+        """
+        active_sessions = await self.get_active_sessions()
+        hub.agent_states.load([
+            {
+                "agent_id": session.agent_id,
+                "status": session.status,
+                "session_id": session.id,
+                "started_at": session.started_at.isoformat() if session.started_at else None
+            }
+            for session in active_sessions
+        ])
+        return len(active_sessions)
+
     async def get_session_history(
         self,
         agent_id: str,
@@ -4,24 +4,144 @@ MemoryStore - 智能体记忆存储
 
 支持短期记忆、长期记忆和上下文管理。
 Phase 4 实现加密存储。
+
+同一 (agent_id, session_id, key) 只保留一条记忆，store 覆盖旧值并更新
+updated_at，created_at 保持首次写入的时间；多条匹配时最后写入的生效。
+retrieve 的结果缓存在进程内 LRU (memory_cache) 中：
+- store / delete / 清理产生的变化先暂存在会话的 info 中，事务提交后才写入
+  缓存，回滚或未提交就关闭会话时丢弃，缓存中只有已提交的数据
+- 有暂存变化的键在本事务内直接查询数据库
+- 命中时仍按 expires_at 判断是否过期
+缓存不感知其他进程或绕过 MemoryStore 的写入。
 """
 
 import json
 import logging
 import os
 from base64 import b64encode, b64decode
+from collections import OrderedDict
 from datetime import datetime, timezone
-from typing import Optional, Any
+from typing import Dict, Iterable, Optional, Any, Tuple
 from uuid import uuid4
 
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
-from sqlalchemy import select, and_, or_
+from sqlalchemy import event, func, select, and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..core.config import settings
 from ..models.agent_memory import AgentMemory, MemoryType
 
 logger = logging.getLogger(__name__)
 
+# 缓存键: (agent_id, session_id, key)；session_id 为 None 表示不限会话的查询
+CacheKey = Tuple[str, Optional[str], str]
+# 缓存值: (value, expires_at)；None 表示数据库中没有该记忆
+CacheEntry = Optional[Tuple[Optional[str], Optional[datetime]]]
+# 暂存变化中表示"移除缓存"的标记
+INVALIDATE = object()
+
+# 会话 info 中的暂存变化 (cache -> {缓存键: 缓存值}) 与监听注册标记
+_STAGED_KEY = "memory_store.staged"
+_LISTENING_KEY = "memory_store.listening"
+
+# 最后写入时间，用于在多条匹配中取最新的
+_LAST_WRITTEN = func.coalesce(AgentMemory.updated_at, AgentMemory.created_at)
+
+
+def _is_expired(expires_at: Optional[datetime]) -> bool:
+    """是否已过期（SQLite 读回的时间不带时区，按 UTC 处理）"""
+    if expires_at is None:
+        return False
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    return expires_at < datetime.now(timezone.utc)
+
+
+class MemoryCache:
+    """
+    retrieve 结果的 LRU 缓存
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        """
+        Args:
+            max_entries: 缓存条目上限（0 为不缓存）
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[CacheKey, CacheEntry]" = OrderedDict()
+        # 每次写入递增；查询期间有写入时不回填，避免旧值覆盖新值
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, cache_key: CacheKey) -> Tuple[bool, CacheEntry]:
+        """
+        查找缓存
+
+        Returns:
+            Tuple[bool, CacheEntry]: (是否命中, 缓存值)
+        """
+        if cache_key not in self._entries:
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(cache_key)
+        self.hits += 1
+        return True, self._entries[cache_key]
+
+    def fill(self, cache_key: CacheKey, entry: CacheEntry, version: int) -> None:
+        """回填查询结果（查询开始后有过写入则放弃）"""
+        if version == self.version:
+            self._put(cache_key, entry)
+
+    def apply(self, changes: Dict[CacheKey, Any]) -> None:
+        """
+        写入已提交的变化
+
+        Args:
+            changes: 缓存键 -> 新的缓存值，值为 INVALIDATE 时移除
+        """
+        self.version += 1
+        for cache_key, entry in changes.items():
+            if entry is INVALIDATE:
+                self._entries.pop(cache_key, None)
+            else:
+                self._put(cache_key, entry)
+
+    def _put(self, cache_key: CacheKey, entry: CacheEntry) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[cache_key] = entry
+        self._entries.move_to_end(cache_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self.version += 1
+        self._entries.clear()
+
+
+# 进程内共享的记忆缓存
+memory_cache = MemoryCache(settings.MEMORY_CACHE_SIZE)
+
+
+def _on_commit(sync_session) -> None:
+    """事务提交后把暂存的变化写入缓存"""
+    staged = sync_session.info.pop(_STAGED_KEY, None)
+    if not staged:
+        return
+    for cache, changes in staged.items():
+        cache.apply(changes)
+
+
+def _on_transaction_end(sync_session, transaction) -> None:
+    """最外层事务结束但未提交（回滚或关闭）：丢弃暂存的变化"""
+    if transaction.parent is None:
+        sync_session.info.pop(_STAGED_KEY, None)
+
 
 class MemoryStore:
     """
@@ -32,14 +152,43 @@ class MemoryStore:
     - 长期记忆（跨会话）
     - 上下文管理
     - 过期自动清理
+    - retrieve 的进程内缓存
     """
 
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, cache: Optional[MemoryCache] = None):
+        """
+        Args:
+            session: 数据库会话（由调用方提交）
+            cache: 记忆缓存（默认进程内共享的 memory_cache）
+        """
         self.session = session
+        self.cache = cache if cache is not None else memory_cache
         # Phase 4: 添加加密支持
         self._encryption_enabled = False
         self._cipher = None
 
+    def _is_staged(self, cache_key: CacheKey) -> bool:
+        """该缓存键在本事务内是否有尚未提交的变化"""
+        staged = self.session.sync_session.info.get(_STAGED_KEY, {})
+        return cache_key in staged.get(self.cache, {})
+
+    def _stage(self, changes: Dict[CacheKey, Any]) -> None:
+        """暂存缓存变化，在会话提交后写入缓存（每个会话只注册一次监听）"""
+        sync_session = self.session.sync_session
+        if not sync_session.info.get(_LISTENING_KEY):
+            event.listen(sync_session, "after_commit", _on_commit)
+            event.listen(sync_session, "after_transaction_end", _on_transaction_end)
+            sync_session.info[_LISTENING_KEY] = True
+        sync_session.info.setdefault(_STAGED_KEY, {}).setdefault(self.cache, {}).update(changes)
+
+    def _stage_deleted(self, memories: Iterable[AgentMemory]) -> None:
+        """删除记忆后，使可能返回它们的缓存键失效"""
+        changes = {}
+        for memory in memories:
+            changes[(memory.agent_id, memory.session_id, memory.key)] = INVALIDATE
+            changes[(memory.agent_id, None, memory.key)] = INVALIDATE
+        self._stage(changes)
+
     async def store(
         self,
         agent_id: str,
@@ -51,7 +200,7 @@ class MemoryStore:
         encrypt: bool = False
     ) -> AgentMemory:
         """
-        存储记忆
+        存储记忆（同一 agent_id / session_id / key 已存在时覆盖）
 
         Args:
             agent_id: 智能体 ID
@@ -63,10 +212,8 @@ class MemoryStore:
             encrypt: 是否加密（Phase 4 实现）
 
         Returns:
-            AgentMemory: 创建的记忆实例
+            AgentMemory: 创建或更新的记忆实例
         """
-        memory_id = f"mem_{uuid4().hex[:12]}"
-
         # 序列化值
         if isinstance(value, (dict, list)):
             value_str = json.dumps(value)
@@ -78,19 +225,55 @@ class MemoryStore:
             # TODO: 实现 AES-256-GCM 加密
             pass
 
-        memory = AgentMemory(
-            id=memory_id,
-            agent_id=agent_id,
-            session_id=session_id,
-            memory_type=memory_type.value,
-            key=key,
-            value=value_str,
-            expires_at=expires_at
+        result = await self.session.execute(
+            select(AgentMemory)
+            .where(
+                and_(
+                    AgentMemory.agent_id == agent_id,
+                    AgentMemory.key == key,
+                    AgentMemory.session_id == session_id
+                    if session_id is not None else AgentMemory.session_id.is_(None)
+                )
+            )
+            .order_by(_LAST_WRITTEN.desc())
         )
-
-        self.session.add(memory)
+        existing = result.scalars().all()
+
+        now = datetime.now(timezone.utc)
+        if existing:
+            # 保留最新的一条并覆盖，清理此前重复写入的行
+            memory = existing[0]
+            for duplicate in existing[1:]:
+                await self.session.delete(duplicate)
+            memory.memory_type = memory_type.value
+            memory.value = value_str
+            memory.expires_at = expires_at
+            memory.updated_at = now
+        else:
+            memory = AgentMemory(
+                id=f"mem_{uuid4().hex[:12]}",
+                agent_id=agent_id,
+                session_id=session_id,
+                memory_type=memory_type.value,
+                key=key,
+                value=value_str,
+                expires_at=expires_at,
+                created_at=now,
+                updated_at=now
+            )
+            self.session.add(memory)
         await self.session.flush()
 
+        entry = (value_str, expires_at)
+        # 不限会话的查询返回最新写入的记忆
+        changes = {(agent_id, None, key): entry}
+        if session_id is not None:
+            # 按会话查询只返回短期记忆
+            changes[(agent_id, session_id, key)] = (
+                entry if memory_type == MemoryType.SHORT_TERM else None
+            )
+        self._stage(changes)
+
         logger.debug(f"Memory stored: {agent_id}/{key} ({memory_type.value})")
         return memory
 
@@ -101,7 +284,7 @@ class MemoryStore:
         session_id: Optional[str] = None
     ) -> Optional[Any]:
         """
-        检索记忆
+        检索记忆（优先读缓存）
 
         Args:
             agent_id: 智能体 ID
@@ -109,8 +292,16 @@ class MemoryStore:
             session_id: 可选会话 ID（用于短期记忆）
 
         Returns:
-            Optional[Any]: 记忆值，不存在则返回 None
+            Optional[Any]: 记忆值，不存在或已过期则返回 None
         """
+        cache_key = (agent_id, session_id, key)
+        cacheable = not self._is_staged(cache_key)
+        if cacheable:
+            hit, entry = self.cache.get(cache_key)
+            if hit:
+                return self._decode(entry, agent_id, key)
+        version = self.cache.version
+
         # 构建查询条件
         conditions = [
             AgentMemory.agent_id == agent_id,
@@ -128,23 +319,33 @@ class MemoryStore:
         result = await self.session.execute(
             select(AgentMemory)
             .where(and_(*conditions))
-            .order_by(AgentMemory.created_at.desc())
+            .order_by(_LAST_WRITTEN.desc())
+            .limit(1)
         )
-        memory = result.scalar_one_or_none()
+        memory = result.scalars().first()
+
+        entry = (memory.value, memory.expires_at) if memory else None
+        if cacheable:
+            self.cache.fill(cache_key, entry, version)
+        return self._decode(entry, agent_id, key)
 
-        if not memory:
+    @staticmethod
+    def _decode(entry: CacheEntry, agent_id: str, key: str) -> Optional[Any]:
+        """把缓存值转换为记忆值"""
+        if entry is None:
             return None
 
+        value, expires_at = entry
         # 检查是否过期
-        if memory.expires_at and memory.expires_at < datetime.now(timezone.utc):
+        if _is_expired(expires_at):
             logger.debug(f"Memory expired: {agent_id}/{key}")
             return None
 
         # 尝试解析 JSON
         try:
-            return json.loads(memory.value)
-        except json.JSONDecodeError:
-            return memory.value
+            return json.loads(value)
+        except (TypeError, json.JSONDecodeError):
+            return value
 
     async def retrieve_all(
         self,
@@ -181,7 +382,7 @@ class MemoryStore:
             )
         )
 
-        query = query.order_by(AgentMemory.created_at.desc()).limit(limit)
+        query = query.order_by(_LAST_WRITTEN.desc()).limit(limit)
 
         result = await self.session.execute(query)
         return result.scalars().all()
@@ -214,11 +415,13 @@ class MemoryStore:
             query = query.where(AgentMemory.session_id == session_id)
 
         result = await self.session.execute(query)
-        memory = result.scalar_one_or_none()
+        memories = result.scalars().all()
 
-        if memory:
-            await self.session.delete(memory)
+        if memories:
+            for memory in memories:
+                await self.session.delete(memory)
             await self.session.flush()
+            self._stage_deleted(memories)
             logger.debug(f"Memory deleted: {agent_id}/{key}")
             return True
 
@@ -248,6 +451,7 @@ class MemoryStore:
             await self.session.delete(memory)
 
         await self.session.flush()
+        self._stage_deleted(memories)
 
         logger.info(f"Cleared {len(memories)} memories for session {session_id}")
         return len(memories)
@@ -273,6 +477,7 @@ class MemoryStore:
             await self.session.delete(memory)
 
         await self.session.flush()
+        self._stage_deleted(expired)
 
         logger.info(f"Cleaned up {len(expired)} expired memories")
         return len(expired)
@@ -124,33 +124,27 @@ class Summarizer:
         return None
 
     async def _summarize_with_ollama(self, prompt: str, max_length: int) -> Optional[str]:
-        """使用本地 Ollama 服务生成摘要"""
+        """使用本地 Ollama 服务生成摘要（经共享网关，与 AI 助手共用连接池和并发限制）"""
         try:
-            import httpx
-
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                response = await client.post(
-                    f"{self.ollama_base_url}/api/generate",
-                    json={
-                        "model": self.model,
-                        "prompt": prompt,
-                        "stream": False,
-                        "options": {
-                            "temperature": 0.3,
-                            "top_p": 0.9,
-                            "num_predict": 500
-                        }
-                    }
-                )
-                response.raise_for_status()
-                result = response.json()
-                summary = result.get("response", "").strip()
+            from ..assistant.adapters.ollama_gateway import get_ollama_gateway
+
+            gateway = get_ollama_gateway(self.ollama_base_url)
+            result = await gateway.generate({
+                "model": self.model,
+                "prompt": prompt,
+                "options": {
+                    "temperature": 0.3,
+                    "top_p": 0.9,
+                    "num_predict": 500
+                }
+            })
+            summary = result.get("response", "").strip()
 
-                # 清理摘要
-                summary = self._clean_summary(summary)
+            # 清理摘要
+            summary = self._clean_summary(summary)
 
-                logger.info(f"Generated summary using Ollama {self.model}")
-                return summary
+            logger.info(f"Generated summary using Ollama {self.model}")
+            return summary
 
         except Exception as e:
             logger.error(f"Ollama API error: {e}")
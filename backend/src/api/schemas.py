@@ -14,7 +14,7 @@ class AssistantChatRequest(BaseModel):
     """
     conversation_id: str
     message: str
-    model_type: str = "ollama"  # Default to ollama, can be 'openai', 'anthropic', 'ollama'
+    model_type: str = "ollama"  # Default to ollama, can be 'openai', 'anthropic', 'ollama', 'auto' (failover)
     api_key: Optional[str] = None  # Optional API key for services that require it
 
 
@@ -40,10 +40,13 @@ class ConversationSummary(BaseModel):
     Schema for conversation summaries in the list response.
     """
     id: str
-    title: str
+    title: Optional[str] = None
     model: str
-    created_at: str
-    updated_at: str
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+    last_message_at: Optional[str] = None
+    message_count: int = 0
+    preview: Optional[str] = None
 
 
 class ConversationListResponse(BaseModel):
@@ -66,10 +69,47 @@ class MessageDetail(BaseModel):
 class ConversationDetailResponse(BaseModel):
     """
     Schema for conversation detail response.
+
+    Messages are one page of history, newest first; pass next_cursor as
+    `before` to fetch older messages.
     """
     id: str
     title: str
     model: str
     created_at: str
     updated_at: str
-    messages: List[MessageDetail]
\ No newline at end of file
+    messages: List[MessageDetail]
+    next_cursor: Optional[str] = None
+    has_more: bool = False
+
+
+class UsageGroup(BaseModel):
+    """
+    Schema for one group (model, conversation or time bucket) of token usage.
+    """
+    key: str
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    requests: int
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+
+
+class UsageResponse(BaseModel):
+    """
+    Schema for a user's token usage over a time window.
+    """
+    start: datetime
+    end: datetime
+    group_by: str
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    requests: int
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+    groups: List[UsageGroup]
+    quota_used: Optional[int] = None
+    soft_limit: Optional[int] = None
+    hard_limit: Optional[int] = None
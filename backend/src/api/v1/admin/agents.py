@@ -16,6 +16,7 @@ from ....models import Agent, AgentSession
 from ....services.crud import get_crud_service
 from ....schemas.user import UserResponse
 from ....agents.manager import AgentManager, AgentStatus
+from ....message_bus import message_bus
 
 router = APIRouter()
 
@@ -371,6 +372,12 @@ async def get_agents_summary(
     }
 
 
+@router.get("/stats/message-bus")
+async def get_message_bus_metrics():
+    """获取消息总线指标（队列深度、计数、延迟直方图）"""
+    return message_bus.get_metrics()
+
+
 # ============================================================================
 # Agent Lifecycle Management (Sprint 2)
 # ============================================================================
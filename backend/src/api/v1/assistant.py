@@ -3,44 +3,53 @@ API routes for the AI Assistant.
 
 This module defines the API endpoints for the AI Assistant agent.
 """
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, List, Optional
 import uuid
 
 from ...core.database import get_db
 from ...core.security import get_current_user
 from ...models.user import User
 from ..schemas import AssistantChatRequest, AssistantChatResponse, ConversationListResponse
-from ..schemas import ConversationDetailResponse, NewConversationRequest
+from ..schemas import ConversationDetailResponse, NewConversationRequest, UsageResponse
 from ...agents.assistant.agent import AIAssistantAgent
-from ...agents.assistant.adapters.openai import OpenAIAdapter
-from ...agents.assistant.adapters.anthropic import AnthropicAdapter
-from ...agents.assistant.adapters.ollama import OllamaAdapter
+from ...agents.assistant.adapters.health import ProviderUnavailableError
+from ...agents.assistant.adapters.ollama_gateway import ollama_gateway_metrics
+from ...agents.assistant.adapters.registry import adapter_registry
+from ...agents.assistant.usage import QuotaExceededError, usage_aggregator
 
 
 router = APIRouter(prefix="/assistant", tags=["assistant"])
 
 
-def get_ai_adapter(model_type: str, api_key: Optional[str] = None):
+@asynccontextmanager
+async def leased_ai_adapter(
+    model_type: str,
+    api_key: Optional[str] = None,
+    model: Optional[str] = None
+) -> AsyncIterator:
     """
-    Factory function to get the appropriate AI adapter based on model type.
+    Lease the appropriate AI adapter based on model type.
+
+    Adapters come from the process-wide registry, so their HTTP clients and
+    keep-alive connections are reused across requests. The lease keeps the
+    adapter open until the block exits, even if the registry evicts it.
 
     Args:
-        model_type: Type of model ('openai', 'anthropic', 'ollama')
+        model_type: Type of model ('openai', 'anthropic', 'ollama', or 'auto' for failover)
         api_key: API key for the service (if required)
+        model: Optional model name (the adapter's default is used if omitted)
 
-    Returns:
-        An instance of the appropriate AI adapter
+    Yields:
+        A shared instance of the appropriate AI adapter
     """
-    if model_type.lower() == 'openai':
-        return OpenAIAdapter(api_key=api_key)
-    elif model_type.lower() == 'anthropic':
-        return AnthropicAdapter(api_key=api_key)
-    elif model_type.lower() == 'ollama':
-        return OllamaAdapter()  # Ollama doesn't require an API key
-    else:
+    if model_type.lower() not in adapter_registry.providers():
         raise HTTPException(status_code=400, detail=f"Unsupported model type: {model_type}")
+    async with adapter_registry.lease(model_type, model=model, api_key=api_key) as adapter:
+        yield adapter
 
 
 @router.post("/chat", response_model=AssistantChatResponse)
@@ -62,22 +71,26 @@ async def chat_with_assistant(
     """
     try:
         # Get the appropriate AI adapter based on the request
-        ai_adapter = get_ai_adapter(request.model_type, request.api_key)
+        async with leased_ai_adapter(request.model_type, request.api_key) as ai_adapter:
 
-        # Create an AI Assistant Agent
-        agent = AIAssistantAgent(ai_adapter, str(db.bind.url))
+            # Create an AI Assistant Agent that records usage and enforces quotas
+            agent = AIAssistantAgent(ai_adapter, str(db.bind.url), usage=usage_aggregator)
 
-        # Process the chat message
-        response = await agent.chat(
-            conversation_id=request.conversation_id,
-            message=request.message,
-            user_id=current_user.id
-        )
+            # Process the chat message
+            response = await agent.chat(
+                conversation_id=request.conversation_id,
+                message=request.message,
+                user_id=current_user.id
+            )
 
-        return AssistantChatResponse(response=response, conversation_id=request.conversation_id)
+            return AssistantChatResponse(response=response, conversation_id=request.conversation_id)
 
     except HTTPException:
         raise
+    except QuotaExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ProviderUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing chat request: {str(e)}")
 
@@ -101,18 +114,18 @@ async def create_conversation(
     """
     try:
         # Get the appropriate AI adapter
-        ai_adapter = get_ai_adapter(request.model_type, request.api_key)
+        async with leased_ai_adapter(request.model_type, request.api_key) as ai_adapter:
 
-        # Create an AI Assistant Agent
-        agent = AIAssistantAgent(ai_adapter, str(db.bind.url))
+            # Create an AI Assistant Agent
+            agent = AIAssistantAgent(ai_adapter, str(db.bind.url))
 
-        # Create the conversation
-        conversation_id = await agent.create_conversation(
-            user_id=str(current_user.id),  # Convert to string to match agent expectations
-            model=request.model or ai_adapter.model
-        )
+            # Create the conversation
+            conversation_id = await agent.create_conversation(
+                user_id=str(current_user.id),  # Convert to string to match agent expectations
+                model=request.model or ai_adapter.model
+            )
 
-        return {"conversation_id": conversation_id}
+            return {"conversation_id": conversation_id}
 
     except HTTPException:
         raise
@@ -140,13 +153,13 @@ async def get_conversations(
     try:
         # Create an AI Assistant Agent with a default adapter to access conversation functionality
         # In a production environment, you might want to store user's preferred adapter in settings
-        default_adapter = OllamaAdapter()  # Using Ollama as default
-        agent = AIAssistantAgent(default_adapter, str(db.bind.url))
+        async with leased_ai_adapter('ollama') as default_adapter:  # Using Ollama as default
+            agent = AIAssistantAgent(default_adapter, str(db.bind.url))
 
-        # Get the user's conversations
-        conversations = await agent.get_user_conversations(str(current_user.id), limit)
+            # Get the user's conversations
+            conversations = await agent.get_user_conversations(str(current_user.id), limit)
 
-        return ConversationListResponse(conversations=conversations)
+            return ConversationListResponse(conversations=conversations)
 
     except HTTPException:
         raise
@@ -158,18 +171,25 @@ async def get_conversations(
 async def get_conversation_detail(
     conversation_id: str,
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[str] = None
 ):
     """
-    Get details of a specific conversation.
+    Get details of a specific conversation with one page of its messages.
+
+    Messages are returned newest first. Pass the returned next_cursor as
+    `before` to load the previous (older) page.
 
     Args:
         conversation_id: ID of the conversation to retrieve
         current_user: Currently authenticated user
         db: Database session
+        limit: Maximum number of messages to return
+        before: Cursor (message ID) from the previous page
 
     Returns:
-        Details of the conversation including messages
+        Details of the conversation including one page of messages
     """
     try:
         # Validate UUID format
@@ -179,42 +199,26 @@ async def get_conversation_detail(
             raise HTTPException(status_code=400, detail="Invalid conversation ID format")
 
         # Create an AI Assistant Agent with a default adapter
-        default_adapter = OllamaAdapter()
-        agent = AIAssistantAgent(default_adapter, str(db.bind.url))
-
-        # Get the conversation history
-        messages = await agent.get_conversation_history(conversation_id)
-
-        # Verify the user has access to this conversation by checking if any messages exist
-        # This assumes that the agent's implementation checks permissions internally
-        # If needed, we could add an explicit permission check here
-
-        # In a more secure implementation, we'd verify ownership separately
-        # For now, we'll return the conversation details if messages exist
-        if not messages:
-            # If no messages exist, we still need to check if the conversation belongs to the user
-            # This is a simplified check; a better approach would be to directly check ownership
-            raise HTTPException(status_code=404, detail="Conversation not found")
-
-        # Create a basic conversation detail response
-        # In reality, we'd want to fetch conversation metadata as well
-        # For this implementation, we'll use the first message time as a proxy
-        first_msg_time = messages[0]['timestamp'] if messages and len(messages) > 0 else None
-        last_msg_time = messages[-1]['timestamp'] if messages else None
-
-        # Determine model from messages or use a default
-        # For now, we'll use a default model; in a real implementation,
-        # this would come from the conversation record
-        model_used = "unknown"  # Would come from conversation record
-
-        return ConversationDetailResponse(
-            id=conversation_id,
-            title=f"Conversation {conversation_id[:8]}...",
-            model=model_used,
-            created_at=first_msg_time or "",
-            updated_at=last_msg_time or "",
-            messages=messages
-        )
+        async with leased_ai_adapter('ollama') as default_adapter:
+            agent = AIAssistantAgent(default_adapter, str(db.bind.url))
+
+            # Verify the conversation exists and belongs to the user
+            conversation = await agent.conversation_manager.get_conversation(conversation_id)
+            if not conversation or conversation.user_id != str(current_user.id):
+                raise HTTPException(status_code=404, detail="Conversation not found")
+
+            page = await agent.get_conversation_history_page(conversation_id, limit=limit, before=before)
+
+            return ConversationDetailResponse(
+                id=conversation.id,
+                title=conversation.title or "",
+                model=conversation.model,
+                created_at=conversation.created_at.isoformat() if conversation.created_at else "",
+                updated_at=conversation.updated_at.isoformat() if conversation.updated_at else "",
+                messages=page["messages"],
+                next_cursor=page["next_cursor"],
+                has_more=page["next_cursor"] is not None
+            )
 
     except HTTPException:
         raise
@@ -247,16 +251,16 @@ async def delete_conversation(
             raise HTTPException(status_code=400, detail="Invalid conversation ID format")
 
         # Create an AI Assistant Agent with a default adapter
-        default_adapter = OllamaAdapter()
-        agent = AIAssistantAgent(default_adapter, str(db.bind.url))
+        async with leased_ai_adapter('ollama') as default_adapter:
+            agent = AIAssistantAgent(default_adapter, str(db.bind.url))
 
-        # Delete the conversation (this will check user permissions)
-        success = await agent.delete_conversation(conversation_id, str(current_user.id))
+            # Delete the conversation (this will check user permissions)
+            success = await agent.delete_conversation(conversation_id, str(current_user.id))
 
-        if not success:
-            raise HTTPException(status_code=404, detail="Conversation not found or unauthorized")
+            if not success:
+                raise HTTPException(status_code=404, detail="Conversation not found or unauthorized")
 
-        return {"message": "Conversation deleted successfully"}
+            return {"message": "Conversation deleted successfully"}
 
     except HTTPException:
         raise
@@ -285,12 +289,80 @@ async def get_available_models(current_user: User = Depends(get_current_user)):
     }
 
 
+USAGE_WINDOWS = {"day": timedelta(days=1), "week": timedelta(days=7), "month": timedelta(days=30)}
+
+
+@router.get("/usage", response_model=UsageResponse)
+async def get_usage(
+    current_user: User = Depends(get_current_user),
+    window: str = Query("day", pattern="^(day|week|month)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    group_by: str = Query("model", pattern="^(model|conversation|bucket)$")
+):
+    """
+    Get the current user's token usage over a time window.
+
+    Usage is read from the hourly token_usage ledger, never from the messages
+    table. An explicit start overrides the window.
+
+    Args:
+        current_user: Currently authenticated user
+        window: Trailing window ('day', 'week' or 'month') if start is omitted
+        start: Start of the time window
+        end: End of the time window (defaults to now)
+        group_by: Break usage down by 'model', 'conversation' or 'bucket' (hour)
+
+    Returns:
+        Totals and breakdown for the window, plus the current quota status
+    """
+    end = end or datetime.now(timezone.utc)
+    start = start or end - USAGE_WINDOWS[window]
+    user_id = str(current_user.id)
+
+    try:
+        usage = await usage_aggregator.get_usage(user_id, start, end, group_by=group_by)
+        response = UsageResponse(**usage)
+        if usage_aggregator.quotas_enabled:
+            try:
+                status = await usage_aggregator.check_quota(user_id)
+                response.quota_used = status.used
+            except QuotaExceededError as e:
+                response.quota_used = e.used
+            response.soft_limit = usage_aggregator.soft_limit
+            response.hard_limit = usage_aggregator.hard_limit
+        return response
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving usage: {str(e)}")
+
+
 @router.get("/health")
 async def assistant_health():
     """
     Health check for the assistant service.
 
+    Reports the circuit state of every pooled adapter and the queue depth and
+    latency of each local Ollama gateway. Availability probes are cached and use
+    free endpoints, so this never triggers a paid completion.
+
     Returns:
         Health status of the service
     """
-    return {"status": "healthy", "service": "AI Assistant"}
\ No newline at end of file
+    providers = {}
+    for (provider, model, _), adapter in adapter_registry.items():
+        name = f"{provider}:{model or getattr(adapter, 'model', 'default')}"
+        health = getattr(adapter, "health", None)
+        providers[name] = {
+            "available": await adapter.is_available(),
+            **(health.snapshot() if health else {}),
+        }
+        if hasattr(adapter, "stats"):
+            providers[name]["providers"] = adapter.stats()
+
+    result = {"status": "healthy", "service": "AI Assistant", "providers": providers}
+    if adapter_registry.response_cache is not None:
+        result["response_cache"] = adapter_registry.response_cache.stats()
+    gateways = ollama_gateway_metrics()
+    if gateways:
+        result["ollama_gateways"] = gateways
+    return result
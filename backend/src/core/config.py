@@ -1,6 +1,6 @@
 # backend/src/core/config.py
 import secrets
-from typing import Literal
+from typing import Literal, Optional
 from pydantic_settings import BaseSettings
 from pydantic import Field, field_validator
 
@@ -36,6 +36,55 @@ class Settings(BaseSettings):
     )
     FIRST_ADMIN_EMAIL: str = "admin@example.com"
 
+    # WebSocket: 每个连接的出站队列长度与慢消费者策略
+    WS_OUTBOUND_QUEUE_SIZE: int = 256
+    WS_SLOW_CONSUMER_POLICY: Literal["drop_oldest", "coalesce", "disconnect"] = "coalesce"
+    # 多 worker 广播通道: local | unix:/path/to/hub.sock | sqlite:/path/to/hub.db
+    WS_BACKPLANE: str = "local"
+    # 智能体状态增量的合并窗口（毫秒）
+    WS_STATUS_COALESCE_MS: int = 50
+    # 服务端心跳间隔与空闲超时（秒），超时未收到任何消息的连接会被回收
+    WS_HEARTBEAT_INTERVAL: float = 30.0
+    WS_IDLE_TIMEOUT: float = 90.0
+    # 是否把连接记录写入 ws_connections 表
+    WS_TRACK_CONNECTIONS: bool = True
+
+    # MessageBus: 并行处理的主题数、单个处理器超时（秒）与最多尝试次数
+    MESSAGE_BUS_WORKERS: int = 4
+    MESSAGE_BUS_HANDLER_TIMEOUT: float = 30.0
+    MESSAGE_BUS_MAX_ATTEMPTS: int = 3
+    # MessageBus: 消息与状态变更的批量写入间隔（秒）与批次大小
+    MESSAGE_BUS_FLUSH_INTERVAL: float = 0.05
+    MESSAGE_BUS_BATCH_SIZE: int = 500
+    # MessageBus: 待写入的变化数上限，数据库不可用时超出的最早变化被丢弃
+    MESSAGE_BUS_MAX_PENDING_WRITES: int = 100000
+    # MessageBus: PENDING 消息的认领有效期（秒），实例每 1/3 有效期续期并认领过期的消息
+    MESSAGE_BUS_CLAIM_TTL: float = 30.0
+    # agent_messages 保留：已结束投递的消息保留天数（0 为不清理）、检查间隔（秒）、每批删除行数
+    MESSAGE_RETENTION_DAYS: int = 30
+    MESSAGE_RETENTION_INTERVAL: float = 3600.0
+    MESSAGE_RETENTION_CHUNK_SIZE: int = 500
+    # MemoryStore.retrieve 的进程内 LRU 缓存条目数（0 为不缓存）
+    MEMORY_CACHE_SIZE: int = 4096
+
+    # AI 助手 model_type=auto：按顺序故障转移的 provider 列表，首个 token 超过该毫秒数时对冲请求（不设为不对冲）
+    ASSISTANT_FAILOVER_PROVIDERS: str = "ollama,openai,anthropic"
+    ASSISTANT_HEDGE_AFTER_MS: Optional[float] = None
+    # AI 助手确定性请求的响应缓存：空为关闭、memory 或 SQLite 文件路径；TTL（秒）
+    ASSISTANT_RESPONSE_CACHE: str = ""
+    ASSISTANT_RESPONSE_CACHE_TTL: float = 3600.0
+
+    # 本地 Ollama 网关：模型常驻时长、同时生成数上限、排队上限与读取超时（秒）
+    OLLAMA_KEEP_ALIVE: str = "30m"
+    OLLAMA_MAX_CONCURRENCY: int = 2
+    OLLAMA_MAX_QUEUE: int = 16
+    OLLAMA_READ_TIMEOUT: float = 300.0
+
+    # AI 助手 Token 用量：写入 token_usage 的间隔（秒），每用户每天 (UTC) 的软/硬配额（不设为不限制）
+    ASSISTANT_USAGE_FLUSH_INTERVAL: float = 30.0
+    ASSISTANT_TOKEN_QUOTA_SOFT: Optional[int] = None
+    ASSISTANT_TOKEN_QUOTA_HARD: Optional[int] = None
+
     @field_validator("SECRET_KEY")
     @classmethod
     def validate_secret_key(cls, v: str, info) -> str:
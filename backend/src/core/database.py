@@ -7,8 +7,11 @@
 
 import logging
 from pathlib import Path
-from typing import AsyncGenerator
+from typing import AsyncGenerator, List
 
+from sqlalchemy import Table, event, inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateColumn
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 from .config import settings
@@ -29,6 +32,15 @@ engine = create_async_engine(
     echo=settings.ENVIRONMENT == "development",
 )
 
+if DATABASE_URL.startswith("sqlite"):
+    @event.listens_for(engine.sync_engine, "connect")
+    def _set_sqlite_pragma(dbapi_connection, connection_record):
+        # 只对新建的数据库生效（已有数据库由 init_db 中的 enable_incremental_vacuum 切换）：
+        # 消息保留任务删除旧行后可用增量 VACUUM 归还空间
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        cursor.close()
+
 # 创建异步会话工厂
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
@@ -59,6 +71,108 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await session.close()
 
 
+def _add_missing_columns(conn: Connection, table: Table) -> List[str]:
+    """
+    为已存在的表补齐模型中新增的列和索引（create_all 不会修改已有表）
+
+    新增的列必须可为空或带 server_default。
+
+    Returns:
+        List[str]: 新增的列名
+    """
+    inspector = inspect(conn)
+    if not inspector.has_table(table.name):
+        return []
+    existing = {column["name"] for column in inspector.get_columns(table.name)}
+    added = []
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        ddl = CreateColumn(column).compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+        added.append(column.name)
+    for index in table.indexes:
+        index.create(conn, checkfirst=True)
+    if added:
+        logger.info(f"Added columns to {table.name}: {', '.join(added)}")
+    return added
+
+
+def _backfill_conversation_summary(conn: Connection) -> None:
+    """根据 messages 回填 conversations 的 message_count / last_message_at / preview"""
+    from ..agents.assistant.async_conversation_manager import AsyncConversationManager
+
+    conn.execute(text(
+        "UPDATE conversations SET "
+        "message_count = (SELECT COUNT(*) FROM messages WHERE messages.conversation_id = conversations.id), "
+        "last_message_at = (SELECT MAX(created_at) FROM messages WHERE messages.conversation_id = conversations.id)"
+    ))
+    rows = conn.execute(text(
+        "SELECT c.id, (SELECT m.content FROM messages m WHERE m.conversation_id = c.id "
+        "ORDER BY m.created_at DESC LIMIT 1) FROM conversations c"
+    )).all()
+    previews = [
+        {"id": conversation_id, "preview": AsyncConversationManager._derive_preview(content)}
+        for conversation_id, content in rows if content is not None
+    ]
+    if previews:
+        conn.execute(text("UPDATE conversations SET preview = :preview WHERE id = :id"), previews)
+    logger.info(f"Backfilled summary columns for {len(rows)} conversations")
+
+
+def upgrade_schema(conn: Connection) -> None:
+    """
+    升级已有数据库的表结构（幂等，每次启动在 create_all 之后执行）
+
+    Args:
+        conn: 同步连接（通过 AsyncConnection.run_sync 调用）
+    """
+    tables = Base.metadata.tables
+    if "messages" in tables:
+        # 历史分页的 (conversation_id, created_at) 复合索引取代原来的单列索引
+        _add_missing_columns(conn, tables["messages"])
+        conn.execute(text("DROP INDEX IF EXISTS ix_messages_conversation_id"))
+    if "conversations" in tables:
+        added = _add_missing_columns(conn, tables["conversations"])
+        if "message_count" in added and "messages" in tables:
+            _backfill_conversation_summary(conn)
+        # 旧表的 updated_at 没有默认值，从未更新的会话为 NULL，会在按 updated_at 排序的列表中沉底
+        conn.execute(text(
+            "UPDATE conversations SET updated_at = COALESCE(last_message_at, created_at) "
+            "WHERE updated_at IS NULL"
+        ))
+    if "agent_messages" in tables:
+        # topic / owner / claimed_at 与收件箱部分索引；旧消息 owner 为空，可被任一实例认领
+        _add_missing_columns(conn, tables["agent_messages"])
+    if "agent_memory" in tables:
+        # updated_at；旧记忆为空，按 created_at 视为最后写入时间
+        _add_missing_columns(conn, tables["agent_memory"])
+
+
+def enable_incremental_vacuum(conn: Connection) -> bool:
+    """
+    把已有的 SQLite 数据库切换到 auto_vacuum=INCREMENTAL（幂等）
+
+    已有数据库修改 auto_vacuum 后需要一次完整 VACUUM 才生效，耗时与文件
+    大小相关，只在模式不同时执行一次。需要在事务外（AUTOCOMMIT）调用。
+
+    Args:
+        conn: 同步连接（通过 AsyncConnection.run_sync 调用）
+
+    Returns:
+        bool: 是否执行了切换
+    """
+    if conn.dialect.name != "sqlite":
+        return False
+    if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2:
+        return False
+    logger.info("Switching SQLite database to auto_vacuum=INCREMENTAL (one-time VACUUM)...")
+    conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.exec_driver_sql("VACUUM")
+    logger.info("SQLite auto_vacuum switched to INCREMENTAL")
+    return True
+
+
 async def init_db():
     """初始化数据库表并创建初始数据"""
     from ..models import (
@@ -70,14 +184,27 @@ async def init_db():
     # 导入 AI Assistant 相关模型
     from ..models.conversation import Conversation
     from ..models.message import Message
+    from ..models.token_usage import TokenUsage
 
     logger.info("Initializing database...")
     async with engine.begin() as conn:
         # 在异步环境下创建所有表
         await conn.run_sync(Base.metadata.create_all)
+        # 已有的表补齐新增的列和索引
+        await conn.run_sync(upgrade_schema)
 
     logger.info("Database tables created successfully")
 
+    try:
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.run_sync(enable_incremental_vacuum)
+    except Exception as e:
+        logger.warning(
+            f"Failed to switch SQLite auto_vacuum to INCREMENTAL: {e}. "
+            "Stop the app and run: PRAGMA auto_vacuum=INCREMENTAL; VACUUM;"
+        )
+
     # 创建初始管理员
     async with AsyncSessionLocal() as session:
         try:
@@ -7,10 +7,16 @@ from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
 
 from .core.config import settings
-from .core.database import init_db
+from .core.database import AsyncSessionLocal, init_db
 from .api.v1.admin import auth, dashboard, agents, tools, labs, blog, profile, settings as admin_settings, task_agent, life_agent, review_agent, outfit_agent
 from .api.v1 import news as news_api
 from .websocket import handlers as ws_handlers
+from .websocket.hub import hub as ws_hub
+from .agents.assistant.adapters.registry import adapter_registry
+from .agents.assistant.adapters.ollama_gateway import close_ollama_gateways
+from .agents.assistant.usage import usage_aggregator
+from .agents.manager import AgentManager
+from .message_bus import message_bus, message_retention
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -38,8 +44,34 @@ async def lifespan(app: FastAPI):
         logger.info("数据库初始化完成。")
     except Exception as e:
         logger.error(f"数据库初始化失败：{e}")
+    usage_aggregator.start()
+    await ws_hub.start()
+    try:
+        async with AsyncSessionLocal() as session:
+            count = await AgentManager(session).load_state_snapshot()
+        logger.info(f"已载入 {count} 个活动智能体状态。")
+    except Exception as e:
+        logger.error(f"智能体状态快照载入失败：{e}")
+    try:
+        recovered = await message_bus.start()
+        logger.info(f"消息总线已启动，恢复 {recovered} 条待投递消息。")
+    except Exception as e:
+        logger.error(f"消息总线启动失败：{e}")
+    message_retention.start()
     yield
     # 关闭时的清理逻辑（如关闭数据库连接池等）
+    await message_retention.stop()
+    try:
+        await message_bus.stop()
+    except Exception as e:
+        logger.error(f"消息总线停止失败：{e}")
+    await ws_hub.stop()
+    try:
+        await usage_aggregator.stop()
+    except Exception as e:
+        logger.error(f"Token 用量写入失败：{e}")
+    await adapter_registry.close_all()
+    await close_ollama_gateways()
     logger.info("应用关闭，资源已清理。")
 
 
@@ -5,6 +5,13 @@ MessageBus - 异步消息总线
 提供智能体间的消息传递机制
 """
 
-from .bus import MessageBus, get_message_bus
+from .bus import (
+    MessageBus, MessageBusError, NoResponderError, RequestFailedError, RequestTimeoutError,
+    get_message_bus, message_bus
+)
+from .retention import MessageRetention, message_retention
 
-__all__ = ["MessageBus", "get_message_bus"]
+__all__ = [
+    "MessageBus", "MessageBusError", "NoResponderError", "RequestFailedError", "RequestTimeoutError",
+    "get_message_bus", "message_bus", "MessageRetention", "message_retention"
+]
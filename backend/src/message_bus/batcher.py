@@ -0,0 +1,279 @@
+# backend/src/message_bus/batcher.py
+"""
+MessageBatcher - agent_messages 的批量写入 (write-behind)
+
+publish 和状态变更只写入内存，由后台任务按 flush_interval 或积累到
+max_batch 时一次性写入：
+- 新消息合并为一条 executemany INSERT
+- 状态变更按目标状态分组为 UPDATE ... WHERE id IN (...)
+- 尚未写入的消息直接修改待插入的行，不再产生 UPDATE
+
+整批写入失败时逐行重写，找出失败的行放回队列，后台按指数退避重试；
+同一行失败 max_retries 次后丢弃并记录日志。待写入的变化超过 max_pending 时丢弃
+最早的，避免数据库长时间不可用时内存无限增长。
+
+代价是进程崩溃时会丢失最后一个批次内的变化。
+"""
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.agent_message import AgentMessage, MessageStatus
+
+logger = logging.getLogger(__name__)
+
+# 单条 IN (...) 的 id 数上限（低于 SQLite 的绑定参数限制）
+MAX_IDS_PER_UPDATE = 500
+# 写入失败日志的最小间隔（秒），期间的失败只计数
+ERROR_LOG_INTERVAL = 60.0
+# 写入失败后首次重试前的等待秒数，之后每次翻倍，不超过 MAX_RETRY_DELAY
+RETRY_BACKOFF = 1.0
+MAX_RETRY_DELAY = 30.0
+
+
+class MessageBatcher:
+    """
+    agent_messages 的批量写入器
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        flush_interval: float = 0.05,
+        max_batch: int = 500,
+        max_retries: int = 5,
+        max_pending: int = 100000
+    ):
+        """
+        Args:
+            session_factory: 数据库会话工厂
+            flush_interval: 后台写入间隔（秒）
+            max_batch: 待写入的变化达到该数量时立即写入
+            max_retries: 单行的最多写入次数，之后丢弃
+            max_pending: 待写入的变化数上限，超过时丢弃最早的
+        """
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_retries = max_retries
+        self.max_pending = max_pending
+
+        # 待插入的行: id -> row（保持发布顺序）
+        self._inserts: Dict[str, dict] = {}
+        # 已写入行的状态变更: id -> status（后到的覆盖先到的）
+        self._transitions: Dict[str, str] = {}
+        # 写入失败的次数: id -> 次数（插入和状态变更共用，写入成功后清除）
+        self._attempts: Dict[str, int] = {}
+        # 丢弃的变化数
+        self.dropped = 0
+        self._last_error_log = float("-inf")
+        self._suppressed_errors = 0
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        """待写入的变化数"""
+        return len(self._inserts) + len(self._transitions)
+
+    def add(self, rows: Iterable[dict]) -> None:
+        """
+        排队插入消息行
+
+        Args:
+            rows: AgentMessage 列值字典
+        """
+        for row in rows:
+            self._inserts[row["id"]] = row
+        self._enforce_limit()
+        self._maybe_wake()
+
+    def set_status(self, message_ids: Iterable[str], status: str) -> None:
+        """
+        排队更新消息状态
+
+        Args:
+            message_ids: 消息 ID
+            status: 新状态
+        """
+        for message_id in message_ids:
+            row = self._inserts.get(message_id)
+            if row is not None:
+                row["status"] = status
+                if status == MessageStatus.PROCESSED.value:
+                    row["processed_at"] = datetime.now(timezone.utc)
+            else:
+                self._transitions[message_id] = status
+        self._enforce_limit()
+        self._maybe_wake()
+
+    def _maybe_wake(self) -> None:
+        if self.pending >= self.max_batch:
+            self._wakeup.set()
+
+    def _enforce_limit(self) -> None:
+        """超过 max_pending 时丢弃最早的状态变更和待插入的行"""
+        overflow = self.pending - self.max_pending
+        if overflow <= 0:
+            return
+        for pending in (self._transitions, self._inserts):
+            while overflow > 0 and pending:
+                message_id = next(iter(pending))
+                del pending[message_id]
+                self._attempts.pop(message_id, None)
+                self.dropped += 1
+                overflow -= 1
+        self._log_error(f"Too many pending agent message writes, dropped oldest (total dropped: {self.dropped})")
+
+    def _log_error(self, message: str) -> None:
+        """记录错误日志，ERROR_LOG_INTERVAL 内最多一条"""
+        now = time.monotonic()
+        if now - self._last_error_log < ERROR_LOG_INTERVAL:
+            self._suppressed_errors += 1
+            return
+        if self._suppressed_errors:
+            message += f" ({self._suppressed_errors} similar errors suppressed)"
+        logger.error(message)
+        self._last_error_log = now
+        self._suppressed_errors = 0
+
+    async def flush(self) -> int:
+        """
+        写入所有待写入的变化
+
+        Returns:
+            int: 写入的变化数
+        """
+        async with self._lock:
+            if not self.pending:
+                return 0
+            inserts, self._inserts = list(self._inserts.values()), {}
+            transitions, self._transitions = self._transitions, {}
+
+            try:
+                await self._write(inserts, transitions)
+            except Exception as e:
+                self._log_error(f"Error flushing agent messages, retrying row by row: {e}")
+                failed_inserts, failed_transitions = await self._write_each(inserts, transitions)
+                self._restore(failed_inserts, failed_transitions)
+                if failed_inserts or failed_transitions:
+                    raise
+                return len(inserts) + len(transitions)
+            for message_id in (*(row["id"] for row in inserts), *transitions):
+                self._attempts.pop(message_id, None)
+            return len(inserts) + len(transitions)
+
+    async def _write(self, inserts: List[dict], transitions: Dict[str, str]) -> None:
+        """在一个事务中写入插入和状态变更"""
+        by_status: Dict[str, List[str]] = defaultdict(list)
+        for message_id, status in transitions.items():
+            by_status[status].append(message_id)
+
+        async with self.session_factory() as session:
+            if inserts:
+                await session.execute(insert(AgentMessage), inserts)
+            for status, message_ids in by_status.items():
+                values = {"status": status}
+                if status == MessageStatus.PROCESSED.value:
+                    values["processed_at"] = datetime.now(timezone.utc)
+                for start in range(0, len(message_ids), MAX_IDS_PER_UPDATE):
+                    await session.execute(
+                        update(AgentMessage)
+                        .where(AgentMessage.id.in_(message_ids[start:start + MAX_IDS_PER_UPDATE]))
+                        .values(**values)
+                    )
+            await session.commit()
+
+    async def _write_each(
+        self,
+        inserts: List[dict],
+        transitions: Dict[str, str]
+    ) -> Tuple[List[dict], Dict[str, str]]:
+        """
+        逐行写入，每行一个事务
+
+        Returns:
+            tuple: 写入失败的插入行和状态变更
+        """
+        failed_inserts = []
+        failed_transitions = {}
+        for row in inserts:
+            try:
+                await self._write([row], {})
+                self._attempts.pop(row["id"], None)
+            except Exception:
+                failed_inserts.append(row)
+        for message_id, status in transitions.items():
+            try:
+                await self._write([], {message_id: status})
+                self._attempts.pop(message_id, None)
+            except Exception:
+                failed_transitions[message_id] = status
+        return failed_inserts, failed_transitions
+
+    def _restore(self, inserts: List[dict], transitions: Dict[str, str]) -> None:
+        """把写入失败的变化放回队列；失败次数达到 max_retries 的丢弃"""
+        restored = {}
+        for row in inserts:
+            if self._record_failure(row["id"]):
+                restored[row["id"]] = row
+        # 期间新到的行和状态变更优先
+        restored.update(self._inserts)
+        self._inserts = restored
+        for message_id, status in transitions.items():
+            if self._record_failure(message_id):
+                self._transitions.setdefault(message_id, status)
+        self._enforce_limit()
+
+    def _record_failure(self, message_id: str) -> bool:
+        """记录一次写入失败，返回是否还可以重试"""
+        attempts = self._attempts.get(message_id, 0) + 1
+        if attempts < self.max_retries:
+            self._attempts[message_id] = attempts
+            return True
+        self._attempts.pop(message_id, None)
+        self.dropped += 1
+        self._log_error(f"Dropped agent message write for {message_id} after {attempts} attempts")
+        return False
+
+    async def _flush_loop(self) -> None:
+        failures = 0
+        while True:
+            if failures:
+                # 写入失败后退避，不因积压提前唤醒
+                await asyncio.sleep(min(RETRY_BACKOFF * 2 ** (failures - 1), MAX_RETRY_DELAY))
+            else:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+                failures = 0
+            except Exception:
+                failures += 1  # 已记录日志，退避后重试
+
+    def start(self) -> None:
+        """启动后台写入任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """停止后台写入任务并写入剩余的变化"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
@@ -3,23 +3,84 @@
 MessageBus - 异步消息总线
 
 实现发布/订阅模式，支持：
-- 主题订阅
+- 主题订阅（支持 "*" / "#" 通配符，见 router.py）
 - 消息持久化
 - 异步处理
+
+进程内只有一个总线实例 (message_bus)，由应用 lifespan 启动和停止，
+使用自己的会话工厂，不绑定请求级会话。启动时恢复数据库中仍为 PENDING
+的消息并重新投递（至少一次语义）。
+
+认领：持久化的消息记录负责投递的实例 (owner)。运行中的实例定期续期自己的
+PENDING 消息，并用一条 UPDATE 原子地认领无主或认领已过期的消息，
+多个进程同时启动时每条消息只会被一个实例恢复。
+
+分发：每个主题一个 FIFO 队列，同一主题同时只有一条消息在处理（保证主题内
+顺序），不同主题由 worker 池并行处理。一条消息的多个处理器并发执行，
+每个处理器有超时，失败后重试，超过次数进入死信（DEAD_LETTER_TOPIC）。
+
+持久化：消息插入和状态变更由 MessageBatcher 批量写入（见 batcher.py），
+读取前先写入待写入的变化。
+
+请求/响应：request() 发布带 correlation_id 和 reply_to 的消息并等待回复。
+应答方是订阅模式不含 "#" 的处理器，返回非 None 值即作为回复；也可稍后调用
+reply() 或向 reply_to 发布带相同 correlation_id 的消息。"#" 订阅（监控等）
+照常收到请求，但返回值和失败都不影响请求结果。回复通过内存中的 future 表匹配，不轮询数据库。
+
+指标：get_metrics() 返回队列深度、计数，以及发布到处理完成和单个处理器
+耗时的延迟直方图（见 metrics.py）。
 """
 
 import asyncio
 import logging
-from typing import Dict, List, Callable, Any, Optional
-from collections import defaultdict
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Deque, Dict, List, Callable, Any, Optional, Set, Tuple
+from uuid import uuid4
+from collections import deque
 
-from sqlalchemy import select, and_
+from sqlalchemy import select, update, and_, or_, text
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..models.agent_message import AgentMessage, MessageType, MessageStatus
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from ..models.agent_message import INBOX_CONDITION, AgentMessage, MessageType, MessageStatus
+from .batcher import MessageBatcher
+from .metrics import LatencyHistogram
+from .router import TopicRouter
 
 logger = logging.getLogger(__name__)
 
+# 处理失败次数超限的消息会发布到该主题（不持久化）
+DEAD_LETTER_TOPIC = "bus.dead_letter"
+
+
+class MessageBusError(Exception):
+    """消息总线基础异常"""
+    pass
+
+
+class NoResponderError(MessageBusError):
+    """请求的主题没有订阅者"""
+    pass
+
+
+class RequestTimeoutError(MessageBusError):
+    """请求在超时前没有收到回复"""
+    pass
+
+
+class RequestFailedError(MessageBusError):
+    """请求的处理器全部失败"""
+    pass
+
+
+def reply_topic(topic: str) -> str:
+    """请求主题对应的回复主题: agent.2.request -> agent.2.response"""
+    if topic.endswith(".request"):
+        return topic[:-len(".request")] + ".response"
+    return f"{topic}.response"
+
 
 class MessageBus:
     """
@@ -28,15 +89,84 @@ class MessageBus:
     管理智能体间的消息传递
     """
 
-    def __init__(self, session: AsyncSession):
-        self.session = session
-        # 内存中的订阅者: topic -> List[handler]
-        self._subscribers: Dict[str, List[Callable]] = defaultdict(list)
-        # 消息队列
-        self._queue: asyncio.Queue = asyncio.Queue()
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], AsyncSession]] = None,
+        workers: Optional[int] = None,
+        handler_timeout: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        retry_backoff: float = 0.1,
+        max_dead_letters: int = 1000,
+        flush_interval: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        claim_ttl: Optional[float] = None
+    ):
+        """
+        Args:
+            session_factory: 数据库会话工厂（默认 AsyncSessionLocal）
+            workers: 并行处理的主题数上限（默认 MESSAGE_BUS_WORKERS）
+            handler_timeout: 单个处理器的超时秒数（默认 MESSAGE_BUS_HANDLER_TIMEOUT）
+            max_attempts: 处理器的最多尝试次数（默认 MESSAGE_BUS_MAX_ATTEMPTS）
+            retry_backoff: 首次重试前的等待秒数，之后每次翻倍
+            max_dead_letters: 内存中保留的死信条数
+            flush_interval: 批量写入间隔秒数（默认 MESSAGE_BUS_FLUSH_INTERVAL）
+            batch_size: 立即写入的批次大小（默认 MESSAGE_BUS_BATCH_SIZE）
+            claim_ttl: PENDING 消息的认领有效期秒数（默认 MESSAGE_BUS_CLAIM_TTL）
+        """
+        self.session_factory = session_factory or AsyncSessionLocal
+        self.workers = workers or settings.MESSAGE_BUS_WORKERS
+        self.handler_timeout = handler_timeout or settings.MESSAGE_BUS_HANDLER_TIMEOUT
+        self.max_attempts = max_attempts or settings.MESSAGE_BUS_MAX_ATTEMPTS
+        self.retry_backoff = retry_backoff
+        self.claim_ttl = claim_ttl or settings.MESSAGE_BUS_CLAIM_TTL
+        # 本实例的标识，写入消息的 owner 列
+        self.instance_id = uuid4().hex
+        # 消息行与状态变更的批量写入
+        self._batcher = MessageBatcher(
+            self.session_factory,
+            flush_interval=flush_interval or settings.MESSAGE_BUS_FLUSH_INTERVAL,
+            max_batch=batch_size or settings.MESSAGE_BUS_BATCH_SIZE,
+            max_pending=settings.MESSAGE_BUS_MAX_PENDING_WRITES
+        )
+        # 内存中的订阅者: 主题模式 trie
+        self._router = TopicRouter()
+        # 每个主题的消息队列: topic -> deque
+        self._topic_queues: Dict[str, Deque[dict]] = {}
+        # 有待处理消息且未在处理中的主题
+        self._ready: asyncio.Queue = asyncio.Queue()
+        # 已排入 _ready 或正在处理的主题
+        self._scheduled: Set[str] = set()
+        self._pending = 0
+        # 等待回复的请求: correlation_id -> Future
+        self._requests: Dict[str, asyncio.Future] = {}
+        # 死信
+        self._dead_letters: Deque[dict] = deque(maxlen=max_dead_letters)
+        # 指标: 发布到所有处理器完成 / 单个处理器（含重试）
+        self.dispatch_latency = LatencyHistogram()
+        self.handler_latency = LatencyHistogram()
+        self._published = 0
+        self._delivered = 0
+        self._failed = 0
         # 处理任务
         self._processing = False
-        self._processor_task: Optional[asyncio.Task] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._claim_task: Optional[asyncio.Task] = None
+
+    @property
+    def queue_depth(self) -> int:
+        """待处理的消息数"""
+        return self._pending
+
+    def _enqueue(self, item: dict) -> None:
+        """放入主题队列，主题空闲时排入待处理"""
+        topic = item["topic"]
+        item["enqueued_at"] = time.perf_counter()
+        self._topic_queues.setdefault(topic, deque()).append(item)
+        self._pending += 1
+        self._published += 1
+        if topic not in self._scheduled:
+            self._scheduled.add(topic)
+            self._ready.put_nowait(topic)
 
     async def publish(
         self,
@@ -44,7 +174,8 @@ class MessageBus:
         message: dict,
         from_agent_id: Optional[str] = None,
         to_agent_id: Optional[str] = None,
-        persist: bool = True
+        persist: bool = True,
+        correlation_id: Optional[str] = None
     ) -> Optional[AgentMessage]:
         """
         发布消息到主题
@@ -55,38 +186,120 @@ class MessageBus:
             from_agent_id: 发送方智能体 ID
             to_agent_id: 接收方智能体 ID
             persist: 是否持久化到数据库
+            correlation_id: 等待回复的请求 ID（由 request 设置）
 
         Returns:
-            Optional[AgentMessage]: 如果持久化，返回创建的消息实例
+            Optional[AgentMessage]: 如果持久化，返回创建的消息实例（随下一批写入）
         """
+        # 回复消息直接唤醒等待中的请求
+        if isinstance(message, dict) and message.get("correlation_id") in self._requests and not correlation_id:
+            self._resolve(message["correlation_id"], message)
+
         # 持久化到数据库
         agent_message = None
         if persist and from_agent_id and to_agent_id:
-            agent_message = await self._persist_message(
-                from_agent_id, to_agent_id, topic, message
-            )
+            row = self._message_row(from_agent_id, to_agent_id, topic, message)
+            self._batcher.add([row])
+            agent_message = AgentMessage(**row)
 
         # 放入内存队列
-        await self._queue.put({
+        self._enqueue({
             "topic": topic,
             "message": message,
             "from_agent_id": from_agent_id,
             "to_agent_id": to_agent_id,
-            "db_id": agent_message.id if agent_message else None
+            "db_id": agent_message.id if agent_message else None,
+            "correlation_id": correlation_id
         })
 
         logger.debug(f"Message published to {topic}")
         return agent_message
 
+    async def request(
+        self,
+        topic: str,
+        payload: dict,
+        timeout: float = 10.0,
+        from_agent_id: Optional[str] = None,
+        to_agent_id: Optional[str] = None,
+        persist: bool = False
+    ) -> Any:
+        """
+        发布请求并等待回复
+
+        处理器收到的消息附带 correlation_id 和 reply_to 字段。只有订阅模式不含
+        "#" 的处理器作为应答方。
+
+        Args:
+            topic: 请求主题（如 agent.2.request）
+            payload: 请求内容
+            timeout: 等待回复的秒数
+            from_agent_id: 发送方智能体 ID
+            to_agent_id: 接收方智能体 ID
+            persist: 是否持久化请求
+
+        Returns:
+            Any: 处理器的返回值，或 reply() 发布的回复消息
+
+        Raises:
+            NoResponderError: 主题没有应答方
+            RequestTimeoutError: 超时未收到回复
+            RequestFailedError: 没有应答方回复且有应答方失败
+        """
+        if not self._router.responders(topic):
+            raise NoResponderError(f"No responders for {topic}")
+
+        correlation_id = uuid4().hex
+        future = asyncio.get_running_loop().create_future()
+        self._requests[correlation_id] = future
+        try:
+            await self.publish(
+                topic,
+                {**payload, "correlation_id": correlation_id, "reply_to": reply_topic(topic)},
+                from_agent_id=from_agent_id,
+                to_agent_id=to_agent_id,
+                persist=persist,
+                correlation_id=correlation_id
+            )
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            raise RequestTimeoutError(f"No reply on {topic} within {timeout}s") from None
+        finally:
+            self._requests.pop(correlation_id, None)
+
+    async def reply(self, request: dict, payload: dict) -> None:
+        """
+        回复 request() 发出的请求（也会投递给回复主题的订阅者）
+
+        Args:
+            request: 处理器收到的请求消息
+            payload: 回复内容
+        """
+        await self.publish(
+            request["reply_to"],
+            {**payload, "correlation_id": request["correlation_id"]},
+            persist=False
+        )
+
+    def _resolve(self, correlation_id: str, value: Any) -> None:
+        future = self._requests.get(correlation_id)
+        if future is not None and not future.done():
+            future.set_result(value)
+
+    def _fail(self, correlation_id: str, error: Exception) -> None:
+        future = self._requests.get(correlation_id)
+        if future is not None and not future.done():
+            future.set_exception(error)
+
     async def subscribe(self, topic: str, handler: Callable[[dict], Any]) -> None:
         """
         订阅主题
 
         Args:
-            topic: 主题名称
+            topic: 主题名称或模式，"*" 匹配一段，"#" 匹配零或多段（如 "agent.#"）
             handler: 处理函数 async (message) -> None
         """
-        self._subscribers[topic].append(handler)
+        self._router.add(topic, handler)
         logger.info(f"Handler subscribed to {topic}")
 
     async def unsubscribe(self, topic: str, handler: Callable) -> None:
@@ -94,11 +307,10 @@ class MessageBus:
         取消订阅
 
         Args:
-            topic: 主题名称
+            topic: 订阅时使用的主题名称或模式
             handler: 处理函数
         """
-        if topic in self._subscribers and handler in self._subscribers[topic]:
-            self._subscribers[topic].remove(handler)
+        if self._router.remove(topic, handler):
             logger.info(f"Handler unsubscribed from {topic}")
 
     async def broadcast(
@@ -120,85 +332,315 @@ class MessageBus:
         Returns:
             List[AgentMessage]: 创建的消息实例列表
         """
-        messages = []
-
+        rows = []
+        if persist and from_agent_id:
+            rows = [
+                self._message_row(from_agent_id, to_agent_id, f"agent.{to_agent_id}", message)
+                for to_agent_id in target_agents
+            ]
+            # 所有目标的行在同一批次中插入
+            self._batcher.add(rows)
+
+        db_ids = {row["to_agent_id"]: row["id"] for row in rows}
         for to_agent_id in target_agents:
-            agent_message = await self.publish(
-                topic=f"agent.{to_agent_id}",
-                message=message,
-                from_agent_id=from_agent_id,
-                to_agent_id=to_agent_id,
-                persist=persist
-            )
-            if agent_message:
-                messages.append(agent_message)
+            self._enqueue({
+                "topic": f"agent.{to_agent_id}",
+                "message": message,
+                "from_agent_id": from_agent_id,
+                "to_agent_id": to_agent_id,
+                "db_id": db_ids.get(to_agent_id)
+            })
+        messages = [AgentMessage(**row) for row in rows]
 
         logger.info(f"Broadcasted message to {len(target_agents)} agents")
         return messages
 
+    async def start(self) -> int:
+        """
+        恢复未投递的消息并启动处理（应用启动时调用一次）
+
+        Returns:
+            int: 恢复的消息数
+        """
+        try:
+            recovered = await self.recover_pending()
+        except Exception as e:
+            logger.error(f"Failed to recover pending messages: {e}")
+            recovered = 0
+        await self.start_processing()
+        if self._claim_task is None or self._claim_task.done():
+            self._claim_task = asyncio.create_task(self._claim_loop())
+        return recovered
+
+    async def stop(self) -> None:
+        """停止处理并写入待写入的变化（队列中已持久化的消息下次启动时恢复）"""
+        if self._claim_task is not None:
+            self._claim_task.cancel()
+            try:
+                await self._claim_task
+            except asyncio.CancelledError:
+                pass
+            self._claim_task = None
+        await self.stop_processing()
+        await self._batcher.stop()
+
+    async def flush(self) -> int:
+        """
+        立即写入待写入的消息和状态变更
+
+        Returns:
+            int: 写入的变化数
+        """
+        return await self._batcher.flush()
+
+    async def recover_pending(self) -> int:
+        """
+        认领数据库中无主或认领已过期的 PENDING 消息并重新放入队列
+
+        认领是一条 UPDATE ... RETURNING，并发执行时每条消息只会返回给一个实例。
+
+        Returns:
+            int: 恢复的消息数
+        """
+        now = datetime.now(timezone.utc)
+        async with self.session_factory() as session:
+            result = await session.execute(
+                update(AgentMessage)
+                .where(
+                    AgentMessage.status == MessageStatus.PENDING.value,
+                    or_(
+                        AgentMessage.owner.is_(None),
+                        and_(
+                            AgentMessage.owner != self.instance_id,
+                            AgentMessage.claimed_at < now - timedelta(seconds=self.claim_ttl)
+                        )
+                    )
+                )
+                .values(owner=self.instance_id, claimed_at=now)
+                .returning(
+                    AgentMessage.id, AgentMessage.topic, AgentMessage.payload,
+                    AgentMessage.from_agent_id, AgentMessage.to_agent_id, AgentMessage.created_at
+                )
+                .execution_options(synchronize_session=False)
+            )
+            pending = sorted(result.all(), key=lambda row: row.created_at)
+            await session.commit()
+
+        for row in pending:
+            self._enqueue({
+                "topic": row.topic or f"agent.{row.to_agent_id}",
+                "message": row.payload,
+                "from_agent_id": row.from_agent_id,
+                "to_agent_id": row.to_agent_id,
+                "db_id": row.id
+            })
+
+        if pending:
+            logger.info(f"Recovered {len(pending)} pending messages")
+        return len(pending)
+
+    async def renew_claims(self) -> int:
+        """
+        续期本实例仍为 PENDING 的消息的认领
+
+        Returns:
+            int: 续期的消息数
+        """
+        async with self.session_factory() as session:
+            result = await session.execute(
+                update(AgentMessage)
+                .where(
+                    AgentMessage.status == MessageStatus.PENDING.value,
+                    AgentMessage.owner == self.instance_id
+                )
+                .values(claimed_at=datetime.now(timezone.utc))
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+            return result.rowcount
+
+    async def _claim_loop(self) -> None:
+        """每 1/3 认领有效期续期自己的消息，并接管已退出实例留下的消息"""
+        while True:
+            await asyncio.sleep(self.claim_ttl / 3)
+            try:
+                await self.flush()
+                await self.renew_claims()
+                await self.recover_pending()
+            except Exception as e:
+                logger.error(f"Failed to renew message claims: {e}")
+
     async def start_processing(self) -> None:
-        """启动消息处理循环"""
+        """启动消息处理 worker"""
         if self._processing:
             return
 
         self._processing = True
-        self._processor_task = asyncio.create_task(self._process_messages())
-        logger.info("MessageBus processing started")
+        self._batcher.start()
+        self._worker_tasks = [
+            asyncio.create_task(self._process_messages())
+            for _ in range(self.workers)
+        ]
+        logger.info(f"MessageBus processing started with {self.workers} workers")
 
     async def stop_processing(self) -> None:
-        """停止消息处理循环"""
+        """停止消息处理 worker"""
         self._processing = False
-        if self._processor_task:
-            self._processor_task.cancel()
+        for task in self._worker_tasks:
+            task.cancel()
+        for task in self._worker_tasks:
             try:
-                await self._processor_task
+                await task
             except asyncio.CancelledError:
                 pass
+        self._worker_tasks = []
         logger.info("MessageBus processing stopped")
 
     async def _process_messages(self) -> None:
-        """消息处理循环"""
+        """worker 循环：每次取一个就绪主题，处理其队首消息"""
         while self._processing:
+            topic = await self._ready.get()
+            queue = self._topic_queues[topic]
+            item = queue.popleft()
+            self._pending -= 1
             try:
-                # 获取消息
-                item = await asyncio.wait_for(
-                    self._queue.get(),
-                    timeout=1.0
-                )
-
-                topic = item["topic"]
-                message = item["message"]
-                db_id = item.get("db_id")
-
-                # 调用订阅者
-                handlers = self._subscribers.get(topic, [])
-                for handler in handlers:
-                    try:
-                        await handler(message)
-                    except Exception as e:
-                        logger.error(f"Handler error for {topic}: {e}")
+                await self._dispatch(item)
+            except Exception as e:
+                logger.error(f"Message processing error: {e}")
+            finally:
+                if queue:
+                    # 排到就绪队列末尾，让其他主题轮流处理
+                    self._ready.put_nowait(topic)
+                else:
+                    del self._topic_queues[topic]
+                    self._scheduled.discard(topic)
+
+    async def _dispatch(self, item: dict) -> None:
+        """
+        并发调用该主题的所有处理器，并更新数据库状态
 
-                # 更新数据库状态
-                if db_id:
-                    await self._mark_delivered(db_id)
+        请求消息在响应者处理器完成后立即答复，不等待 "#" 等监听处理器。
+        """
+        topic = item["topic"]
+        handlers = self._router.match(topic)
+        tasks = [asyncio.create_task(self._call_handler(handler, item)) for handler in handlers]
+
+        correlation_id = item.get("correlation_id")
+        if correlation_id:
+            responders = self._router.responders(topic)
+            outcomes = await asyncio.gather(
+                *(task for handler, task in zip(handlers, tasks) if handler in responders)
+            )
+            replies = [value for ok, value in outcomes if ok and value is not None]
+            if replies:
+                self._resolve(correlation_id, replies[0])
+            elif not all(ok for ok, _ in outcomes):
+                self._fail(correlation_id, RequestFailedError(f"Responder failed for {topic}"))
+
+        results = await asyncio.gather(*tasks)
+        succeeded = all(ok for ok, _ in results)
+        self.dispatch_latency.observe(time.perf_counter() - item["enqueued_at"])
+        if succeeded:
+            self._delivered += 1
+        else:
+            self._failed += 1
+
+        db_id = item.get("db_id")
+        if db_id:
+            status = MessageStatus.DELIVERED if succeeded else MessageStatus.FAILED
+            self._batcher.set_status([db_id], status.value)
+
+    async def _call_handler(self, handler: Callable, item: dict) -> Tuple[bool, Any]:
+        """
+        调用处理器，超时或异常时重试，超过次数转为死信
 
+        Returns:
+            Tuple[bool, Any]: (是否处理成功, 处理器返回值)
+        """
+        topic = item["topic"]
+        error = None
+        started = time.perf_counter()
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                result = await asyncio.wait_for(handler(item["message"]), timeout=self.handler_timeout)
+                self.handler_latency.observe(time.perf_counter() - started)
+                return True, result
             except asyncio.TimeoutError:
-                continue
+                error = f"timed out after {self.handler_timeout}s"
             except Exception as e:
-                logger.error(f"Message processing error: {e}")
+                error = str(e)
+            logger.warning(f"Handler error for {topic} (attempt {attempt}/{self.max_attempts}): {error}")
+            if attempt < self.max_attempts:
+                await asyncio.sleep(self.retry_backoff * 2 ** (attempt - 1))
+
+        self.handler_latency.observe(time.perf_counter() - started)
+        if topic != DEAD_LETTER_TOPIC:
+            await self._dead_letter(item, handler, error)
+        return False, None
+
+    async def _dead_letter(self, item: dict, handler: Callable, error: str) -> None:
+        """记录死信并发布到 DEAD_LETTER_TOPIC"""
+        dead_letter = {
+            "topic": item["topic"],
+            "message": item["message"],
+            "from_agent_id": item.get("from_agent_id"),
+            "to_agent_id": item.get("to_agent_id"),
+            "db_id": item.get("db_id"),
+            "handler": getattr(handler, "__qualname__", repr(handler)),
+            "error": error,
+            "attempts": self.max_attempts,
+            "failed_at": time.time(),
+        }
+        self._dead_letters.append(dead_letter)
+        logger.error(f"Message on {item['topic']} dead-lettered: {error}")
+        await self.publish(DEAD_LETTER_TOPIC, dead_letter, persist=False)
+
+    def get_dead_letters(self, limit: int = 100) -> List[dict]:
+        """
+        获取最近的死信
+
+        Args:
+            limit: 数量限制
+
+        Returns:
+            List[dict]: 死信列表（最新的在前）
+        """
+        return list(self._dead_letters)[::-1][:limit]
+
+    def get_metrics(self) -> dict:
+        """
+        总线运行指标
 
-    async def _persist_message(
+        Returns:
+            dict: 队列深度、计数、待写入变化数和延迟直方图（毫秒）
+        """
+        return {
+            "queue_depth": self._pending,
+            "active_topics": len(self._topic_queues),
+            "ready_topics": self._ready.qsize(),
+            "workers": len(self._worker_tasks),
+            "topic_patterns": len(self._router.patterns()),
+            "published": self._published,
+            "delivered": self._delivered,
+            "failed": self._failed,
+            "dead_letters": len(self._dead_letters),
+            "pending_requests": len(self._requests),
+            "pending_writes": self._batcher.pending,
+            "dropped_writes": self._batcher.dropped,
+            "latency": {
+                "dispatch": self.dispatch_latency.snapshot(),
+                "handler": self.handler_latency.snapshot(),
+            },
+        }
+
+    def _message_row(
         self,
         from_agent_id: str,
         to_agent_id: str,
         topic: str,
         payload: dict
-    ) -> AgentMessage:
-        """持久化消息到数据库"""
-        from uuid import uuid4
-
-        message_id = f"msg_{uuid4().hex[:12]}"
-
+    ) -> dict:
+        """构造待插入的消息行"""
         # 确定消息类型
         msg_type = MessageType.EVENT
         if topic.endswith(".request"):
@@ -206,30 +648,20 @@ class MessageBus:
         elif topic.endswith(".response"):
             msg_type = MessageType.RESPONSE
 
-        message = AgentMessage(
-            id=message_id,
-            from_agent_id=from_agent_id,
-            to_agent_id=to_agent_id,
-            message_type=msg_type.value,
-            payload=payload,
-            status=MessageStatus.PENDING.value
-        )
-
-        self.session.add(message)
-        await self.session.flush()
-
-        return message
-
-    async def _mark_delivered(self, message_id: str) -> None:
-        """标记消息为已送达"""
-        result = await self.session.execute(
-            select(AgentMessage).where(AgentMessage.id == message_id)
-        )
-        message = result.scalar_one_or_none()
-
-        if message:
-            message.status = MessageStatus.DELIVERED.value
-            await self.session.flush()
+        now = datetime.now(timezone.utc)
+        return {
+            "id": f"msg_{uuid4().hex[:12]}",
+            "from_agent_id": from_agent_id,
+            "to_agent_id": to_agent_id,
+            "message_type": msg_type.value,
+            "topic": topic,
+            "payload": payload,
+            "status": MessageStatus.PENDING.value,
+            "owner": self.instance_id,
+            "claimed_at": now,
+            "created_at": now,
+            "processed_at": None,
+        }
 
     async def get_pending_messages(
         self,
@@ -246,21 +678,20 @@ class MessageBus:
         Returns:
             List[AgentMessage]: 待处理消息列表
         """
-        result = await self.session.execute(
-            select(AgentMessage)
-            .where(
-                and_(
-                    AgentMessage.to_agent_id == agent_id,
-                    AgentMessage.status.in_([
-                        MessageStatus.PENDING.value,
-                        MessageStatus.DELIVERED.value
-                    ])
+        await self.flush()
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(AgentMessage)
+                .where(
+                    and_(
+                        AgentMessage.to_agent_id == agent_id,
+                        text(INBOX_CONDITION)
+                    )
                 )
+                .order_by(AgentMessage.created_at.desc())
+                .limit(limit)
             )
-            .order_by(AgentMessage.created_at.desc())
-            .limit(limit)
-        )
-        return result.scalars().all()
+            return result.scalars().all()
 
     async def mark_processed(self, message_id: str) -> None:
         """
@@ -269,19 +700,13 @@ class MessageBus:
         Args:
             message_id: 消息 ID
         """
-        result = await self.session.execute(
-            select(AgentMessage).where(AgentMessage.id == message_id)
-        )
-        message = result.scalar_one_or_none()
+        self._batcher.set_status([message_id], MessageStatus.PROCESSED.value)
+
 
-        if message:
-            from datetime import datetime, timezone
-            message.status = MessageStatus.PROCESSED.value
-            message.processed_at = datetime.now(timezone.utc)
-            await self.session.flush()
+# 全局消息总线实例（由应用 lifespan 启动）
+message_bus = MessageBus()
 
 
-# 全局消息总线实例（每个请求创建新实例）
-async def get_message_bus(session: AsyncSession) -> MessageBus:
-    """获取消息总线实例"""
-    return MessageBus(session)
+async def get_message_bus() -> MessageBus:
+    """获取进程内共享的消息总线实例"""
+    return message_bus
@@ -0,0 +1,98 @@
+# backend/src/message_bus/metrics.py
+"""
+LatencyHistogram - 固定桶的延迟直方图
+
+桶边界按 1-2.5-5 递增（0.1ms ~ 60s），记录只做一次二分查找和计数，
+内存固定，适合在生产环境常开。分位数在所在桶内线性插值估算，
+误差不超过桶宽。
+"""
+
+import bisect
+import math
+from typing import Dict, List, Optional
+
+# 桶上界（秒），最后一个桶收纳更大的值
+DEFAULT_BOUNDS: List[float] = [
+    base * scale
+    for scale in (1e-4, 1e-3, 1e-2, 1e-1, 1.0, 10.0)
+    for base in (1.0, 2.5, 5.0)
+] + [60.0]
+
+
+class LatencyHistogram:
+    """
+    延迟直方图
+    """
+
+    def __init__(self, bounds: Optional[List[float]] = None):
+        """
+        Args:
+            bounds: 递增的桶上界（秒），默认 DEFAULT_BOUNDS
+        """
+        self.bounds = list(bounds or DEFAULT_BOUNDS)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """
+        记录一次延迟
+
+        Args:
+            seconds: 延迟（秒）
+        """
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q: float) -> float:
+        """
+        估算分位数
+
+        Args:
+            q: 0~100
+
+        Returns:
+            float: 延迟（秒），没有记录时为 0
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * q / 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if seen + count >= rank:
+                lower = self.bounds[index - 1] if index > 0 else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else self.max
+                upper = min(upper, self.max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.max
+
+    def reset(self) -> None:
+        """清空记录"""
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def snapshot(self) -> Dict[str, object]:
+        """
+        当前统计（毫秒）
+
+        Returns:
+            dict: count / mean_ms / max_ms / p50_ms / p95_ms / p99_ms / buckets
+        """
+        buckets = {f"{bound * 1000:g}": count for bound, count in zip(self.bounds, self.counts)}
+        buckets["+Inf"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+            "p50_ms": round(self.percentile(50) * 1000, 3),
+            "p95_ms": round(self.percentile(95) * 1000, 3),
+            "p99_ms": round(self.percentile(99) * 1000, 3),
+            "buckets": buckets,
+        }
@@ -0,0 +1,177 @@
+# backend/src/message_bus/retention.py
+"""
+MessageRetention - agent_messages 的保留与压缩任务
+
+定期把早于保留期限、已结束投递的消息（PROCESSED / DELIVERED / FAILED）
+按批归档到 agent_message_archive（每批一行，gzip 压缩的 JSONL），在同一
+事务中删除原行，最后对 SQLite 执行增量 VACUUM 归还空闲页。总线投递后只
+标记 DELIVERED 或 FAILED，mark_processed 由调用方决定是否使用，因此三种
+状态都按保留期限清理；仍为 PENDING 的消息不受影响。
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from ..models.agent_message import AgentMessage, AgentMessageArchive, MessageStatus
+
+logger = logging.getLogger(__name__)
+
+# 可归档的状态（投递已结束）
+FINISHED_STATUSES = (
+    MessageStatus.PROCESSED.value,
+    MessageStatus.DELIVERED.value,
+    MessageStatus.FAILED.value,
+)
+
+
+def encode_archive(messages: List[AgentMessage]) -> bytes:
+    """将消息编码为 gzip 压缩的 JSONL"""
+    lines = "\n".join(json.dumps(message.to_dict(), ensure_ascii=False) for message in messages)
+    return gzip.compress(lines.encode("utf-8"))
+
+
+def decode_archive(data: bytes) -> List[dict]:
+    """
+    解码归档数据
+
+    Args:
+        data: AgentMessageArchive.data
+
+    Returns:
+        List[dict]: 消息的 to_dict() 列表
+    """
+    return [json.loads(line) for line in gzip.decompress(data).decode("utf-8").splitlines() if line]
+
+
+class MessageRetention:
+    """
+    agent_messages 保留任务
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], AsyncSession]] = None,
+        retention_days: Optional[int] = None,
+        interval: Optional[float] = None,
+        chunk_size: Optional[int] = None
+    ):
+        """
+        Args:
+            session_factory: 数据库会话工厂（默认 AsyncSessionLocal）
+            retention_days: 已结束投递的消息的保留天数（默认 MESSAGE_RETENTION_DAYS，0 为不清理）
+            interval: 两次运行的间隔秒数（默认 MESSAGE_RETENTION_INTERVAL）
+            chunk_size: 每批归档并删除的行数（默认 MESSAGE_RETENTION_CHUNK_SIZE）
+        """
+        self.session_factory = session_factory or AsyncSessionLocal
+        self.retention_days = settings.MESSAGE_RETENTION_DAYS if retention_days is None else retention_days
+        self.interval = interval or settings.MESSAGE_RETENTION_INTERVAL
+        self.chunk_size = chunk_size or settings.MESSAGE_RETENTION_CHUNK_SIZE
+        self._task: Optional[asyncio.Task] = None
+        self._vacuum_warned = False
+
+    async def run_once(self) -> dict:
+        """
+        归档并删除过期的已结束投递的消息，然后执行增量 VACUUM
+
+        Returns:
+            dict: archived（消息数）、chunks（批数）、vacuumed（是否执行了 VACUUM）
+        """
+        cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=self.retention_days)
+        archived, chunks = 0, 0
+        while True:
+            count = await self._archive_chunk(cutoff)
+            if not count:
+                break
+            archived += count
+            chunks += 1
+            # 批次之间让出事件循环，避免长时间占用写锁
+            await asyncio.sleep(0)
+
+        vacuumed = await self._incremental_vacuum() if archived else False
+        if archived:
+            logger.info(f"Archived {archived} finished messages in {chunks} chunks")
+        return {"archived": archived, "chunks": chunks, "vacuumed": vacuumed}
+
+    async def _archive_chunk(self, cutoff: datetime) -> int:
+        """归档并删除一批消息（同一事务）"""
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(AgentMessage)
+                .where(
+                    AgentMessage.status.in_(FINISHED_STATUSES),
+                    func.coalesce(AgentMessage.processed_at, AgentMessage.created_at) < cutoff
+                )
+                .order_by(AgentMessage.created_at)
+                .limit(self.chunk_size)
+            )
+            messages = result.scalars().all()
+            if not messages:
+                return 0
+
+            session.add(AgentMessageArchive(
+                first_created_at=messages[0].created_at,
+                last_created_at=messages[-1].created_at,
+                message_count=len(messages),
+                data=encode_archive(messages)
+            ))
+            await session.execute(
+                delete(AgentMessage).where(AgentMessage.id.in_([message.id for message in messages]))
+            )
+            await session.commit()
+            return len(messages)
+
+    async def _incremental_vacuum(self) -> bool:
+        """SQLite 且 auto_vacuum=INCREMENTAL 时归还空闲页"""
+        async with self.session_factory() as session:
+            if session.bind.dialect.name != "sqlite":
+                return False
+            mode = (await session.execute(text("PRAGMA auto_vacuum"))).scalar()
+            if mode != 2:
+                if not self._vacuum_warned:
+                    # init_db 启动时会尝试切换；失败时需在停机后手动执行
+                    logger.warning(
+                        "SQLite auto_vacuum is not INCREMENTAL, deleted messages will not shrink the "
+                        "database file. Stop the app and run: PRAGMA auto_vacuum=INCREMENTAL; VACUUM;"
+                    )
+                    self._vacuum_warned = True
+                return False
+            await session.execute(text("PRAGMA incremental_vacuum"))
+            await session.commit()
+            return True
+
+    async def _run_loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Message retention failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """启动后台任务（retention_days 为 0 时不启动）"""
+        if self.retention_days <= 0:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_loop())
+
+    async def stop(self) -> None:
+        """停止后台任务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+message_retention = MessageRetention()
@@ -0,0 +1,167 @@
+# backend/src/message_bus/router.py
+"""
+TopicRouter - 支持通配符的主题路由
+
+主题按 "." 分段，订阅模式中：
+- "*" 匹配恰好一段，如 "agent.*" 匹配 "agent.1"，不匹配 "agent.1.request"
+- "#" 匹配零段或多段，如 "agent.#" 匹配 "agent"、"agent.1"、"agent.1.request"
+
+订阅保存在按段组织的 trie 中，匹配成本与主题段数相关，与订阅数量无关；
+每个具体主题的匹配结果会被缓存，订阅变更时清空缓存。
+
+responders() 只返回模式中不含 "#" 的订阅，用于请求/响应：
+"#" 订阅（如监控用的 "agent.#"）能收到请求，但不作为应答方。
+"""
+
+from collections import OrderedDict
+from typing import Callable, Dict, List, Tuple
+
+SINGLE_WILDCARD = "*"
+MULTI_WILDCARD = "#"
+
+
+class _Node:
+    __slots__ = ("children", "handlers", "multi")
+
+    def __init__(self, multi: bool = False):
+        self.children: Dict[str, "_Node"] = {}
+        self.handlers: List[Callable] = []
+        # 到达该节点的模式是否含 "#"
+        self.multi = multi
+
+
+class TopicRouter:
+    """
+    主题 trie，带匹配结果缓存
+    """
+
+    def __init__(self, cache_size: int = 4096):
+        """
+        Args:
+            cache_size: 缓存的具体主题数上限
+        """
+        self.cache_size = cache_size
+        self._root = _Node()
+        # 具体主题 -> (全部处理函数, 应答方处理函数)
+        self._cache: "OrderedDict[str, Tuple[List[Callable], List[Callable]]]" = OrderedDict()
+
+    def add(self, pattern: str, handler: Callable) -> None:
+        """
+        添加订阅
+
+        Args:
+            pattern: 主题或带通配符的模式
+            handler: 处理函数
+        """
+        node = self._root
+        for part in pattern.split("."):
+            child = node.children.get(part)
+            if child is None:
+                child = node.children[part] = _Node(node.multi or part == MULTI_WILDCARD)
+            node = child
+        node.handlers.append(handler)
+        self._cache.clear()
+
+    def remove(self, pattern: str, handler: Callable) -> bool:
+        """
+        移除订阅
+
+        Args:
+            pattern: 订阅时使用的模式
+            handler: 处理函数
+
+        Returns:
+            bool: 是否找到并移除
+        """
+        path = [self._root]
+        for part in pattern.split("."):
+            node = path[-1].children.get(part)
+            if node is None:
+                return False
+            path.append(node)
+
+        if handler not in path[-1].handlers:
+            return False
+        path[-1].handlers.remove(handler)
+
+        # 清理空分支
+        parts = pattern.split(".")
+        for depth in range(len(parts), 0, -1):
+            node = path[depth]
+            if node.handlers or node.children:
+                break
+            del path[depth - 1].children[parts[depth - 1]]
+
+        self._cache.clear()
+        return True
+
+    def match(self, topic: str) -> List[Callable]:
+        """
+        查找匹配主题的所有处理函数
+
+        Args:
+            topic: 具体主题
+
+        Returns:
+            List[Callable]: 处理函数（同一模式内按订阅顺序）
+        """
+        return self._lookup(topic)[0]
+
+    def responders(self, topic: str) -> List[Callable]:
+        """
+        查找可以应答该主题请求的处理函数（模式不含 "#" 的订阅）
+
+        Args:
+            topic: 具体主题
+
+        Returns:
+            List[Callable]: 处理函数，是 match() 结果的子集
+        """
+        return self._lookup(topic)[1]
+
+    def _lookup(self, topic: str) -> Tuple[List[Callable], List[Callable]]:
+        cached = self._cache.get(topic)
+        if cached is not None:
+            self._cache.move_to_end(topic)
+            return cached
+
+        nodes: Dict[int, _Node] = {}
+        self._collect(self._root, topic.split("."), 0, nodes)
+        handlers = [handler for node in nodes.values() for handler in node.handlers]
+        responders = [handler for node in nodes.values() if not node.multi for handler in node.handlers]
+
+        self._cache[topic] = (handlers, responders)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return handlers, responders
+
+    def _collect(self, node: _Node, parts: List[str], index: int, nodes: Dict[int, _Node]) -> None:
+        """收集匹配 parts[index:] 的终点节点（按 id 去重）"""
+        multi = node.children.get(MULTI_WILDCARD)
+        if multi is not None:
+            # "#" 可吞掉剩余的任意段数（包括零段）
+            for end in range(index, len(parts) + 1):
+                self._collect(multi, parts, end, nodes)
+
+        if index == len(parts):
+            if node.handlers:
+                nodes.setdefault(id(node), node)
+            return
+
+        for key in (parts[index], SINGLE_WILDCARD):
+            child = node.children.get(key)
+            if child is not None:
+                self._collect(child, parts, index + 1, nodes)
+
+    def patterns(self) -> List[str]:
+        """所有有订阅的模式"""
+        result = []
+
+        def walk(node: _Node, prefix: List[str]) -> None:
+            if node.handlers:
+                result.append(".".join(prefix))
+            for part, child in node.children.items():
+                walk(child, prefix + [part])
+
+        walk(self._root, [])
+        return result
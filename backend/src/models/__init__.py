@@ -12,7 +12,7 @@ from ..core.database import Base
 # 导入 Sprint 2 新模型
 from .agent_session import AgentSession
 from .agent_memory import AgentMemory
-from .agent_message import AgentMessage
+from .agent_message import AgentMessage, AgentMessageArchive
 from .ws_connection import WSConnection
 
 
@@ -27,7 +27,7 @@ class User(Base):
     role = Column(String(20), nullable=False, default="admin")
     is_active = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
-    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate="current_timestamp")
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
     # 关系
     posts = relationship("BlogPost", back_populates="author")
@@ -49,7 +49,7 @@ class BlogPost(Base):
     status = Column(String(20), nullable=False, default="draft")
     published_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
-    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate="current_timestamp")
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
     # 外键
     author_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -77,7 +77,7 @@ class Agent(Base):
     status = Column(String(20), nullable=False, default="offline")
     sort_order = Column(Integer, default=0, nullable=False)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
-    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate="current_timestamp")
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
     # 关系
     sessions = relationship("AgentSession", back_populates="agent")
@@ -103,7 +103,7 @@ class Tool(Base):
     status = Column(String(20), nullable=False, default="active")
     sort_order = Column(Integer, default=0, nullable=False)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
-    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate="current_timestamp")
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
     def __repr__(self):
         return f"<Tool(id={self.id}, name='{self.name}')>"
@@ -122,7 +122,7 @@ class Lab(Base):
     status = Column(String(20), nullable=False, default="experimental")
     online_count = Column(Integer, default=0, nullable=False)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
-    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate="current_timestamp")
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
     def __repr__(self):
         return f"<Lab(id={self.id}, name='{self.name}')>"
@@ -208,6 +208,7 @@ __all__ = [
     "AgentSession",
     "AgentMemory",
     "AgentMessage",
+    "AgentMessageArchive",
     "WSConnection",
     "NewsSource",
     "NewsArticle",
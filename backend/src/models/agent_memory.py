@@ -41,6 +41,8 @@ class AgentMemory(Base):
         default=lambda: datetime.now(timezone.utc),
         nullable=False
     )
+    # 最后一次写入时间 (null = 写入后未被覆盖过，以 created_at 为准)
+    updated_at = Column(DateTime, nullable=True)
     expires_at = Column(DateTime, nullable=True)  # 过期时间 (null = 永不过期)
 
     # 关系
@@ -60,5 +62,6 @@ class AgentMemory(Base):
             "key": self.key,
             "is_encrypted": self.is_encrypted,
             "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
             "expires_at": self.expires_at.isoformat() if self.expires_at else None,
         }
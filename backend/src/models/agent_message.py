@@ -9,7 +9,7 @@
 from datetime import datetime, timezone
 from enum import Enum
 from uuid import uuid4
-from sqlalchemy import Column, String, DateTime, Text, ForeignKey, JSON
+from sqlalchemy import Column, String, DateTime, Text, ForeignKey, JSON, Index, Integer, LargeBinary, text
 from sqlalchemy.orm import relationship
 from ..core.database import Base
 
@@ -30,9 +30,25 @@ class MessageStatus(Enum):
     FAILED = "failed"         # 失败
 
 
+# 未处理消息（pending / delivered）的条件。查询中需以同样的字面量出现，
+# SQLite 才会使用 ix_agent_messages_inbox 部分索引（绑定参数无法匹配）
+INBOX_CONDITION = "status IN ('pending', 'delivered')"
+
+
 class AgentMessage(Base):
     """跨智能体消息表"""
     __tablename__ = "agent_messages"
+    __table_args__ = (
+        # 收件箱查询 (get_pending_messages) 的部分索引，只包含未处理的消息，
+        # 大小与积压量相关，不随历史消息增长
+        Index(
+            "ix_agent_messages_inbox",
+            "to_agent_id",
+            "created_at",
+            sqlite_where=text(INBOX_CONDITION),
+            postgresql_where=text(INBOX_CONDITION),
+        ),
+    )
 
     id = Column(String(36), primary_key=True, default=lambda: str(uuid4()), index=True)
     from_agent_id = Column(String(36), ForeignKey("agents.id"), nullable=False, index=True)
@@ -41,6 +57,7 @@ class AgentMessage(Base):
         String(20),
         nullable=False
     )  # request, response, event, broadcast
+    topic = Column(String(255), nullable=True)  # 发布时的主题，用于重启后恢复投递
     payload = Column(JSON, nullable=False)  # 消息内容
     status = Column(
         String(20),
@@ -48,6 +65,10 @@ class AgentMessage(Base):
         default="pending",
         index=True
     )  # pending, delivered, processed, failed
+    # 负责投递该消息的总线实例及其认领时间。实例定期续期，
+    # 超过 MESSAGE_BUS_CLAIM_TTL 未续期的 PENDING 消息可被其他实例认领
+    owner = Column(String(64), nullable=True)
+    claimed_at = Column(DateTime, nullable=True)
     created_at = Column(
         DateTime,
         default=lambda: datetime.now(timezone.utc),
@@ -73,8 +94,32 @@ class AgentMessage(Base):
             "from_agent_id": self.from_agent_id,
             "to_agent_id": self.to_agent_id,
             "message_type": self.message_type,
+            "topic": self.topic,
             "payload": self.payload,
             "status": self.status,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "processed_at": self.processed_at.isoformat() if self.processed_at else None,
         }
+
+
+class AgentMessageArchive(Base):
+    """
+    已归档的跨智能体消息
+
+    每行保存一批已处理消息，data 为 gzip 压缩的 JSONL（每行一个 to_dict()）
+    """
+    __tablename__ = "agent_message_archive"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid4()))
+    archived_at = Column(
+        DateTime,
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False
+    )
+    first_created_at = Column(DateTime, nullable=False, index=True)
+    last_created_at = Column(DateTime, nullable=False, index=True)
+    message_count = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+
+    def __repr__(self):
+        return f"<AgentMessageArchive(id={self.id}, message_count={self.message_count})>"
@@ -3,7 +3,7 @@ Conversation model for the AI Assistant.
 
 This module defines the Conversation SQLAlchemy model.
 """
-from sqlalchemy import Column, String, DateTime, Text
+from sqlalchemy import Column, String, DateTime, Text, Integer, Index
 from sqlalchemy.sql import func
 from ..core.database import Base
 import uuid
@@ -20,15 +20,27 @@ class Conversation(Base):
         model: The AI model used in this conversation
         created_at: Timestamp when the conversation was created
         updated_at: Timestamp when the conversation was last updated
+        last_message_at: Timestamp of the newest message (denormalized)
+        message_count: Number of messages in the conversation (denormalized)
+        preview: Start of the newest message (denormalized)
     """
     __tablename__ = "conversations"
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(String, nullable=False, index=True)  # Index for faster queries
+    user_id = Column(String, nullable=False)  # Leading column of the list index below
     title = Column(String, nullable=True)  # Auto-generated from first message or summary
     model = Column(String, nullable=False)  # The AI model used
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Maintained on every message write so the list view needs no per-conversation queries
+    last_message_at = Column(DateTime(timezone=True), nullable=True)
+    message_count = Column(Integer, nullable=False, default=0, server_default="0")
+    preview = Column(String(120), nullable=True)
+
+    __table_args__ = (
+        # Serves "WHERE user_id = ? ORDER BY updated_at DESC LIMIT ?" without a sort
+        Index("ix_conversations_user_id_updated_at", user_id, updated_at.desc()),
+    )
 
     def __repr__(self):
         return f"<Conversation(id={self.id}, user_id={self.user_id}, title={self.title})>"
\ No newline at end of file
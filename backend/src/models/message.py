@@ -3,7 +3,7 @@ Message model for the AI Assistant.
 
 This module defines the Message SQLAlchemy model.
 """
-from sqlalchemy import Column, String, DateTime, Text, ForeignKey, Integer
+from sqlalchemy import Column, String, DateTime, Text, ForeignKey, Integer, Index
 from sqlalchemy.sql import func
 from ..core.database import Base
 import uuid
@@ -24,11 +24,16 @@ class Message(Base):
     __tablename__ = "messages"
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    conversation_id = Column(String, ForeignKey("conversations.id"), nullable=False, index=True)
+    conversation_id = Column(String, ForeignKey("conversations.id"), nullable=False)
     role = Column(String, nullable=False)  # user, assistant, system
     content = Column(Text, nullable=False)
     token_count = Column(Integer, nullable=True)  # Optional token count
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        # Serves history pages: "WHERE conversation_id = ? ORDER BY created_at DESC LIMIT ?"
+        Index("ix_messages_conversation_id_created_at", conversation_id, created_at),
+    )
+
     def __repr__(self):
         return f"<Message(id={self.id}, conversation_id={self.conversation_id}, role={self.role})>"
\ No newline at end of file
@@ -0,0 +1,52 @@
+"""
+Token usage ledger model for the AI Assistant.
+
+This module defines the TokenUsage SQLAlchemy model.
+"""
+from sqlalchemy import Column, String, DateTime, Integer, UniqueConstraint
+from ..core.database import Base
+
+
+class TokenUsage(Base):
+    """
+    Aggregated token usage of one user, conversation and model in one time bucket.
+
+    Rows are upserted by the in-memory UsageAggregator, so usage queries sum a
+    few bucket rows instead of every message.
+
+    Attributes:
+        id: Auto-increment primary key
+        user_id: Identifier for the user who consumed the tokens
+        conversation_id: The conversation the tokens were used in
+        model: The AI model that served the requests
+        bucket_start: Start of the (UTC) time bucket
+        prompt_tokens: Tokens sent to the model in this bucket
+        completion_tokens: Tokens generated by the model in this bucket
+        request_count: Number of chat requests in this bucket
+        cache_read_tokens: Prompt tokens served from the provider's prompt cache
+        cache_write_tokens: Prompt tokens written to the provider's prompt cache
+    """
+    __tablename__ = "token_usage"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(String, nullable=False)
+    conversation_id = Column(String, nullable=False)
+    model = Column(String, nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    request_count = Column(Integer, nullable=False, default=0)
+    cache_read_tokens = Column(Integer, nullable=False, default=0, server_default="0")
+    cache_write_tokens = Column(Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        # Upsert target for the aggregator flush; its index also serves
+        # "WHERE user_id = ? AND bucket_start >= ?" window queries
+        UniqueConstraint(
+            "user_id", "bucket_start", "model", "conversation_id",
+            name="uq_token_usage_bucket"
+        ),
+    )
+
+    def __repr__(self):
+        return f"<TokenUsage(user_id={self.user_id}, model={self.model}, bucket_start={self.bucket_start})>"
@@ -0,0 +1,179 @@
+# backend/src/websocket/agent_state.py
+"""
+AgentStateTracker - 智能体状态的内存快照与增量流
+
+/ws/agents 协议：
+- 新客户端连接时收到 initial_state（快照 + epoch + seq），不查询数据库
+- 之后收到 status_delta：一个合并窗口内变化过的智能体的最新状态，带 seq
+- 客户端忽略 seq 不大于已知 seq 的增量
+- 断线重连时携带 epoch 和 since(seq)，只补发其后变化过的智能体；
+  epoch 不匹配（服务重启或切换 worker）或 seq 过旧时回退为完整快照
+"""
+
+import asyncio
+import logging
+import uuid
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 不再出现在快照中的状态（保留为墓碑，供断线续传时下发），
+# 与 AgentManager 中活动会话的 spawned / idle / busy 互补
+INACTIVE_STATUSES = {"error", "terminated"}
+
+
+class AgentStateTracker:
+    """
+    智能体状态快照，按智能体合并短时间内的状态变化后再推送
+    """
+
+    def __init__(
+        self,
+        on_delta: Callable[[dict], None],
+        coalesce_window: float = 0.05,
+        max_tombstones: int = 1000
+    ):
+        """
+        Args:
+            on_delta: 推送增量消息的回调
+            coalesce_window: 合并窗口（秒）
+            max_tombstones: 保留的已终止智能体记录上限
+        """
+        self.on_delta = on_delta
+        self.coalesce_window = coalesce_window
+        self.max_tombstones = max_tombstones
+
+        self.epoch = uuid.uuid4().hex[:12]
+        self.seq = 0
+        # 早于该 seq 的墓碑已被清理，无法从更早的 seq 续传
+        self._floor_seq = 0
+        self._states: Dict[str, dict] = {}
+        self._dirty: Dict[str, None] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def apply(
+        self,
+        agent_id: str,
+        status: str,
+        session_id: Optional[str] = None,
+        started_at: Optional[str] = None
+    ) -> int:
+        """
+        更新一个智能体的状态，并在合并窗口结束后推送增量
+
+        Args:
+            agent_id: 智能体 ID
+            status: 新状态
+            session_id: 会话 ID
+            started_at: 会话开始时间 (ISO 格式)
+
+        Returns:
+            int: 本次变化的 seq
+        """
+        agent_id = str(agent_id)
+        previous = self._states.get(agent_id, {})
+        self.seq += 1
+        self._states[agent_id] = {
+            "agent_id": agent_id,
+            "status": status,
+            "session_id": session_id if session_id is not None else previous.get("session_id"),
+            "started_at": started_at if started_at is not None else previous.get("started_at"),
+            "seq": self.seq,
+        }
+        self._dirty[agent_id] = None
+        if status in INACTIVE_STATUSES:
+            self._prune_tombstones()
+        self._schedule_flush()
+        return self.seq
+
+    def load(self, states: List[dict]) -> None:
+        """
+        用数据库中的活动会话初始化快照（启动时调用一次）
+
+        Args:
+            states: 含 agent_id / status / session_id / started_at 的列表
+        """
+        for state in states:
+            self.seq += 1
+            self._states[str(state["agent_id"])] = {
+                "agent_id": str(state["agent_id"]),
+                "status": state["status"],
+                "session_id": state.get("session_id"),
+                "started_at": state.get("started_at"),
+                "seq": self.seq,
+            }
+
+    def snapshot(self) -> dict:
+        """
+        当前所有活动智能体的快照
+
+        Returns:
+            dict: initial_state 消息
+        """
+        return {
+            "type": "initial_state",
+            "epoch": self.epoch,
+            "seq": self.seq,
+            "agents": [
+                self._public(state) for state in self._states.values()
+                if state["status"] not in INACTIVE_STATUSES
+            ],
+        }
+
+    def resume(self, epoch: Optional[str], since: Optional[int]) -> dict:
+        """
+        断线续传：返回 since 之后变化过的智能体，无法续传时返回完整快照
+
+        Args:
+            epoch: 客户端上次收到的 epoch
+            since: 客户端上次收到的 seq
+
+        Returns:
+            dict: resumed 或 initial_state 消息
+        """
+        if epoch != self.epoch or since is None or since < self._floor_seq or since > self.seq:
+            return self.snapshot()
+        return {
+            "type": "resumed",
+            "epoch": self.epoch,
+            "seq": self.seq,
+            "agents": [self._public(state) for state in self._states.values() if state["seq"] > since],
+        }
+
+    def _schedule_flush(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.coalesce_window)
+        self.flush()
+
+    def flush(self) -> None:
+        """立即推送合并后的增量"""
+        if not self._dirty:
+            return
+        agents = [self._public(self._states[agent_id]) for agent_id in self._dirty]
+        self._dirty = {}
+        try:
+            self.on_delta({"type": "status_delta", "epoch": self.epoch, "seq": self.seq, "agents": agents})
+        except Exception as e:
+            logger.error(f"Failed to push agent status delta: {e}")
+
+    def _prune_tombstones(self) -> None:
+        tombstones = [s for s in self._states.values() if s["status"] in INACTIVE_STATUSES]
+        if len(tombstones) <= self.max_tombstones:
+            return
+        tombstones.sort(key=lambda s: s["seq"])
+        for state in tombstones[:len(tombstones) - self.max_tombstones]:
+            del self._states[state["agent_id"]]
+            self._dirty.pop(state["agent_id"], None)
+            self._floor_seq = max(self._floor_seq, state["seq"])
+
+    @staticmethod
+    def _public(state: dict) -> dict:
+        return {key: state[key] for key in ("agent_id", "status", "session_id", "started_at")}
+
+    def close(self) -> None:
+        """取消未执行的推送"""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
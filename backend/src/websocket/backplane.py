@@ -0,0 +1,344 @@
+# backend/src/websocket/backplane.py
+"""
+Backplane - ConnectionHub 的跨进程广播通道
+
+多个 uvicorn worker 各自持有一个 ConnectionHub，广播先在本进程内投递，
+再经 backplane 转发给其他 worker，由它们投递给各自的连接。
+
+实现：
+- InProcessBackplane: 默认，单进程，不转发
+- UnixSocketBackplane: 本机 Unix socket 中转，持有文件锁的 worker 兼任 broker
+- SQLiteBackplane: 轮询共享 SQLite 文件，无需常驻 broker 的兜底方案
+
+通过 WS_BACKPLANE 配置：local | unix:/path/to/hub.sock | sqlite:/path/to/hub.db
+"""
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# 收到其他 worker 的广播时调用: deliver(envelope)
+DeliverCallback = Callable[[dict], None]
+
+
+class Backplane:
+    """
+    Backplane 接口
+
+    publish 只需把 envelope 送达其他进程，不应回送给发布者自身。
+    """
+
+    async def start(self, deliver: DeliverCallback) -> None:
+        """
+        启动 backplane
+
+        Args:
+            deliver: 收到其他进程的 envelope 时调用
+        """
+        self._deliver = deliver
+
+    async def publish(self, envelope: dict) -> None:
+        """
+        发布 envelope 到其他进程
+
+        Args:
+            envelope: 可 JSON 序列化的广播描述
+        """
+
+    async def stop(self) -> None:
+        """停止 backplane 并释放资源"""
+
+
+class InProcessBackplane(Backplane):
+    """单进程默认实现：本进程已直接投递，无需转发"""
+
+
+class UnixSocketBackplane(Backplane):
+    """
+    基于 Unix socket 的 backplane
+
+    每个 worker 以客户端身份连接 broker；抢到 <path>.lock 文件锁的 worker
+    同时运行 broker，把每行 JSON 转发给其他客户端。broker 所在进程退出后，
+    锁自动释放，其余 worker 重连时由其中一个接任。
+
+    写缓冲有上限：publish 在 drain_timeout 内等不到 broker 读走数据就断开重连；
+    broker 不等待各 worker，写缓冲超过 max_buffer 的 worker 直接断开，
+    避免一个卡住的 worker 拖慢其他 worker 或撑大 broker 内存。
+    """
+
+    def __init__(
+        self,
+        path: str,
+        reconnect_interval: float = 0.5,
+        max_buffer: int = 1024 * 1024,
+        drain_timeout: float = 1.0
+    ):
+        """
+        Args:
+            path: Unix socket 路径
+            reconnect_interval: 连接断开后的重试间隔（秒）
+            max_buffer: broker 对单个 worker 的写缓冲上限（字节）
+            drain_timeout: publish 等待写缓冲排空的超时（秒）
+        """
+        self.path = path
+        self.reconnect_interval = reconnect_interval
+        self.max_buffer = max_buffer
+        self.drain_timeout = drain_timeout
+        self._deliver: Optional[DeliverCallback] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._connected = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._peers: Set[asyncio.StreamWriter] = set()
+        self._lock_file = None
+
+    @property
+    def is_broker(self) -> bool:
+        """本进程是否在运行 broker"""
+        return self._server is not None
+
+    async def start(self, deliver: DeliverCallback, timeout: float = 5.0) -> None:
+        self._deliver = deliver
+        self._task = asyncio.create_task(self._run())
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Backplane broker at {self.path} not reachable yet, retrying in background")
+
+    async def publish(self, envelope: dict) -> None:
+        if self._writer is None:
+            logger.debug("Backplane not connected, envelope not forwarded")
+            return
+        writer = self._writer
+        writer.write(json.dumps(envelope, ensure_ascii=False).encode("utf-8") + b"\n")
+        try:
+            await asyncio.wait_for(writer.drain(), timeout=self.drain_timeout)
+        except asyncio.TimeoutError:
+            # broker 长时间不读，断开后由 _run 重连（可能由本进程接任 broker）
+            logger.warning(
+                f"Backplane broker at {self.path} not draining within {self.drain_timeout}s, reconnecting"
+            )
+            writer.transport.abort()  # close() 会等缓冲写完，这里直接丢弃
+        except ConnectionError:
+            pass  # 连接已断开，_run 负责重连
+
+    async def _run(self) -> None:
+        """连接 broker（必要时自己启动 broker），断开后重连"""
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            except (FileNotFoundError, ConnectionRefusedError):
+                if not await self._try_become_broker():
+                    await asyncio.sleep(self.reconnect_interval)
+                continue
+
+            self._writer = writer
+            self._connected.set()
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    try:
+                        self._deliver(json.loads(line))
+                    except Exception as e:
+                        logger.error(f"Backplane delivery error: {e}")
+            except (ConnectionError, asyncio.IncompleteReadError):
+                pass
+            finally:
+                self._writer = None
+                self._connected.clear()
+                writer.close()
+            logger.warning(f"Backplane connection to {self.path} lost, reconnecting")
+            await asyncio.sleep(self.reconnect_interval)
+
+    async def _try_become_broker(self) -> bool:
+        """抢占文件锁并启动 broker"""
+        if self._server is not None:
+            return True
+        lock_file = open(f"{self.path}.lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+
+        # 持有锁即可安全删除上一个 broker 遗留的 socket 文件
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle_peer, path=self.path)
+        self._lock_file = lock_file
+        logger.info(f"Backplane broker listening on {self.path}")
+        return True
+
+    async def _handle_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """broker: 把一个 worker 发来的每行转发给其他 worker"""
+        self._peers.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                for peer in list(self._peers):
+                    if peer is writer or peer.is_closing():
+                        continue
+                    if peer.transport.get_write_buffer_size() > self.max_buffer:
+                        # 不 await drain，以免一个慢 worker 阻塞对其他 worker 的转发
+                        logger.warning(
+                            f"Backplane peer not reading (buffer over {self.max_buffer} bytes), disconnecting"
+                        )
+                        self._peers.discard(peer)
+                        peer.transport.abort()
+                        continue
+                    peer.write(line)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._peers.discard(writer)
+            writer.close()
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._server is not None:
+            self._server.close()
+            for peer in list(self._peers):
+                peer.close()
+            await self._server.wait_closed()
+            self._server = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+        if self._lock_file is not None:
+            self._lock_file.close()  # 关闭即释放 flock
+            self._lock_file = None
+
+
+class SQLiteBackplane(Backplane):
+    """
+    基于共享 SQLite 文件轮询的 backplane
+
+    publish 写入一行，各 worker 按自增 id 轮询新行并跳过自己发布的行。
+    超过 retention 秒的行会被清理。
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.05, retention: float = 60.0):
+        """
+        Args:
+            path: SQLite 文件路径
+            poll_interval: 轮询间隔（秒）
+            retention: 行保留时间（秒）
+        """
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.origin = uuid.uuid4().hex
+        self._deliver: Optional[DeliverCallback] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._last_id = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def _open(self) -> None:
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ws_backplane ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, origin TEXT NOT NULL, "
+            "payload TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        # 只接收启动之后的广播
+        self._last_id = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM ws_backplane").fetchone()[0]
+
+    def _insert(self, payload: str) -> None:
+        with self._db_lock:
+            self._conn.execute(
+                "INSERT INTO ws_backplane (origin, payload, created_at) VALUES (?, ?, ?)",
+                (self.origin, payload, time.time())
+            )
+            self._conn.commit()
+
+    def _fetch(self) -> List[tuple]:
+        with self._db_lock:
+            return self._conn.execute(
+                "SELECT id, origin, payload FROM ws_backplane WHERE id > ? ORDER BY id",
+                (self._last_id,)
+            ).fetchall()
+
+    def _prune(self) -> None:
+        with self._db_lock:
+            self._conn.execute("DELETE FROM ws_backplane WHERE created_at < ?", (time.time() - self.retention,))
+            self._conn.commit()
+
+    async def start(self, deliver: DeliverCallback) -> None:
+        self._deliver = deliver
+        await asyncio.to_thread(self._open)
+        self._task = asyncio.create_task(self._poll())
+
+    async def publish(self, envelope: dict) -> None:
+        if self._conn is None:
+            return
+        await asyncio.to_thread(self._insert, json.dumps(envelope, ensure_ascii=False))
+
+    async def _poll(self) -> None:
+        last_prune = time.monotonic()
+        while True:
+            try:
+                for row_id, origin, payload in await asyncio.to_thread(self._fetch):
+                    self._last_id = row_id
+                    if origin != self.origin:
+                        self._deliver(json.loads(payload))
+                if time.monotonic() - last_prune > self.retention:
+                    await asyncio.to_thread(self._prune)
+                    last_prune = time.monotonic()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Backplane poll error: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def backplane_from_url(url: str) -> Backplane:
+    """
+    根据配置创建 backplane
+
+    Args:
+        url: local | unix:/path/to/hub.sock | sqlite:/path/to/hub.db
+
+    Returns:
+        Backplane: 对应实现
+    """
+    if not url or url == "local":
+        return InProcessBackplane()
+    scheme, _, path = url.partition(":")
+    if scheme == "unix" and path:
+        return UnixSocketBackplane(path)
+    if scheme == "sqlite" and path:
+        return SQLiteBackplane(path)
+    raise ValueError(f"Unsupported WS_BACKPLANE: {url}")
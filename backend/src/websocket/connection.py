@@ -0,0 +1,254 @@
+# backend/src/websocket/connection.py
+"""
+ClientConnection - 单个 WebSocket 连接的出站队列
+
+每个连接拥有一个有界出站队列和独立的写任务：
+- 广播只需入队 (O(1))，不等待网络发送
+- 慢客户端只会堆积自己的队列，不影响其他连接
+- 队列满时按慢消费者策略处理（丢弃最旧 / 合并状态 / 断开）
+- 队列中保存已编码的帧，广播时同一条消息只序列化一次
+- 记录收发消息数、字节数、发送延迟（入队到发送完成）和最后活跃时间
+  （只以收到客户端消息为准：半开连接的写入仍可能成功，不能证明对端存活）
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from functools import cached_property
+from typing import Deque, Optional, Tuple, Union
+
+from fastapi import WebSocket
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# 因慢消费者被断开时使用的关闭码 (Try Again Later)
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+class SlowConsumerPolicy(str, Enum):
+    """队列满时的慢消费者处理策略"""
+    DROP_OLDEST = "drop_oldest"  # 丢弃最旧的消息
+    COALESCE = "coalesce"  # 同一 agent 的状态消息只保留最新一条，否则丢弃最旧
+    DISCONNECT = "disconnect"  # 断开连接
+
+
+@dataclass(frozen=True)
+class Frame:
+    """
+    已编码的出站消息，可原样发送给任意多个连接
+
+    Attributes:
+        text: JSON 文本
+        type: 消息类型（用于合并状态消息）
+        agent_id: 消息所属 agent（用于合并状态消息）
+    """
+    text: str
+    type: Optional[str] = None
+    agent_id: Optional[str] = None
+
+    @cached_property
+    def size(self) -> int:
+        """UTF-8 编码后的字节数（共享帧只计算一次）"""
+        return len(self.text.encode("utf-8"))
+
+
+def dumps(message: dict) -> str:
+    """将消息编码为 JSON 文本，优先使用 orjson"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(message).decode("utf-8")
+        except TypeError:
+            pass  # orjson 不支持的类型（如非字符串键）回退到标准库
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+def encode_frame(message: Union[dict, Frame]) -> Frame:
+    """
+    将消息编码为帧（已是帧则原样返回）
+
+    Args:
+        message: 消息内容
+
+    Returns:
+        Frame: 可共享的已编码帧
+    """
+    if isinstance(message, Frame):
+        return message
+    return Frame(dumps(message), message.get("type"), message.get("agent_id"))
+
+
+class ClientConnection:
+    """
+    带有界出站队列和写任务的 WebSocket 连接
+    """
+
+    def __init__(
+        self,
+        client_id: str,
+        websocket: WebSocket,
+        max_queue: int = 256,
+        policy: SlowConsumerPolicy = SlowConsumerPolicy.DROP_OLDEST
+    ):
+        """
+        Args:
+            client_id: 唯一客户端标识
+            websocket: 已 accept 的 WebSocket 连接
+            max_queue: 出站队列最大长度
+            policy: 队列满时的处理策略
+        """
+        self.client_id = client_id
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.policy = SlowConsumerPolicy(policy)
+
+        self.closed = False
+        self.dropped = 0
+        self.connected_at = time.time()
+        self.last_seen = time.monotonic()
+
+        # 统计
+        self.messages_sent = 0
+        self.bytes_sent = 0
+        self.messages_received = 0
+        self.bytes_received = 0
+        self.send_latency_total = 0.0
+        self.send_latency_max = 0.0
+
+        # 队列元素: (帧, 入队时间)
+        self._queue: Deque[Tuple[Frame, float]] = deque()
+        self._ready = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+
+    @property
+    def queue_depth(self) -> int:
+        """当前排队的出站消息数"""
+        return len(self._queue)
+
+    def start(self) -> None:
+        """启动写任务"""
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write_loop())
+
+    def enqueue(self, message: Union[dict, Frame]) -> bool:
+        """
+        将消息加入出站队列（不等待发送）
+
+        Args:
+            message: 消息内容或已编码的帧（广播时应传入共享的帧）
+
+        Returns:
+            bool: 是否已入队
+        """
+        if self.closed:
+            return False
+
+        frame = encode_frame(message)
+        if len(self._queue) >= self.max_queue and not self._make_room(frame):
+            return False
+
+        self._queue.append((frame, time.monotonic()))
+        self._ready.set()
+        return True
+
+    def touch(self, nbytes: int = 0) -> None:
+        """
+        记录收到客户端消息（任何消息都视为心跳）
+
+        Args:
+            nbytes: 消息字节数
+        """
+        self.last_seen = time.monotonic()
+        self.messages_received += 1
+        self.bytes_received += nbytes
+
+    def idle_for(self) -> float:
+        """距上次收到客户端消息的秒数"""
+        return time.monotonic() - self.last_seen
+
+    def stats(self) -> dict:
+        """连接统计"""
+        return {
+            "client_id": self.client_id,
+            "connected_at": self.connected_at,
+            "idle_seconds": round(self.idle_for(), 3),
+            "messages_sent": self.messages_sent,
+            "bytes_sent": self.bytes_sent,
+            "messages_received": self.messages_received,
+            "bytes_received": self.bytes_received,
+            "dropped": self.dropped,
+            "queue_depth": self.queue_depth,
+            "send_latency_avg_ms": round(self.send_latency_total / self.messages_sent * 1000, 3)
+            if self.messages_sent else 0.0,
+            "send_latency_max_ms": round(self.send_latency_max * 1000, 3),
+        }
+
+    def _make_room(self, frame: Frame) -> bool:
+        """
+        队列已满时按策略腾出空间
+
+        Returns:
+            bool: 是否还需要把 frame 追加到队尾
+        """
+        if self.policy == SlowConsumerPolicy.DISCONNECT:
+            logger.warning(f"Client {self.client_id} is too slow, disconnecting")
+            self.dropped += 1
+            self.closed = True
+            self._ready.set()
+            return False
+
+        if self.policy == SlowConsumerPolicy.COALESCE and frame.type == "status":
+            for index, (queued, enqueued_at) in enumerate(self._queue):
+                if queued.type == "status" and queued.agent_id == frame.agent_id:
+                    # 用最新状态替换排队中的旧状态，队列长度和位置不变
+                    self._queue[index] = (frame, enqueued_at)
+                    self._ready.set()
+                    self.dropped += 1
+                    return False
+
+        self._queue.popleft()
+        self.dropped += 1
+        return True
+
+    async def _write_loop(self) -> None:
+        """按顺序发送队列中的消息"""
+        try:
+            while True:
+                while not self._queue and not self.closed:
+                    self._ready.clear()
+                    await self._ready.wait()
+
+                if self.closed:
+                    await self.websocket.close(code=SLOW_CONSUMER_CLOSE_CODE)
+                    return
+
+                frame, enqueued_at = self._queue.popleft()
+                await self.websocket.send_text(frame.text)
+
+                latency = time.monotonic() - enqueued_at
+                self.messages_sent += 1
+                self.bytes_sent += frame.size
+                self.send_latency_total += latency
+                if latency > self.send_latency_max:
+                    self.send_latency_max = latency
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to send to {self.client_id}: {e}")
+            self.closed = True
+            self._queue.clear()
+
+    def close(self) -> None:
+        """停止写任务并丢弃未发送的消息"""
+        self.closed = True
+        self._queue.clear()
+        if self._writer is not None and not self._writer.done():
+            self._writer.cancel()
@@ -5,14 +5,16 @@ WebSocket 端点处理器
 提供 WebSocket 连接端点：
 - /ws/agents - 全局智能体状态流
 - /ws/chat/{agent_id} - 与特定智能体聊天
+- GET /ws/metrics - 连接与 hub 指标
 """
 
 import json
 import logging
-from typing import Optional
+from typing import List, Optional
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..api.deps import get_current_active_user
 from ..core.database import get_db
 from ..agents.manager import AgentManager
 from .hub import hub
@@ -21,23 +23,55 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+def _parse_seq(value) -> Optional[int]:
+    """解析客户端提供的 seq，非法值视为未提供"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _requested_agent_ids(message: dict) -> List[str]:
+    """从 subscribe/unsubscribe 消息中取出 agent_id / agent_ids"""
+    agent_ids = list(message.get("agent_ids") or [])
+    if message.get("agent_id"):
+        agent_ids.insert(0, message["agent_id"])
+    return [str(agent_id) for agent_id in dict.fromkeys(agent_ids)]
+
+
+@router.get("/ws/metrics", dependencies=[Depends(get_current_active_user)])
+async def websocket_metrics(include_connections: bool = False):
+    """
+    WebSocket 连接指标（需要登录）
+
+    Args:
+        include_connections: 是否附带每个连接的统计
+    """
+    return hub.get_metrics(include_connections=include_connections)
+
+
 @router.websocket("/ws/agents")
-async def agents_websocket(
-    websocket: WebSocket,
-    db: AsyncSession = Depends(get_db)
-):
+async def agents_websocket(websocket: WebSocket):
     """
     全局智能体状态流 WebSocket
 
+    连接时可携带 ?epoch=...&since=<seq> 续传，否则收到完整快照。
+
     客户端接收：
+    - initial_state: 活动智能体快照 (epoch, seq, agents)
+    - resumed: 续传，since 之后变化过的智能体 (epoch, seq, agents)
+    - status_delta: 合并窗口内变化过的智能体最新状态 (epoch, seq, agents)
     - status: 智能体状态更新
     - message: 广播消息
     - error: 错误信息
+    - ping: 服务端心跳，需回复 pong（超过空闲超时未收到任何消息会被断开）
 
     客户端发送：
-    - subscribe: 订阅特定 agent
-    - unsubscribe: 取消订阅
+    - subscribe: 订阅 agent (agent_id 或 agent_ids)，可叠加多个
+    - unsubscribe: 取消订阅 (不指定 agent 时取消全部)
+    - resume: 按 epoch / since 续传
     - ping: 心跳
+    - pong: 回应服务端心跳
     """
     client_id = f"client_{id(websocket)}"
 
@@ -45,60 +79,69 @@ async def agents_websocket(
         await hub.connect(client_id, websocket)
 
         # 发送连接成功消息
-        await websocket.send_json({
+        await hub.send_to(client_id, {
             "type": "connected",
             "client_id": client_id,
             "message": "Connected to agent status stream"
         })
 
-        # 获取当前活动智能体列表
-        agent_manager = AgentManager(db)
-        active_sessions = await agent_manager.get_active_sessions()
-
-        await websocket.send_json({
-            "type": "initial_state",
-            "agents": [
-                {
-                    "agent_id": session.agent_id,
-                    "status": session.status,
-                    "session_id": session.id,
-                    "started_at": session.started_at.isoformat() if session.started_at else None
-                }
-                for session in active_sessions
-            ]
-        })
+        # 从 hub 的内存快照下发当前状态（不查询数据库）
+        since = _parse_seq(websocket.query_params.get("since"))
+        if since is None:
+            await hub.send_to(client_id, hub.agent_states.snapshot())
+        else:
+            await hub.send_to(client_id, hub.agent_states.resume(websocket.query_params.get("epoch"), since))
 
         # 消息循环
         while True:
             try:
                 raw_message = await websocket.receive_text()
+                hub.touch(client_id, len(raw_message))
                 message = json.loads(raw_message)
                 message_type = message.get("type")
 
                 if message_type == "ping":
-                    await websocket.send_json({"type": "pong", "timestamp": message.get("timestamp")})
+                    await hub.send_to(client_id, {"type": "pong", "timestamp": message.get("timestamp")})
+
+                elif message_type == "pong":
+                    pass  # 服务端心跳的回应，touch 已刷新空闲计时
+
+                elif message_type == "resume":
+                    await hub.send_to(client_id, hub.agent_states.resume(
+                        message.get("epoch"), _parse_seq(message.get("since"))
+                    ))
 
                 elif message_type == "subscribe":
-                    agent_id = message.get("agent_id")
-                    if agent_id:
-                        # 重新连接并订阅特定 agent
-                        await hub.disconnect(client_id)
-                        await hub.connect(client_id, websocket, agent_id=agent_id)
-                        await websocket.send_json({
+                    # 支持 agent_id 或 agent_ids 列表，可同时订阅多个 agent
+                    agent_ids = _requested_agent_ids(message)
+                    if agent_ids:
+                        for agent_id in agent_ids:
+                            hub.subscribe(client_id, agent_id)
+                        await hub.send_to(client_id, {
                             "type": "subscribed",
-                            "agent_id": agent_id
+                            "agent_id": agent_ids[0],
+                            "agent_ids": agent_ids,
+                            "subscriptions": sorted(hub.get_subscriptions(client_id))
                         })
 
                 elif message_type == "unsubscribe":
-                    await hub.disconnect(client_id)
-                    await hub.connect(client_id, websocket)
-                    await websocket.send_json({"type": "unsubscribed"})
+                    # 未指定 agent 时取消全部订阅
+                    agent_ids = _requested_agent_ids(message)
+                    if agent_ids:
+                        for agent_id in agent_ids:
+                            hub.unsubscribe(client_id, agent_id)
+                    else:
+                        hub.unsubscribe(client_id)
+                    await hub.send_to(client_id, {
+                        "type": "unsubscribed",
+                        "subscriptions": sorted(hub.get_subscriptions(client_id))
+                    })
 
                 else:
                     logger.warning(f"Unknown message type from {client_id}: {message_type}")
 
             except json.JSONDecodeError:
-                await websocket.send_json({
+                await hub.send_to(client_id, {
                     "type": "error",
                     "message": "Invalid JSON format"
                 })
@@ -124,10 +167,12 @@ async def chat_websocket(
     - message: 智能体回复
     - typing: 输入中指示
     - error: 错误信息
+    - ping: 服务端心跳，需回复 pong（超过空闲超时未收到任何消息会被断开）
 
     客户端发送：
     - message: 发送消息
     - ping: 心跳
+    - pong: 回应服务端心跳
     """
     client_id = f"chat_{agent_id}_{id(websocket)}"
 
@@ -138,7 +183,7 @@ async def chat_websocket(
         agent_manager = AgentManager(db)
         status = await agent_manager.get_status(agent_id)
 
-        await websocket.send_json({
+        await hub.send_to(client_id, {
             "type": "connected",
             "agent_id": agent_id,
             "agent_status": status.get("agent_status", "unknown"),
@@ -149,24 +194,28 @@ async def chat_websocket(
         while True:
             try:
                 raw_message = await websocket.receive_text()
+                hub.touch(client_id, len(raw_message))
                 message = json.loads(raw_message)
                 message_type = message.get("type")
 
                 if message_type == "ping":
-                    await websocket.send_json({"type": "pong", "timestamp": message.get("timestamp")})
+                    await hub.send_to(client_id, {"type": "pong", "timestamp": message.get("timestamp")})
+
+                elif message_type == "pong":
+                    pass  # 服务端心跳的回应，touch 已刷新空闲计时
 
                 elif message_type == "message":
                     content = message.get("content", "")
 
                     # 发送"输入中"指示
-                    await websocket.send_json({
+                    await hub.send_to(client_id, {
                         "type": "typing",
                         "agent_id": agent_id
                     })
 
                     # TODO: 调用 Agent 处理消息 (Phase 3)
                     # 模拟回复
-                    await websocket.send_json({
+                    await hub.send_to(client_id, {
                         "type": "message",
                         "agent_id": agent_id,
                         "content": f"Received: {content}",
@@ -177,7 +226,7 @@ async def chat_websocket(
                     logger.warning(f"Unknown message type from {client_id}: {message_type}")
 
             except json.JSONDecodeError:
-                await websocket.send_json({
+                await hub.send_to(client_id, {
                     "type": "error",
                     "message": "Invalid JSON format"
                 })
@@ -7,16 +7,44 @@ ConnectionHub - WebSocket 连接管理
 - 消息广播
 - 单客户端发送
 - 按 agent_id 发送
+
+所有发送都只是写入连接的有界出站队列，由每个连接自己的写任务发送，
+慢客户端不会拖慢其他客户端。
+
+多 worker 部署时，广播经 backplane 转发到其他进程的 hub（见 backplane.py）。
+
+服务端心跳：每隔 WS_HEARTBEAT_INTERVAL 向所有连接发送 ping，客户端需
+回复 pong（或发送任何消息）。超过 WS_IDLE_TIMEOUT 未收到任何客户端消息
+（即连续多次 ping 未回复）的连接被回收；服务端自己的写入不算存活，半开
+连接的写入仍会成功。连接记录随心跳批量写入 ws_connections 表。
 """
 
 import asyncio
 import json
 import logging
-from typing import Dict, List, Optional, Callable
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Callable, Set, Union
+from uuid import uuid4
 from fastapi import WebSocket, WebSocketDisconnect
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from ..models.ws_connection import WSConnection
+from .agent_state import AgentStateTracker
+from .backplane import Backplane, backplane_from_url
+from .connection import ClientConnection, Frame, SlowConsumerPolicy, encode_frame
 
 logger = logging.getLogger(__name__)
 
+# 回收空闲连接时使用的关闭码 (Going Away)
+IDLE_CLOSE_CODE = 1001
+
+# 已断开连接的累计统计项
+TOTAL_FIELDS = ("messages_sent", "bytes_sent", "messages_received", "bytes_received", "dropped")
+
 
 class ConnectionHub:
     """
@@ -28,28 +56,93 @@ class ConnectionHub:
     _instance: Optional["ConnectionHub"] = None
     _lock: asyncio.Lock = asyncio.Lock()
 
-    def __new__(cls):
+    def __new__(cls, *args, **kwargs):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
             cls._instance._initialized = False
         return cls._instance
 
-    def __init__(self):
+    def __init__(
+        self,
+        max_queue: Optional[int] = None,
+        policy: Optional[SlowConsumerPolicy] = None,
+        backplane: Optional[Backplane] = None,
+        heartbeat_interval: Optional[float] = None,
+        idle_timeout: Optional[float] = None,
+        session_factory: Optional[Callable[[], AsyncSession]] = None
+    ):
+        """
+        Args:
+            max_queue: 每个连接的出站队列长度（默认 WS_OUTBOUND_QUEUE_SIZE）
+            policy: 慢消费者策略（默认 WS_SLOW_CONSUMER_POLICY）
+            backplane: 跨进程广播通道（默认按 WS_BACKPLANE 创建）
+            heartbeat_interval: 心跳间隔秒数（默认 WS_HEARTBEAT_INTERVAL）
+            idle_timeout: 空闲超时秒数（默认 WS_IDLE_TIMEOUT）
+            session_factory: 写 ws_connections 表的会话工厂
+                （默认在 WS_TRACK_CONNECTIONS 开启时使用 AsyncSessionLocal）
+        """
         if self._initialized:
             return
 
-        # 存储所有连接: client_id -> WebSocket
-        self._connections: Dict[str, WebSocket] = {}
+        self.max_queue = max_queue or settings.WS_OUTBOUND_QUEUE_SIZE
+        self.policy = SlowConsumerPolicy(policy or settings.WS_SLOW_CONSUMER_POLICY)
+        self.backplane = backplane or backplane_from_url(settings.WS_BACKPLANE)
+        self.heartbeat_interval = heartbeat_interval or settings.WS_HEARTBEAT_INTERVAL
+        self.idle_timeout = idle_timeout or settings.WS_IDLE_TIMEOUT
+        self.session_factory = session_factory or (AsyncSessionLocal if settings.WS_TRACK_CONNECTIONS else None)
+
+        # 存储所有连接: client_id -> ClientConnection
+        self._connections: Dict[str, ClientConnection] = {}
 
-        # 按 agent_id 分组的连接: agent_id -> List[client_id]
-        self._agent_subscribers: Dict[str, List[str]] = {}
+        # 双向订阅索引: agent_id -> {client_id}, client_id -> {agent_id}
+        self._agent_subscribers: Dict[str, Set[str]] = {}
+        self._client_agents: Dict[str, Set[str]] = {}
 
         # 消息处理器: message_type -> List[handler]
         self._handlers: Dict[str, List[Callable]] = {}
 
+        # 心跳与统计
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._reaped = 0
+        self._totals: Dict[str, int] = dict.fromkeys(TOTAL_FIELDS, 0)
+
+        # 待写入 ws_connections 的变化: 新连接 row_id -> 行, 已断开的 row_id
+        self._row_ids: Dict[str, str] = {}
+        self._new_rows: Dict[str, dict] = {}
+        self._ended_rows: List[str] = []
+        self._last_sync = time.monotonic()
+
+        # 智能体状态快照，合并后的增量推送给本进程的连接
+        self.agent_states = AgentStateTracker(
+            lambda delta: self._broadcast_local(encode_frame(delta)),
+            coalesce_window=settings.WS_STATUS_COALESCE_MS / 1000
+        )
+
         self._initialized = True
         logger.info("ConnectionHub initialized")
 
+    async def start(self) -> None:
+        """启动 backplane 和心跳任务"""
+        await self.backplane.start(self._deliver_remote)
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self) -> None:
+        """停止心跳任务和 backplane，并写入剩余的连接记录"""
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+        self.agent_states.close()
+        await self.backplane.stop()
+
+        for client_id in list(self._connections):
+            await self.disconnect(client_id)
+        await self.sync_connections()
+
     async def connect(
         self,
         client_id: str,
@@ -65,12 +158,29 @@ class ConnectionHub:
             agent_id: 可选，订阅的 agent_id
         """
         await websocket.accept()
-        self._connections[client_id] = websocket
+        connection = ClientConnection(
+            client_id,
+            websocket,
+            max_queue=self.max_queue,
+            policy=self.policy
+        )
+        connection.start()
+        self._connections[client_id] = connection
+
+        if self.session_factory is not None:
+            row_id = str(uuid4())
+            self._row_ids[client_id] = row_id
+            self._new_rows[row_id] = {
+                "id": row_id,
+                "client_id": client_id,
+                "agent_id": agent_id,
+                "connected_at": datetime.now(timezone.utc),
+                "last_ping": datetime.now(timezone.utc),
+                "is_active": True,
+            }
 
         if agent_id:
-            if agent_id not in self._agent_subscribers:
-                self._agent_subscribers[agent_id] = []
-            self._agent_subscribers[agent_id].append(client_id)
+            self.subscribe(client_id, agent_id)
 
         logger.info(f"Client {client_id} connected. Total: {len(self._connections)}")
 
@@ -81,37 +191,219 @@ class ConnectionHub:
         Args:
             client_id: 客户端标识
         """
-        if client_id in self._connections:
-            del self._connections[client_id]
+        connection = self._connections.pop(client_id, None)
+        if connection is not None:
+            connection.close()
+            for name in TOTAL_FIELDS:
+                self._totals[name] += getattr(connection, name)
+
+        row_id = self._row_ids.pop(client_id, None)
+        if row_id is not None and self._new_rows.pop(row_id, None) is None:
+            # 已写入的行标记为断开；未写入的新连接直接丢弃
+            self._ended_rows.append(row_id)
 
-        # 从所有 agent 订阅中移除
-        for agent_id, subscribers in self._agent_subscribers.items():
-            if client_id in subscribers:
-                subscribers.remove(client_id)
+        # 只遍历该客户端自己的订阅
+        self.unsubscribe(client_id)
 
         logger.info(f"Client {client_id} disconnected. Total: {len(self._connections)}")
 
-    async def send_to(self, client_id: str, message: dict) -> bool:
+    def subscribe(self, client_id: str, agent_id: str) -> bool:
         """
-        发送消息到指定客户端
+        为已连接的客户端增加一个 agent 订阅（不影响 WebSocket 连接）
 
         Args:
-            client_id: 目标客户端
-            message: 消息内容
+            client_id: 客户端标识
+            agent_id: 订阅的 agent_id
 
         Returns:
-            bool: 是否发送成功
+            bool: 客户端是否已连接
         """
         if client_id not in self._connections:
             return False
+        self._agent_subscribers.setdefault(agent_id, set()).add(client_id)
+        self._client_agents.setdefault(client_id, set()).add(agent_id)
+        return True
+
+    def unsubscribe(self, client_id: str, agent_id: Optional[str] = None) -> None:
+        """
+        取消客户端的 agent 订阅
+
+        Args:
+            client_id: 客户端标识
+            agent_id: 取消的 agent_id，为空时取消全部订阅
+        """
+        agents = self._client_agents.get(client_id)
+        if not agents:
+            return
+
+        targets = [agent_id] if agent_id is not None else list(agents)
+        for target in targets:
+            agents.discard(target)
+            subscribers = self._agent_subscribers.get(target)
+            if subscribers is not None:
+                subscribers.discard(client_id)
+                if not subscribers:
+                    del self._agent_subscribers[target]
+
+        if not agents:
+            del self._client_agents[client_id]
+
+    def get_subscriptions(self, client_id: str) -> Set[str]:
+        """获取客户端订阅的 agent_id 集合"""
+        return set(self._client_agents.get(client_id, ()))
+
+    def touch(self, client_id: str, nbytes: int = 0) -> None:
+        """
+        记录收到客户端消息，刷新空闲计时
+
+        Args:
+            client_id: 客户端标识
+            nbytes: 消息字节数
+        """
+        connection = self._connections.get(client_id)
+        if connection is not None:
+            connection.touch(nbytes)
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self.heartbeat()
+            except Exception as e:
+                logger.error(f"Heartbeat error: {e}")
+
+    async def heartbeat(self) -> int:
+        """
+        回收空闲连接，向其余连接发送 ping，并写入连接记录
+
+        Returns:
+            int: 回收的连接数
+        """
+        ping = encode_frame({"type": "ping", "timestamp": time.time()})
+        idle = [
+            client_id for client_id, connection in self._connections.items()
+            if connection.closed or connection.idle_for() > self.idle_timeout
+        ]
+        for client_id in idle:
+            await self._reap(client_id)
+        for connection in self._connections.values():
+            connection.enqueue(ping)
 
         try:
-            websocket = self._connections[client_id]
-            await websocket.send_json(message)
-            return True
+            await self.sync_connections()
         except Exception as e:
-            logger.error(f"Failed to send to {client_id}: {e}")
+            logger.error(f"Failed to sync ws_connections: {e}")
+        return len(idle)
+
+    async def _reap(self, client_id: str) -> None:
+        """关闭并注销空闲或已失效的连接"""
+        connection = self._connections.get(client_id)
+        await self.disconnect(client_id)
+        self._reaped += 1
+        logger.info(f"Reaped idle client {client_id}")
+        try:
+            await asyncio.wait_for(connection.websocket.close(code=IDLE_CLOSE_CODE), timeout=1.0)
+        except Exception:
+            pass  # 连接可能早已失效
+
+    async def sync_connections(self) -> None:
+        """批量写入 ws_connections：新连接、活跃连接的 last_ping、断开的连接"""
+        if self.session_factory is None:
+            return
+        now = datetime.now(timezone.utc)
+        since = self._last_sync
+        self._last_sync = time.monotonic()
+
+        new_rows, self._new_rows = list(self._new_rows.values()), {}
+        ended, self._ended_rows = self._ended_rows, []
+        seen = [
+            self._row_ids[client_id] for client_id, connection in self._connections.items()
+            if connection.last_seen >= since and client_id in self._row_ids
+        ]
+
+        try:
+            await self._write_connection_rows(new_rows, seen, ended, now)
+        except Exception:
+            # 保留未写入的变化，下次心跳重试
+            self._new_rows.update({row["id"]: row for row in new_rows})
+            self._ended_rows.extend(ended)
+            raise
+
+    async def _write_connection_rows(self, new_rows: List[dict], seen: List[str], ended: List[str], now: datetime) -> None:
+        async with self.session_factory() as session:
+            if new_rows:
+                await session.execute(insert(WSConnection), new_rows)
+            if seen:
+                await session.execute(
+                    update(WSConnection).where(WSConnection.id.in_(seen)).values(last_ping=now)
+                )
+            if ended:
+                await session.execute(
+                    update(WSConnection).where(WSConnection.id.in_(ended)).values(is_active=False)
+                )
+            # 其他进程退出后遗留的活跃记录
+            await session.execute(
+                update(WSConnection)
+                .where(
+                    WSConnection.is_active.is_(True),
+                    WSConnection.last_ping < now - timedelta(seconds=self.idle_timeout + self.heartbeat_interval)
+                )
+                .values(is_active=False)
+            )
+            await session.commit()
+
+    def get_metrics(self, include_connections: bool = False) -> dict:
+        """
+        汇总的 hub 指标
+
+        Args:
+            include_connections: 是否附带每个连接的统计
+
+        Returns:
+            dict: 指标
+        """
+        connections = list(self._connections.values())
+        totals = dict(self._totals)
+        for connection in connections:
+            for name in TOTAL_FIELDS:
+                totals[name] += getattr(connection, name)
+
+        sent = sum(connection.messages_sent for connection in connections)
+        latency_total = sum(connection.send_latency_total for connection in connections)
+        metrics = {
+            "connections": len(connections),
+            "subscriptions": sum(len(agents) for agents in self._client_agents.values()),
+            "subscribed_agents": len(self._agent_subscribers),
+            **totals,
+            "queue_depth": sum(connection.queue_depth for connection in connections),
+            "max_queue_depth": max((connection.queue_depth for connection in connections), default=0),
+            "send_latency_avg_ms": round(latency_total / sent * 1000, 3) if sent else 0.0,
+            "send_latency_max_ms": round(
+                max((connection.send_latency_max for connection in connections), default=0.0) * 1000, 3
+            ),
+            "reaped": self._reaped,
+            "heartbeat_interval": self.heartbeat_interval,
+            "idle_timeout": self.idle_timeout,
+        }
+        if include_connections:
+            metrics["clients"] = [connection.stats() for connection in connections]
+        return metrics
+
+    async def send_to(self, client_id: str, message: Union[dict, Frame]) -> bool:
+        """
+        发送消息到指定客户端（入队后立即返回）
+
+        Args:
+            client_id: 目标客户端
+            message: 消息内容
+
+        Returns:
+            bool: 是否已入队
+        """
+        connection = self._connections.get(client_id)
+        if connection is None:
             return False
+        return connection.enqueue(message)
 
     async def broadcast(self, message: dict, exclude: Optional[List[str]] = None) -> int:
         """
@@ -122,20 +414,24 @@ class ConnectionHub:
             exclude: 排除的客户端列表
 
         Returns:
-            int: 成功发送的数量
+            int: 本进程成功入队的数量
         """
+        # 只序列化一次，所有连接共享同一帧
+        frame = encode_frame(message)
+        sent_count = self._broadcast_local(frame, exclude)
+        await self.backplane.publish(self._envelope("broadcast", frame, exclude=exclude))
+        return sent_count
+
+    def _broadcast_local(self, frame: Frame, exclude: Optional[List[str]] = None) -> int:
+        """投递到本进程的所有连接"""
         exclude_set = set(exclude or [])
         sent_count = 0
 
-        for client_id, websocket in self._connections.items():
+        for client_id, connection in self._connections.items():
             if client_id in exclude_set:
                 continue
-
-            try:
-                await websocket.send_json(message)
+            if connection.enqueue(frame):
                 sent_count += 1
-            except Exception as e:
-                logger.error(f"Failed to broadcast to {client_id}: {e}")
 
         return sent_count
 
@@ -148,18 +444,59 @@ class ConnectionHub:
             message: 消息内容
 
         Returns:
-            int: 成功发送的数量
+            int: 本进程成功入队的数量
         """
-        if agent_id not in self._agent_subscribers:
-            return 0
+        frame = encode_frame(message)
+        sent_count = self._broadcast_local_to_agent(agent_id, frame)
+        await self.backplane.publish(self._envelope("agent", frame, target=agent_id))
+        return sent_count
 
+    def _broadcast_local_to_agent(self, agent_id: str, frame: Frame) -> int:
+        """投递到本进程中订阅该 agent 的连接"""
         sent_count = 0
-        for client_id in self._agent_subscribers[agent_id]:
-            if await self.send_to(client_id, message):
+        for client_id in list(self._agent_subscribers.get(agent_id, ())):
+            connection = self._connections.get(client_id)
+            if connection is not None and connection.enqueue(frame):
                 sent_count += 1
-
         return sent_count
 
+    @staticmethod
+    def _envelope(op: str, frame: Frame, **fields) -> dict:
+        """构造发往其他 worker 的 envelope（携带已编码的帧，对端无需重新序列化）"""
+        return {"op": op, "text": frame.text, "type": frame.type, "agent_id": frame.agent_id, **fields}
+
+    async def update_agent_state(
+        self,
+        agent_id: str,
+        status: str,
+        session_id: Optional[str] = None,
+        started_at: Optional[str] = None
+    ) -> None:
+        """
+        更新智能体状态快照（各 worker 各自合并并推送增量）
+
+        Args:
+            agent_id: 智能体 ID
+            status: 新状态
+            session_id: 会话 ID
+            started_at: 会话开始时间 (ISO 格式)
+        """
+        state = {"agent_id": str(agent_id), "status": status, "session_id": session_id, "started_at": started_at}
+        self.agent_states.apply(**state)
+        await self.backplane.publish({"op": "state", "state": state})
+
+    def _deliver_remote(self, envelope: dict) -> None:
+        """投递来自其他 worker 的广播"""
+        if envelope.get("op") == "state":
+            self.agent_states.apply(**envelope["state"])
+            return
+
+        frame = Frame(envelope["text"], envelope.get("type"), envelope.get("agent_id"))
+        if envelope.get("op") == "agent":
+            self._broadcast_local_to_agent(envelope["target"], frame)
+        else:
+            self._broadcast_local(frame, envelope.get("exclude"))
+
     async def handle_message(self, client_id: str, raw_message: str) -> None:
         """
         处理收到的消息
@@ -217,7 +554,7 @@ class ConnectionHub:
 
     def get_subscriber_count(self, agent_id: str) -> int:
         """获取指定 agent 的订阅者数"""
-        return len(self._agent_subscribers.get(agent_id, []))
+        return len(self._agent_subscribers.get(agent_id, ()))
 
     async def send_status_update(
         self,
@@ -241,10 +578,7 @@ class ConnectionHub:
             "timestamp": asyncio.get_event_loop().time()
         }
 
-        # 广播给所有订阅该 agent 的客户端
-        await self.broadcast_to_agent(agent_id, message)
-
-        # 同时广播给全局监听者
+        # 订阅该 agent 的客户端也在全部连接之中，只广播一次，避免重复推送
         await self.broadcast(message)
 
 
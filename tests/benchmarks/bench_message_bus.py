@@ -0,0 +1,103 @@
+"""
+MessageBus 吞吐与延迟基准
+
+向 K 个主题发布 M 条消息，每个主题 H 个处理器，分别在持久化关闭和开启
+（临时 SQLite 文件）时测量吞吐量和发布到处理的延迟分位数。
+
+用法:
+    python -m tests.benchmarks.bench_message_bus [--messages 20000] [--topics 16] [--handlers 2] [--workers 4]
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backend.src.message_bus.bus import MessageBus
+from backend.src.models.agent_message import AgentMessage
+
+
+def percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(len(sorted_values) * q / 100) - 1))
+    return sorted_values[index]
+
+
+async def run(bus: MessageBus, messages: int, topics: int, handlers: int, persist: bool) -> dict:
+    """发布全部消息并等待所有处理器执行完毕"""
+    expected = messages * handlers
+    latencies = []
+    done = asyncio.Event()
+
+    async def handler(message):
+        latencies.append(time.perf_counter() - message["sent_at"])
+        if len(latencies) == expected:
+            done.set()
+
+    for t in range(topics):
+        for _ in range(handlers):
+            await bus.subscribe(f"agent.{t}", handler)
+    await bus.start_processing()
+
+    start = time.perf_counter()
+    for n in range(messages):
+        t = n % topics
+        await bus.publish(
+            f"agent.{t}",
+            {"seq": n, "sent_at": time.perf_counter()},
+            from_agent_id="bench",
+            to_agent_id=str(t),
+            persist=persist
+        )
+        if n % 256 == 0:
+            # 让 worker 与发布交替执行，模拟持续流量
+            await asyncio.sleep(0)
+    await done.wait()
+    if persist:
+        await bus.flush()
+    elapsed = time.perf_counter() - start
+
+    await bus.stop()
+    latencies.sort()
+    return {
+        "elapsed": elapsed,
+        "rate": messages / elapsed,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "bus": bus.get_metrics()["latency"]["dispatch"],
+    }
+
+
+async def main(messages: int, topics: int, handlers: int, workers: int) -> None:
+    print(f"{messages} messages over {topics} topics x {handlers} handlers, {workers} workers")
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(AgentMessage.metadata.create_all, tables=[AgentMessage.__table__])
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+
+        print(f"  {'persistence':<12} {'msgs/s':>12} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}   bus p99 ms")
+        for persist in (False, True):
+            bus = MessageBus(sessions, workers=workers)
+            result = await run(bus, messages, topics, handlers, persist)
+            print(
+                f"  {'on' if persist else 'off':<12} {result['rate']:12,.0f} "
+                f"{result['p50'] * 1000:9.3f} {result['p95'] * 1000:9.3f} {result['p99'] * 1000:9.3f}"
+                f"   {result['bus']['p99_ms']:9.3f}"
+            )
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--topics", type=int, default=16)
+    parser.add_argument("--handlers", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.topics, args.handlers, args.workers))
@@ -0,0 +1,99 @@
+"""
+ConnectionHub 广播微基准
+
+比较逐连接 send_json（每个接收者各编码一次）与一次编码共享帧的广播开销。
+
+用法:
+    python -m tests.benchmarks.bench_ws_broadcast [--connections 1000] [--messages 200]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from backend.src.websocket import connection as connection_module
+from backend.src.websocket.connection import SlowConsumerPolicy
+from backend.src.websocket.hub import ConnectionHub
+
+
+class NullWebSocket:
+    """不做网络 I/O 的 WebSocket，只计数"""
+
+    def __init__(self):
+        self.frames = 0
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        self.frames += 1
+
+    async def send_json(self, message):
+        # 与 Starlette 的 send_json 相同：每次调用都重新编码
+        await self.send_text(json.dumps(message, separators=(",", ":"), ensure_ascii=False))
+
+    async def close(self, code=1000):
+        pass
+
+
+def status_message(n: int) -> dict:
+    return {
+        "type": "status",
+        "agent_id": f"agent-{n % 20}",
+        "old_status": "idle",
+        "new_status": "running",
+        "timestamp": time.time(),
+        "details": {"session_id": f"session-{n}", "tasks": list(range(10))},
+    }
+
+
+async def bench_send_json(sockets, messages: int) -> float:
+    """旧实现：对每个连接依次 await send_json"""
+    start = time.perf_counter()
+    for n in range(messages):
+        message = status_message(n)
+        for ws in sockets:
+            await ws.send_json(message)
+    return time.perf_counter() - start
+
+
+async def bench_hub(sockets, messages: int) -> float:
+    """新实现：一次编码，入队到每个连接，由写任务发送"""
+    ConnectionHub._instance = None
+    hub = ConnectionHub(max_queue=messages + 1, policy=SlowConsumerPolicy.DROP_OLDEST)
+    for index, ws in enumerate(sockets):
+        await hub.connect(f"c{index}", ws)
+
+    start = time.perf_counter()
+    for n in range(messages):
+        await hub.broadcast(status_message(n))
+    # 等待所有写任务发完
+    while any(c.queue_depth for c in hub._connections.values()):
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+
+    for index in range(len(sockets)):
+        await hub.disconnect(f"c{index}")
+    return elapsed
+
+
+async def main(connections: int, messages: int) -> None:
+    encoder = "orjson" if connection_module.orjson is not None else "json"
+    print(f"{connections} connections x {messages} broadcasts (hub encoder: {encoder})")
+
+    baseline = await bench_send_json([NullWebSocket() for _ in range(connections)], messages)
+    hub_time = await bench_hub([NullWebSocket() for _ in range(connections)], messages)
+
+    total = connections * messages
+    for name, elapsed in (("send_json per recipient", baseline), ("hub serialize-once", hub_time)):
+        print(f"  {name:<24} {elapsed:8.3f}s  {total / elapsed:12,.0f} frames/s")
+    print(f"  speedup: {baseline / hub_time:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--connections", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.connections, args.messages))
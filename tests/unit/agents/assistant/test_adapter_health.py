@@ -0,0 +1,94 @@
+"""
+AdapterHealth 熔断器与可用性探测单元测试
+"""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from backend.src.agents.assistant.adapters.health import (
+    AdapterHealth, CircuitState, ProviderUnavailableError
+)
+from backend.src.agents.assistant.adapters.openai import OpenAIAdapter
+
+CLOCK = "backend.src.agents.assistant.adapters.health.time.monotonic"
+
+
+async def fail(health):
+    """通过 guard 记录一次失败调用"""
+    with pytest.raises(RuntimeError):
+        async with health.guard():
+            raise RuntimeError("boom")
+
+
+@pytest.mark.unit
+class TestAdapterHealth:
+    """熔断器状态机测试"""
+
+    async def test_opens_after_threshold_and_fails_fast(self):
+        """测试连续失败达到阈值后熔断并快速失败"""
+        health = AdapterHealth("fake", failure_threshold=2)
+        await fail(health)
+        assert health.state == CircuitState.CLOSED
+        await fail(health)
+        assert health.state == CircuitState.OPEN
+
+        with pytest.raises(ProviderUnavailableError):
+            async with health.guard():
+                pytest.fail("call should not run while open")
+
+    async def test_half_open_allows_single_trial(self):
+        """测试恢复期后半开状态只放行一个试探请求"""
+        health = AdapterHealth("fake", failure_threshold=1, recovery_timeout=10)
+        with patch(CLOCK, return_value=100.0):
+            await fail(health)
+        with patch(CLOCK, return_value=111.0):
+            assert health.allow_request() is True
+            assert health.state == CircuitState.HALF_OPEN
+            assert health.allow_request() is False
+            health.record_success()
+        assert health.state == CircuitState.CLOSED
+
+    async def test_failed_trial_reopens(self):
+        """测试半开试探失败后重新熔断"""
+        health = AdapterHealth("fake", failure_threshold=1, recovery_timeout=10)
+        with patch(CLOCK, return_value=100.0):
+            await fail(health)
+        with patch(CLOCK, return_value=111.0):
+            await fail(health)
+            assert health.state == CircuitState.OPEN
+            assert health.allow_request() is False
+
+    async def test_probe_is_cached(self):
+        """测试探测结果在 TTL 内被缓存"""
+        health = AdapterHealth("fake", probe_ttl=30)
+        check = AsyncMock(return_value=True)
+        with patch(CLOCK, return_value=100.0):
+            assert await health.probe(check) is True
+        with patch(CLOCK, return_value=120.0):
+            assert await health.probe(check) is True
+        check.assert_awaited_once()
+
+    async def test_probe_skipped_while_open(self):
+        """测试熔断期间不发起探测"""
+        health = AdapterHealth("fake", failure_threshold=1)
+        await fail(health)
+        check = AsyncMock(return_value=True)
+        assert await health.probe(check) is False
+        check.assert_not_awaited()
+
+
+@pytest.mark.unit
+class TestOpenAIAvailability:
+    """OpenAI 可用性检查测试"""
+
+    async def test_is_available_uses_model_list(self):
+        """测试可用性检查调用模型列表而非补全接口"""
+        adapter = OpenAIAdapter(api_key="sk-test")
+        adapter.client = MagicMock()
+        adapter.client.models.list = AsyncMock(return_value=[])
+        adapter.client.chat.completions.create = AsyncMock()
+
+        assert await adapter.is_available() is True
+        assert await adapter.is_available() is True
+        adapter.client.models.list.assert_awaited_once()
+        adapter.client.chat.completions.create.assert_not_awaited()
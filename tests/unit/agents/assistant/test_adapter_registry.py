@@ -0,0 +1,106 @@
+"""
+AdapterRegistry 单元测试
+"""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from backend.src.agents.assistant.adapters.registry import AdapterRegistry, fingerprint_api_key
+
+
+def make_registry(**kwargs):
+    """创建使用假适配器工厂的注册表"""
+    def factory(model, api_key):
+        adapter = MagicMock()
+        adapter.model = model
+        adapter.api_key = api_key
+        adapter.aclose = AsyncMock()
+        return adapter
+
+    return AdapterRegistry(factories={"fake": factory}, **kwargs)
+
+
+@pytest.mark.unit
+class TestAdapterRegistry:
+    """适配器注册表测试"""
+
+    async def test_reuses_adapter_for_same_key(self):
+        """测试相同 (provider, model, key) 复用同一实例"""
+        registry = make_registry()
+        first = await registry.get("fake", "m1", "sk-1")
+        second = await registry.get("FAKE", "m1", "sk-1")
+        assert first is second
+        assert len(registry) == 1
+
+    async def test_different_keys_get_different_adapters(self):
+        """测试不同模型或密钥得到不同实例"""
+        registry = make_registry()
+        a = await registry.get("fake", "m1", "sk-1")
+        b = await registry.get("fake", "m1", "sk-2")
+        c = await registry.get("fake", "m2", "sk-1")
+        assert len({id(a), id(b), id(c)}) == 3
+
+    async def test_evicts_least_recently_used_when_full(self):
+        """测试超出容量时关闭最久未使用的适配器"""
+        registry = make_registry(max_size=2)
+        async with registry.lease("fake", "a") as a:
+            pass
+        async with registry.lease("fake", "b") as b:
+            pass
+        async with registry.lease("fake", "a"):  # a 变为最近使用
+            pass
+        async with registry.lease("fake", "c"):
+            pass
+
+        b.aclose.assert_awaited_once()
+        a.aclose.assert_not_awaited()
+        assert len(registry) == 2
+
+    async def test_leased_adapter_closed_after_release(self):
+        """测试被淘汰但仍在使用的适配器在最后一个租约归还后才关闭"""
+        registry = make_registry(max_size=1)
+        a = await registry.get("fake", "a")
+        second_lease = await registry.get("fake", "a")
+        assert second_lease is a
+
+        async with registry.lease("fake", "b"):
+            pass
+        assert len(registry) == 1
+        a.aclose.assert_not_awaited()
+
+        await registry.release(a)
+        a.aclose.assert_not_awaited()
+        await registry.release(a)
+        a.aclose.assert_awaited_once()
+
+    async def test_evicts_idle_adapters(self):
+        """测试空闲超时的适配器被回收"""
+        registry = make_registry(idle_ttl=10)
+        with patch("backend.src.agents.assistant.adapters.registry.time.monotonic", return_value=100.0):
+            async with registry.lease("fake", "a") as adapter:
+                pass
+        with patch("backend.src.agents.assistant.adapters.registry.time.monotonic", return_value=111.0):
+            assert await registry.evict_idle() == 1
+        adapter.aclose.assert_awaited_once()
+        assert len(registry) == 0
+
+    async def test_close_all(self):
+        """测试关闭时释放全部适配器"""
+        registry = make_registry()
+        adapters = [await registry.get("fake", name) for name in ("a", "b")]
+        await registry.close_all()
+        for adapter in adapters:
+            adapter.aclose.assert_awaited_once()
+        assert len(registry) == 0
+
+    async def test_unknown_provider(self):
+        """测试未知 provider 抛出 ValueError"""
+        with pytest.raises(ValueError):
+            await make_registry().get("unknown")
+
+    def test_fingerprint_does_not_leak_key(self):
+        """测试密钥指纹不包含原始密钥"""
+        fingerprint = fingerprint_api_key("sk-secret")
+        assert "secret" not in fingerprint
+        assert fingerprint == fingerprint_api_key("sk-secret")
+        assert fingerprint_api_key(None) == ""
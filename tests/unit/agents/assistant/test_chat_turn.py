@@ -0,0 +1,119 @@
+"""
+AIAssistantAgent 单轮对话持久化单元测试
+"""
+
+import pytest
+from unittest.mock import AsyncMock
+from sqlalchemy import event
+
+from backend.src.core.database import Base
+from backend.src.models.conversation import Conversation
+from backend.src.models.message import Message
+from backend.src.agents.assistant.agent import AIAssistantAgent
+from backend.src.agents.assistant.adapters.base import MessageRole
+
+
+@pytest.fixture
+async def agent(tmp_path):
+    """创建使用临时 SQLite 数据库的助手实例"""
+    adapter = AsyncMock()
+    adapter.chat.return_value = "Test response"
+    adapter.model = "test-model"
+
+    assistant = AIAssistantAgent(adapter, f"sqlite+aiosqlite:///{tmp_path / 'assistant.db'}")
+    async with assistant.conversation_manager.engine.begin() as conn:
+        await conn.run_sync(
+            Base.metadata.create_all,
+            tables=[Conversation.__table__, Message.__table__]
+        )
+    yield assistant
+    await assistant.conversation_manager.engine.dispose()
+
+
+def count_statements(engine):
+    """统计引擎执行的 SQL 语句与提交次数"""
+    stats = {"statements": [], "commits": 0}
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        stats["statements"].append(statement)
+
+    @event.listens_for(engine.sync_engine, "commit")
+    def on_commit(conn):
+        stats["commits"] += 1
+
+    return stats
+
+
+@pytest.mark.unit
+class TestChatTurn:
+    """单轮对话事务测试"""
+
+    async def test_chat_persists_turn_in_one_commit(self, agent):
+        """测试一轮对话只读一次、提交一次"""
+        manager = agent.conversation_manager
+        conversation = await manager.create_conversation("user-1", "test-model")
+
+        stats = count_statements(manager.engine)
+        response = await agent.chat(conversation.id, "Hello", "user-1")
+
+        assert response == "Test response"
+        assert stats["commits"] == 1
+        selects = [s for s in stats["statements"] if s.lstrip().upper().startswith("SELECT")]
+        assert len(selects) == 1
+
+        messages = await manager.get_conversation_messages(conversation.id)
+        assert [(m.role, m.content) for m in messages] == [
+            (MessageRole.USER.value, "Hello"),
+            (MessageRole.ASSISTANT.value, "Test response"),
+        ]
+
+        stored = await manager.get_conversation(conversation.id)
+        assert stored.title == "Hello"
+        assert stored.updated_at is not None
+
+    async def test_chat_sends_history_with_new_message(self, agent):
+        """测试上下文包含历史消息且以新消息结尾"""
+        conversation = await agent.conversation_manager.create_conversation("user-1", "test-model")
+        await agent.chat(conversation.id, "First", "user-1")
+        await agent.chat(conversation.id, "Second", "user-1")
+
+        context = agent.ai_adapter.chat.call_args[0][0]
+        assert context == [
+            {"role": "user", "content": "First"},
+            {"role": "assistant", "content": "Test response"},
+            {"role": "user", "content": "Second"},
+        ]
+
+    async def test_begin_turn_respects_token_limit(self, agent):
+        """测试上下文遵守 token 上限，新消息总是保留"""
+        manager = agent.conversation_manager
+        conversation = await manager.create_conversation("user-1", "test-model")
+        await agent.chat(conversation.id, "old " * 50, "user-1")
+
+        turn = await manager.begin_turn(conversation.id, "new", max_tokens=1)
+
+        assert turn.conversation.id == conversation.id
+        assert turn.context == [{"role": "user", "content": "new"}]
+
+    async def test_chat_creates_missing_conversation(self, agent):
+        """测试会话不存在时在同一事务中创建"""
+        manager = agent.conversation_manager
+        await agent.chat("missing-id", "Hi there", "user-2")
+
+        conversations = await manager.get_user_conversations("user-2")
+        assert len(conversations) == 1
+        assert conversations[0].model == "test-model"
+        messages = await manager.get_conversation_messages(conversations[0].id)
+        assert len(messages) == 2
+
+    async def test_failed_adapter_call_writes_nothing(self, agent):
+        """测试模型调用失败时不写入任何消息"""
+        manager = agent.conversation_manager
+        conversation = await manager.create_conversation("user-1", "test-model")
+        agent.ai_adapter.chat.side_effect = RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            await agent.chat(conversation.id, "Hello", "user-1")
+
+        assert await manager.get_conversation_messages(conversation.id) == []
@@ -0,0 +1,82 @@
+"""
+会话列表反规范化字段与索引单元测试
+"""
+
+import pytest
+from unittest.mock import AsyncMock
+from sqlalchemy import event, text
+
+from backend.src.core.database import Base
+from backend.src.models.conversation import Conversation
+from backend.src.models.message import Message
+from backend.src.agents.assistant.agent import AIAssistantAgent
+from backend.src.agents.assistant.adapters.base import MessageRole
+
+
+@pytest.fixture
+async def agent(tmp_path):
+    """创建使用临时 SQLite 数据库的助手实例"""
+    adapter = AsyncMock()
+    adapter.chat.return_value = "Assistant reply"
+    adapter.model = "test-model"
+
+    assistant = AIAssistantAgent(adapter, f"sqlite+aiosqlite:///{tmp_path / 'list.db'}")
+    async with assistant.conversation_manager.engine.begin() as conn:
+        await conn.run_sync(
+            Base.metadata.create_all,
+            tables=[Conversation.__table__, Message.__table__]
+        )
+    yield assistant
+    await assistant.conversation_manager.engine.dispose()
+
+
+@pytest.mark.unit
+class TestConversationList:
+    """会话列表测试"""
+
+    async def test_new_conversation_has_updated_at(self, agent):
+        """测试新会话的 updated_at 非空"""
+        conversation = await agent.conversation_manager.create_conversation("u", "m")
+        assert conversation.updated_at is not None
+        assert conversation.message_count == 0
+
+    async def test_writes_maintain_summary_fields(self, agent):
+        """测试写消息时维护预览、计数和最后消息时间"""
+        manager = agent.conversation_manager
+        conversation = await manager.create_conversation("u", "m")
+        await manager.add_message(conversation.id, MessageRole.SYSTEM, "Be brief")
+        await agent.chat(conversation.id, "Hello", "u")
+
+        [summary] = await agent.get_user_conversations("u")
+        assert summary["message_count"] == 3
+        assert summary["preview"] == "Assistant reply"
+        assert summary["title"] == "Be brief"
+        assert summary["last_message_at"] is not None
+
+    async def test_list_is_one_query_ordered_by_activity(self, agent):
+        """测试列表单次查询并按最近活动排序"""
+        manager = agent.conversation_manager
+        older = await manager.create_conversation("u", "m")
+        newer = await manager.create_conversation("u", "m")
+        await agent.chat(older.id, "bump", "u")
+
+        statements = []
+        event.listen(
+            manager.engine.sync_engine, "before_cursor_execute",
+            lambda conn, cursor, statement, *args: statements.append(statement)
+        )
+        conversations = await agent.get_user_conversations("u")
+
+        assert [c["id"] for c in conversations] == [older.id, newer.id]
+        assert len(statements) == 1
+
+    async def test_list_query_uses_composite_index(self, agent):
+        """测试列表查询使用 (user_id, updated_at) 复合索引"""
+        async with agent.conversation_manager.engine.connect() as conn:
+            plan = await conn.execute(text(
+                "EXPLAIN QUERY PLAN SELECT * FROM conversations "
+                "WHERE user_id = 'u' ORDER BY updated_at DESC LIMIT 50"
+            ))
+            details = " ".join(str(row[-1]) for row in plan)
+        assert "ix_conversations_user_id_updated_at" in details
+        assert "TEMP B-TREE" not in details
@@ -0,0 +1,55 @@
+"""
+ConversationManager 同步门面单元测试
+"""
+
+import pytest
+
+from backend.src.core.database import Base
+from backend.src.models.conversation import Conversation
+from backend.src.models.message import Message
+from backend.src.agents.assistant.adapters.base import MessageRole
+from backend.src.agents.assistant.conversation_manager import (
+    ConversationManager, to_async_database_url
+)
+
+
+@pytest.fixture
+def manager(tmp_path):
+    """创建使用临时 SQLite 数据库的同步管理器"""
+    cm = ConversationManager(f"sqlite:///{tmp_path / 'sync.db'}")
+
+    async def create_tables():
+        async with cm.manager.engine.begin() as conn:
+            await conn.run_sync(
+                Base.metadata.create_all,
+                tables=[Conversation.__table__, Message.__table__]
+            )
+
+    cm._run(create_tables())
+    yield cm
+    cm.close()
+
+
+@pytest.mark.unit
+class TestConversationManagerFacade:
+    """同步门面测试"""
+
+    def test_round_trip(self, manager):
+        """测试同步接口经由异步实现读写"""
+        conversation = manager.create_conversation("user-1", "test-model")
+        manager.add_message(conversation.id, MessageRole.USER, "Hello")
+
+        assert manager.get_conversation(conversation.id).title == "Hello"
+        assert manager.get_conversation_context(conversation.id) == [
+            {"role": "user", "content": "Hello"}
+        ]
+
+    async def test_refuses_to_block_running_loop(self, manager):
+        """测试在事件循环中调用时拒绝阻塞"""
+        with pytest.raises(RuntimeError):
+            manager.get_conversation("any")
+
+    def test_async_url_conversion(self):
+        """测试同步 SQLite URL 转换为 aiosqlite"""
+        assert to_async_database_url("sqlite:///./a.db") == "sqlite+aiosqlite:///./a.db"
+        assert to_async_database_url("sqlite+aiosqlite:///a.db") == "sqlite+aiosqlite:///a.db"
@@ -0,0 +1,122 @@
+"""
+FailoverAdapter 故障转移与对冲请求单元测试
+"""
+
+import asyncio
+import pytest
+
+from backend.src.agents.assistant.adapters.failover import FailoverAdapter, AllProvidersFailedError
+
+
+class FakeAdapter:
+    """可配置延迟与失败的假适配器"""
+
+    def __init__(self, name, reply="ok", delay=0.0, error=None, chunks=None):
+        self.model = name
+        self.reply = reply
+        self.delay = delay
+        self.error = error
+        self.chunks = chunks if chunks is not None else [reply]
+        self.calls = 0
+        self.closed_streams = 0
+
+    async def chat(self, messages, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.reply
+
+    async def stream(self, messages, **kwargs):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+            if self.error:
+                raise self.error
+            for chunk in self.chunks:
+                yield chunk
+        finally:
+            self.closed_streams += 1
+
+    async def is_available(self):
+        return self.error is None
+
+    def is_configured(self):
+        return True
+
+
+@pytest.mark.unit
+class TestFailoverAdapter:
+    """组合适配器测试"""
+
+    async def test_uses_first_adapter(self):
+        """测试首选适配器正常时不调用后备"""
+        primary, backup = FakeAdapter("a", "A"), FakeAdapter("b", "B")
+        adapter = FailoverAdapter([primary, backup])
+        assert await adapter.chat([]) == "A"
+        assert backup.calls == 0
+
+    async def test_fails_over_on_error(self):
+        """测试出错时转移到下一个适配器"""
+        primary = FakeAdapter("a", error=RuntimeError("down"))
+        backup = FakeAdapter("b", "B")
+        adapter = FailoverAdapter([primary, backup])
+        assert await adapter.chat([]) == "B"
+        assert adapter.stats()["FakeAdapter:a"]["failures"] == 1
+        assert adapter.stats()["FakeAdapter:b"]["wins"] == 1
+
+    async def test_all_failed(self):
+        """测试全部失败时抛出聚合异常"""
+        adapter = FailoverAdapter([
+            FakeAdapter("a", error=RuntimeError("x")),
+            FakeAdapter("b", error=RuntimeError("y")),
+        ])
+        with pytest.raises(AllProvidersFailedError) as exc_info:
+            await adapter.chat([])
+        assert len(exc_info.value.errors) == 2
+
+    async def test_hedges_slow_primary(self):
+        """测试首选过慢时触发对冲请求并采用更快结果"""
+        slow, fast = FakeAdapter("a", "A", delay=1.0), FakeAdapter("b", "B")
+        adapter = FailoverAdapter([slow, fast], hedge_after=0.01)
+
+        started = asyncio.get_running_loop().time()
+        assert await adapter.chat([]) == "B"
+        assert asyncio.get_running_loop().time() - started < 0.5
+        assert adapter.stats()["FakeAdapter:b"]["hedged"] == 1
+
+    async def test_no_hedge_without_config(self):
+        """测试未配置对冲时等待首选适配器"""
+        slow, fast = FakeAdapter("a", "A", delay=0.05), FakeAdapter("b", "B")
+        adapter = FailoverAdapter([slow, fast])
+        assert await adapter.chat([]) == "A"
+        assert fast.calls == 0
+
+    async def test_stream_fails_over_before_first_token(self):
+        """测试流式请求在首个 token 前可故障转移"""
+        primary = FakeAdapter("a", error=RuntimeError("down"))
+        backup = FakeAdapter("b", chunks=["x", "y"])
+        adapter = FailoverAdapter([primary, backup])
+        assert [chunk async for chunk in adapter.stream([])] == ["x", "y"]
+
+    async def test_stream_hedge_closes_loser(self):
+        """测试流式对冲时关闭落败的生成器"""
+        slow = FakeAdapter("a", chunks=["slow"], delay=1.0)
+        fast = FakeAdapter("b", chunks=["fast"])
+        adapter = FailoverAdapter([slow, fast], hedge_after=0.01)
+        assert [chunk async for chunk in adapter.stream([])] == ["fast"]
+        assert slow.closed_streams == 1
+
+    async def test_auto_factory_reads_settings(self, monkeypatch):
+        """测试 model_type=auto 的 provider 列表与对冲时间来自 Settings"""
+        from backend.src.agents.assistant.adapters import registry
+        from backend.src.core.config import settings
+
+        monkeypatch.setattr(settings, "ASSISTANT_FAILOVER_PROVIDERS", "b, a, unknown")
+        monkeypatch.setattr(settings, "ASSISTANT_HEDGE_AFTER_MS", 250)
+        monkeypatch.setitem(registry._PROVIDER_FACTORIES, "a", lambda model, key: FakeAdapter("a"))
+        monkeypatch.setitem(registry._PROVIDER_FACTORIES, "b", lambda model, key: FakeAdapter("b"))
+
+        adapter = registry._failover_factory(None, None)
+        assert [a.model for a in adapter.adapters] == ["b", "a"]
+        assert adapter.hedge_after == 0.25
@@ -0,0 +1,74 @@
+"""
+会话历史游标分页单元测试
+"""
+
+import pytest
+from sqlalchemy import text
+
+from backend.src.core.database import Base
+from backend.src.models.conversation import Conversation
+from backend.src.models.message import Message
+from backend.src.agents.assistant.async_conversation_manager import AsyncConversationManager
+from backend.src.agents.assistant.adapters.base import MessageRole
+
+
+@pytest.fixture
+async def manager(tmp_path):
+    """创建使用临时 SQLite 数据库的会话管理器"""
+    cm = AsyncConversationManager(f"sqlite+aiosqlite:///{tmp_path / 'history.db'}")
+    async with cm.engine.begin() as conn:
+        await conn.run_sync(
+            Base.metadata.create_all,
+            tables=[Conversation.__table__, Message.__table__]
+        )
+    yield cm
+    await cm.engine.dispose()
+
+
+@pytest.fixture
+async def conversation_id(manager):
+    """创建包含 7 条消息的会话"""
+    conversation = await manager.create_conversation("u", "m")
+    for i in range(7):
+        await manager.add_message(conversation.id, MessageRole.USER, f"msg {i}")
+    return conversation.id
+
+
+@pytest.mark.unit
+class TestMessageHistory:
+    """历史分页测试"""
+
+    async def test_pages_newest_first_with_cursor(self, manager, conversation_id):
+        """测试按游标从新到旧翻页直到结束"""
+        contents, cursor = [], None
+        while True:
+            page, cursor = await manager.get_message_page(conversation_id, limit=3, before=cursor)
+            contents.append([m.content for m in page])
+            if cursor is None:
+                break
+
+        assert contents == [
+            ["msg 6", "msg 5", "msg 4"],
+            ["msg 3", "msg 2", "msg 1"],
+            ["msg 0"],
+        ]
+
+    async def test_unknown_cursor_returns_empty_page(self, manager, conversation_id):
+        """测试不属于该会话的游标返回空页"""
+        page, cursor = await manager.get_message_page(conversation_id, before="missing")
+        assert page == [] and cursor is None
+
+    async def test_limited_messages_are_the_newest(self, manager, conversation_id):
+        """测试限量获取返回最新消息且按时间正序"""
+        messages = await manager.get_conversation_messages(conversation_id, limit=2)
+        assert [m.content for m in messages] == ["msg 5", "msg 6"]
+
+    async def test_page_query_uses_composite_index(self, manager):
+        """测试分页查询使用 (conversation_id, created_at) 复合索引"""
+        async with manager.engine.connect() as conn:
+            plan = await conn.execute(text(
+                "EXPLAIN QUERY PLAN SELECT * FROM messages "
+                "WHERE conversation_id = 'c' ORDER BY created_at DESC LIMIT 50"
+            ))
+            details = " ".join(str(row[-1]) for row in plan)
+        assert "ix_messages_conversation_id_created_at" in details
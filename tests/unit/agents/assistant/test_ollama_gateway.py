@@ -0,0 +1,181 @@
+"""
+OllamaGateway 并发限制、背压与 keep_alive 单元测试
+"""
+
+import asyncio
+import threading
+import warnings
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from backend.src.agents.assistant.adapters.health import AdapterHealth, CircuitState
+from backend.src.agents.assistant.adapters.ollama import OllamaAdapter
+from backend.src.agents.assistant.adapters.ollama_gateway import (
+    GatewayOverloadedError, OllamaGateway
+)
+
+
+def fake_response(body):
+    """构造 aiohttp 响应上下文管理器"""
+    response = MagicMock()
+    response.status = 200
+    response.json = AsyncMock(return_value=body)
+    context = MagicMock()
+    context.__aenter__ = AsyncMock(return_value=response)
+    context.__aexit__ = AsyncMock(return_value=None)
+    return context
+
+
+@pytest.mark.unit
+class TestOllamaGateway:
+    """网关测试"""
+
+    async def test_limits_concurrency(self):
+        """测试同时进行的生成数不超过上限，并记录排队深度"""
+        gateway = OllamaGateway(max_concurrency=2, max_queue=10)
+        release = asyncio.Event()
+        running = []
+        peak = 0
+
+        async def work():
+            nonlocal peak
+            async with gateway.slot():
+                running.append(1)
+                peak = max(peak, len(running))
+                await release.wait()
+                running.pop()
+
+        tasks = [asyncio.create_task(work()) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        assert gateway.metrics()["active"] == 2
+        assert gateway.metrics()["queued"] == 3
+
+        release.set()
+        await asyncio.gather(*tasks)
+        metrics = gateway.metrics()
+        assert peak == 2
+        assert metrics["completed"] == 5
+        assert metrics["queued"] == 0
+        assert metrics["latency_p50_ms"] is not None
+
+    async def test_session_from_stopped_loop_is_closed(self):
+        """测试事件循环变化时关闭旧循环的会话，而不是直接丢弃"""
+        gateway = OllamaGateway()
+        old_session = await gateway._get_session()
+        old_loop = asyncio.new_event_loop()
+        old_loop.close()
+        gateway._sessions = {old_loop: old_session}
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", ResourceWarning)
+            new_session = await gateway._get_session()
+
+        assert new_session is not old_session
+        assert old_session.closed
+        await gateway.aclose()
+
+    async def test_slots_shared_across_event_loops(self):
+        """测试另一线程的事件循环与当前循环共用并发上限，且各自使用自己的会话"""
+        gateway = OllamaGateway(max_concurrency=1, max_queue=10)
+        running = []
+        peak = 0
+
+        async def work():
+            nonlocal peak
+            async with gateway.slot():
+                running.append(1)
+                peak = max(peak, len(running))
+                await asyncio.sleep(0.02)
+                running.pop()
+            return await gateway._get_session()
+
+        other = asyncio.new_event_loop()
+        thread = threading.Thread(target=other.run_forever, daemon=True)
+        thread.start()
+        try:
+            remote = [asyncio.wrap_future(asyncio.run_coroutine_threadsafe(work(), other)) for _ in range(3)]
+            local = [asyncio.create_task(work()) for _ in range(3)]
+            sessions = await asyncio.gather(*remote, *local)
+
+            assert peak == 1
+            assert gateway.metrics()["completed"] == 6
+            assert gateway.metrics()["active"] == 0
+            assert len({id(session) for session in sessions}) == 2
+            await gateway.aclose()
+            assert all(session.closed for session in sessions)
+        finally:
+            other.call_soon_threadsafe(other.stop)
+            thread.join()
+            other.close()
+
+    def test_shared_gateway_limits_from_settings(self, monkeypatch):
+        """测试共享网关的限制来自 Settings"""
+        from backend.src.agents.assistant.adapters import ollama_gateway
+        from backend.src.core.config import settings
+
+        monkeypatch.setattr(settings, "OLLAMA_KEEP_ALIVE", "-1")
+        monkeypatch.setattr(settings, "OLLAMA_MAX_CONCURRENCY", 3)
+        monkeypatch.setattr(settings, "OLLAMA_MAX_QUEUE", 4)
+        monkeypatch.setattr(settings, "OLLAMA_READ_TIMEOUT", 60.0)
+        monkeypatch.setattr(ollama_gateway, "_gateways", {})
+
+        gateway = ollama_gateway.get_ollama_gateway("http://ollama.test:11434/")
+        assert (gateway.keep_alive, gateway.max_concurrency, gateway.max_queue, gateway.read_timeout) == (
+            "-1", 3, 4, 60.0
+        )
+        assert ollama_gateway.get_ollama_gateway("http://ollama.test:11434") is gateway
+
+    async def test_rejects_when_queue_full(self):
+        """测试排队已满时立即拒绝新请求"""
+        gateway = OllamaGateway(max_concurrency=1, max_queue=1)
+        release = asyncio.Event()
+
+        async def work():
+            async with gateway.slot():
+                await release.wait()
+
+        tasks = [asyncio.create_task(work()) for _ in range(2)]
+        await asyncio.sleep(0.01)
+
+        with pytest.raises(GatewayOverloadedError):
+            async with gateway.slot():
+                pytest.fail("request should be rejected")
+        assert gateway.metrics()["rejected"] == 1
+
+        release.set()
+        await asyncio.gather(*tasks)
+
+    async def test_queue_timeout(self):
+        """测试排队超时后拒绝请求"""
+        gateway = OllamaGateway(max_concurrency=1, queue_timeout=0.01)
+        async with gateway.slot():
+            with pytest.raises(GatewayOverloadedError):
+                async with gateway.slot():
+                    pass
+        assert gateway.metrics()["queued"] == 0
+
+    async def test_sends_keep_alive(self):
+        """测试请求携带 keep_alive 且不使用流式"""
+        gateway = OllamaGateway(keep_alive="-1")
+        session = MagicMock()
+        session.post = MagicMock(return_value=fake_response({"response": "ok"}))
+        gateway._get_session = AsyncMock(return_value=session)
+
+        result = await gateway.generate({"model": "m", "prompt": "p"})
+
+        assert result == {"response": "ok"}
+        body = session.post.call_args.kwargs["json"]
+        assert body["keep_alive"] == "-1"
+        assert body["stream"] is False
+
+    async def test_overload_does_not_trip_circuit(self):
+        """测试网关过载不计入 provider 熔断失败"""
+        gateway = OllamaGateway()
+        gateway.chat = AsyncMock(side_effect=GatewayOverloadedError("busy"))
+        adapter = OllamaAdapter(model="m", gateway=gateway)
+        adapter.health = AdapterHealth("ollama:m", failure_threshold=1)
+
+        with pytest.raises(GatewayOverloadedError):
+            await adapter.chat([{"role": "user", "content": "hi"}])
+        assert adapter.health.state == CircuitState.CLOSED
@@ -0,0 +1,122 @@
+"""
+Anthropic / OpenAI 提示前缀缓存与用量上报单元测试
+"""
+
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from backend.src.agents.assistant.adapters.anthropic import AnthropicAdapter, CACHE_CONTROL
+from backend.src.agents.assistant.adapters.base import collect_usage
+from backend.src.agents.assistant.adapters.openai import OpenAIAdapter
+
+MESSAGES = [
+    {"role": "system", "content": "You are a helpful assistant."},
+    {"role": "system", "content": "Summary of earlier conversation."},
+    {"role": "user", "content": "First question"},
+    {"role": "assistant", "content": "First answer"},
+    {"role": "user", "content": "New question"},
+]
+
+
+def anthropic_response(text="Hi", **usage):
+    usage = {"input_tokens": 10, "output_tokens": 5,
+             "cache_read_input_tokens": 0, "cache_creation_input_tokens": 0, **usage}
+    return SimpleNamespace(
+        content=[SimpleNamespace(type="text", text=text)],
+        usage=SimpleNamespace(**usage)
+    )
+
+
+@pytest.mark.unit
+class TestAnthropicPromptCache:
+    """Anthropic cache_control 标记测试"""
+
+    @pytest.fixture
+    def adapter(self):
+        adapter = AnthropicAdapter(api_key="sk-ant-test", model="claude-test")
+        adapter.client = MagicMock()
+        return adapter
+
+    async def test_marks_system_and_conversation_prefix(self, adapter):
+        """测试在系统提示末尾和最新一轮之前的消息上放置缓存断点"""
+        adapter.client.messages.create = AsyncMock(return_value=anthropic_response())
+
+        await adapter.chat(MESSAGES)
+
+        params = adapter.client.messages.create.call_args.kwargs
+        assert [block["text"] for block in params["system"]] == [
+            "You are a helpful assistant.", "Summary of earlier conversation."
+        ]
+        assert "cache_control" not in params["system"][0]
+        assert params["system"][-1]["cache_control"] == CACHE_CONTROL
+
+        messages = params["messages"]
+        assert messages[-2]["content"] == [
+            {"type": "text", "text": "First answer", "cache_control": CACHE_CONTROL}
+        ]
+        assert messages[-1]["content"] == "New question"
+        assert messages[0]["content"] == "First question"
+
+    async def test_disabled_sends_plain_prompt(self, adapter):
+        """测试关闭缓存时保持原始请求格式"""
+        adapter.prompt_cache = False
+        adapter.client.messages.create = AsyncMock(return_value=anthropic_response())
+
+        await adapter.chat(MESSAGES)
+
+        params = adapter.client.messages.create.call_args.kwargs
+        assert params["system"] == "You are a helpful assistant.\n\nSummary of earlier conversation."
+        assert all(isinstance(m["content"], str) for m in params["messages"])
+
+    async def test_reports_cache_tokens(self, adapter):
+        """测试上报缓存读写 token 数"""
+        adapter.client.messages.create = AsyncMock(return_value=anthropic_response(
+            input_tokens=12, output_tokens=7, cache_read_input_tokens=2000, cache_creation_input_tokens=300
+        ))
+
+        with collect_usage() as usage:
+            await adapter.chat(MESSAGES)
+
+        (report,) = usage
+        assert (report.provider, report.model) == ("anthropic", "claude-test")
+        assert (report.input_tokens, report.output_tokens) == (12, 7)
+        assert (report.cache_read_tokens, report.cache_write_tokens) == (2000, 300)
+
+
+@pytest.mark.unit
+class TestOpenAIPromptCache:
+    """OpenAI 自动前缀缓存测试"""
+
+    async def test_reports_cached_tokens_and_forwards_cache_key(self):
+        """测试上报已缓存的提示 token 并透传 prompt_cache_key"""
+        adapter = OpenAIAdapter(api_key="sk-test", model="gpt-test")
+        adapter.client = MagicMock()
+        adapter.client.chat.completions.create = AsyncMock(return_value=SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="Hi"))],
+            usage=SimpleNamespace(
+                prompt_tokens=1500,
+                completion_tokens=20,
+                prompt_tokens_details=SimpleNamespace(cached_tokens=1024)
+            )
+        ))
+
+        with collect_usage() as usage:
+            await adapter.chat(MESSAGES, prompt_cache_key="conv-1")
+
+        params = adapter.client.chat.completions.create.call_args.kwargs
+        assert params["messages"] == MESSAGES
+        assert params["extra_body"] == {"prompt_cache_key": "conv-1"}
+        (report,) = usage
+        assert (report.input_tokens, report.cache_read_tokens, report.output_tokens) == (476, 1024, 20)
+
+    async def test_no_report_outside_collector(self):
+        """测试没有收集者时调用不受影响"""
+        adapter = OpenAIAdapter(api_key="sk-test", model="gpt-test")
+        adapter.client = MagicMock()
+        adapter.client.chat.completions.create = AsyncMock(return_value=SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="Hi"))],
+            usage=None
+        ))
+
+        assert await adapter.chat(MESSAGES) == "Hi"
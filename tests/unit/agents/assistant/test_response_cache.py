@@ -0,0 +1,98 @@
+"""
+ResponseCache / CachingAdapter 单元测试
+"""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from backend.src.agents.assistant.adapters.cache import (
+    CachingAdapter, ResponseCache, make_cache_key
+)
+
+MESSAGES = [{"role": "user", "content": "Summarize  this"}]
+
+
+def make_adapter(cache):
+    """创建包装假适配器的缓存适配器"""
+    inner = MagicMock()
+    inner.model = "m"
+    inner.chat = AsyncMock(return_value="summary")
+    return CachingAdapter(inner, cache, "fake"), inner
+
+
+@pytest.mark.unit
+class TestResponseCache:
+    """响应缓存测试"""
+
+    async def test_deterministic_requests_hit_cache(self):
+        """测试 temperature=0 的相同请求命中缓存"""
+        cache = ResponseCache()
+        adapter, inner = make_adapter(cache)
+
+        assert await adapter.chat(MESSAGES, temperature=0) == "summary"
+        assert await adapter.chat([{"role": "USER", "content": "Summarize  this \n"}], temperature=0) == "summary"
+
+        inner.chat.assert_awaited_once()
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["hit_rate"] == 0.5
+
+    async def test_non_deterministic_requests_bypass(self):
+        """测试非确定性参数或 cache=False 绕过缓存"""
+        cache = ResponseCache()
+        adapter, inner = make_adapter(cache)
+
+        await adapter.chat(MESSAGES)
+        await adapter.chat(MESSAGES, temperature=0.7)
+        await adapter.chat(MESSAGES, temperature=0, cache=False)
+
+        assert inner.chat.await_count == 3
+        assert "cache" not in inner.chat.call_args.kwargs
+        assert cache.stats()["bypasses"] == 3
+
+    def test_key_includes_sampling_params(self):
+        """测试缓存键区分模型与采样参数"""
+        base = make_cache_key("p", "m", MESSAGES, {"temperature": 0})
+        assert base != make_cache_key("p", "m2", MESSAGES, {"temperature": 0})
+        assert base != make_cache_key("p", "m", MESSAGES, {"temperature": 0, "max_tokens": 5})
+
+    def test_key_keeps_inner_whitespace(self):
+        """测试缓存键只忽略首尾空白，缩进不同的内容不共享缓存"""
+        def key(content):
+            return make_cache_key("p", "m", [{"role": "user", "content": content}], {"temperature": 0})
+
+        assert key("  a:\n  b: 1\n") == key("a:\n  b: 1")
+        assert key("a:\n  b: 1") != key("a:\nb: 1")
+        assert key("if x:\n    y()") != key("if x: y()")
+
+    async def test_ttl_and_lru(self):
+        """测试过期与 LRU 淘汰"""
+        cache = ResponseCache(max_entries=1, ttl=10)
+        with patch("backend.src.agents.assistant.adapters.cache.time.time", return_value=100.0):
+            await cache.set("a", "A")
+            await cache.set("b", "B")
+            assert await cache.get("a") is None
+            assert await cache.get("b") == "B"
+        with patch("backend.src.agents.assistant.adapters.cache.time.time", return_value=111.0):
+            assert await cache.get("b") is None
+
+    async def test_sqlite_persistence(self, tmp_path):
+        """测试 SQLite 持久化在新实例中可读"""
+        path = str(tmp_path / "cache.db")
+        await ResponseCache(path=path).set("k", "persisted")
+
+        fresh = ResponseCache(path=path)
+        assert await fresh.get("k") == "persisted"
+        assert fresh.stats()["size"] == 1
+
+    def test_built_from_settings(self, monkeypatch):
+        """测试响应缓存开关、存储位置和 TTL 来自 Settings"""
+        from backend.src.agents.assistant.adapters.registry import response_cache_from_settings
+        from backend.src.core.config import settings
+
+        monkeypatch.setattr(settings, "ASSISTANT_RESPONSE_CACHE", "")
+        assert response_cache_from_settings() is None
+
+        monkeypatch.setattr(settings, "ASSISTANT_RESPONSE_CACHE", "memory")
+        monkeypatch.setattr(settings, "ASSISTANT_RESPONSE_CACHE_TTL", 60.0)
+        cache = response_cache_from_settings()
+        assert cache.path is None and cache.ttl == 60.0
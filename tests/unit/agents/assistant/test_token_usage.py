@@ -0,0 +1,124 @@
+"""
+UsageAggregator Token 用量统计与配额单元测试
+"""
+
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from unittest.mock import AsyncMock
+from sqlalchemy import event, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backend.src.core.database import Base
+from backend.src.models.conversation import Conversation
+from backend.src.models.message import Message
+from backend.src.models.token_usage import TokenUsage
+from backend.src.agents.assistant.agent import AIAssistantAgent
+from backend.src.agents.assistant.usage import QuotaExceededError, UsageAggregator, _upsert_insert
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    """创建带 token_usage 表的临时 SQLite 引擎"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'usage.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(
+            Base.metadata.create_all,
+            tables=[Conversation.__table__, Message.__table__, TokenUsage.__table__]
+        )
+    yield engine
+    await engine.dispose()
+
+
+def make_aggregator(engine, **kwargs):
+    return UsageAggregator(async_sessionmaker(engine, expire_on_commit=False), **kwargs)
+
+
+@pytest.mark.unit
+class TestUsageAggregator:
+    """用量聚合测试"""
+
+    async def test_flush_upserts_bucket_rows(self, engine):
+        """测试多次写入合并为同一时间桶的一行"""
+        usage = make_aggregator(engine)
+        at = datetime(2026, 1, 1, 10, 15, tzinfo=timezone.utc)
+        usage.record("u1", "c1", "m1", 100, 20, at=at)
+        usage.record("u1", "c1", "m1", 50, 10, at=at + timedelta(minutes=30))
+        assert await usage.flush() == 1
+
+        usage.record("u1", "c1", "m1", 1, 1, at=at)
+        await usage.flush()
+
+        async with usage.session_factory() as session:
+            rows = (await session.execute(select(TokenUsage))).scalars().all()
+        assert len(rows) == 1
+        assert rows[0].bucket_start == datetime(2026, 1, 1, 10)
+        assert (rows[0].prompt_tokens, rows[0].completion_tokens, rows[0].request_count) == (151, 31, 3)
+
+    def test_upsert_insert_follows_session_dialect(self):
+        """测试按会话的数据库方言选择 upsert 语句"""
+        def session_on(dialect):
+            return SimpleNamespace(bind=SimpleNamespace(dialect=SimpleNamespace(name=dialect)))
+
+        stmt = _upsert_insert(session_on("postgresql"))(TokenUsage).values(user_id="u1")
+        stmt = stmt.on_conflict_do_update(index_elements=["user_id"], set_={"request_count": 1})
+        assert "ON CONFLICT (user_id) DO UPDATE" in str(stmt.compile(dialect=postgresql.dialect()))
+
+        with pytest.raises(NotImplementedError):
+            _upsert_insert(session_on("mysql"))
+
+    async def test_get_usage_groups_by_model(self, engine):
+        """测试按模型分组查询时间窗口内的用量"""
+        usage = make_aggregator(engine)
+        now = datetime.now(timezone.utc)
+        usage.record("u1", "c1", "m1", 100, 20, at=now)
+        usage.record("u1", "c2", "m2", 10, 5, at=now)
+        usage.record("u1", "c1", "m1", 999, 999, at=now - timedelta(days=3))
+        usage.record("u2", "c3", "m1", 7, 7, at=now)
+
+        result = await usage.get_usage("u1", now - timedelta(days=1))
+
+        assert result["total_tokens"] == 135
+        assert result["requests"] == 2
+        assert {g["key"]: g["total_tokens"] for g in result["groups"]} == {"m1": 120, "m2": 15}
+
+    async def test_hard_quota_rejects(self, engine):
+        """测试达到硬配额后拒绝，且配额检查不重复查询数据库"""
+        usage = make_aggregator(engine, soft_limit=100, hard_limit=200)
+        usage.record("u1", "c1", "m1", 80, 30)
+        await usage.flush()
+
+        status = await usage.check_quota("u1")
+        assert status.used == 110
+        assert status.soft_exceeded and not status.hard_exceeded
+
+        statements = []
+        event.listen(engine.sync_engine, "before_cursor_execute",
+                     lambda *args: statements.append(args[2]))
+        usage.record("u1", "c1", "m1", 90, 0)
+        with pytest.raises(QuotaExceededError):
+            await usage.check_quota("u1")
+        assert statements == []
+
+    async def test_agent_checks_quota_before_adapter(self, engine, tmp_path):
+        """测试助手在调用模型前执行配额检查，并在回复后记录用量"""
+        adapter = AsyncMock()
+        adapter.chat.return_value = "Test response"
+        adapter.model = "test-model"
+        usage = make_aggregator(engine, hard_limit=1_000_000)
+        agent = AIAssistantAgent(adapter, str(engine.url), usage=usage)
+        try:
+            conversation = await agent.conversation_manager.create_conversation("u1", "test-model")
+            await agent.chat(conversation.id, "Hello there", "u1")
+            (key, counters), = usage._pending.items()
+            assert key[:3] == ("u1", conversation.id, "test-model")
+            assert counters[0] > 0 and counters[1] > 0 and counters[2] == 1
+
+            usage.hard_limit = 1
+            with pytest.raises(QuotaExceededError):
+                await agent.chat(conversation.id, "Again", "u1")
+            assert adapter.chat.await_count == 1
+        finally:
+            await agent.conversation_manager.engine.dispose()
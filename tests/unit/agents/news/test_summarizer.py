@@ -59,31 +59,28 @@ class TestSummarizer:
     @pytest.mark.asyncio
     async def test_summarize_with_ollama_success(self, summarizer):
         """测试 Ollama 摘要成功"""
-        import httpx
-        with patch('httpx.AsyncClient') as mock_client_class:
-            mock_response = MagicMock()
-            mock_response.status_code = 200
-            mock_response.json.return_value = {"response": "  Generated summary  "}
-            mock_client = MagicMock()
-            mock_client.__aenter__ = AsyncMock(return_value=mock_client)
-            mock_client.__aexit__ = AsyncMock(return_value=None)
-            mock_client.post = AsyncMock(return_value=mock_response)
-            mock_client_class.return_value = mock_client
-
+        mock_gateway = MagicMock()
+        mock_gateway.generate = AsyncMock(return_value={"response": "  Generated summary  "})
+        with patch(
+            'backend.src.agents.assistant.adapters.ollama_gateway.get_ollama_gateway',
+            return_value=mock_gateway
+        ):
             result = await summarizer._summarize_with_ollama("Test prompt", 200)
 
             assert result == "Generated summary"  # 应该被清理
+            payload = mock_gateway.generate.call_args[0][0]
+            assert payload["model"] == "deepseek-r1"
+            assert payload["prompt"] == "Test prompt"
 
     @pytest.mark.asyncio
     async def test_summarize_with_ollama_failure(self, summarizer):
         """测试 Ollama 摘要失败"""
-        import httpx
-        with patch('httpx.AsyncClient') as mock_client_class:
-            mock_client = MagicMock()
-            mock_client.__aenter__ = AsyncMock(side_effect=Exception("Connection error"))
-            mock_client.__aexit__ = AsyncMock(return_value=None)
-            mock_client_class.return_value = mock_client
-
+        mock_gateway = MagicMock()
+        mock_gateway.generate = AsyncMock(side_effect=Exception("Connection error"))
+        with patch(
+            'backend.src.agents.assistant.adapters.ollama_gateway.get_ollama_gateway',
+            return_value=mock_gateway
+        ):
             with pytest.raises(Exception):
                 await summarizer._summarize_with_ollama("Test prompt", 200)
 
@@ -0,0 +1,74 @@
+"""
+AgentManager 状态推送单元测试
+"""
+
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, patch
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backend.src.agents.manager import AgentManager, AgentStatus
+from backend.src.models import Agent, AgentSession
+
+
+@pytest.fixture
+async def sessions(tmp_path):
+    """带一个活动会话的临时数据库"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'agents.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Agent.metadata.create_all, tables=[Agent.__table__, AgentSession.__table__])
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    async with sessions() as session:
+        session.add(Agent(id=1, name="a", slug="a", category="Dev", status="idle"))
+        session.add(AgentSession(id="sess_1", agent_id="1", status=AgentStatus.IDLE.value))
+        await session.commit()
+    yield sessions
+    await engine.dispose()
+
+
+@pytest.fixture
+def hub():
+    with patch("backend.src.agents.manager.hub") as hub:
+        hub.update_agent_state = AsyncMock()
+        yield hub
+
+
+@pytest.mark.unit
+class TestStatePublishing:
+    """状态推送测试"""
+
+    async def test_state_published_after_commit(self, sessions, hub):
+        """测试状态变化在提交后才推送，并保持顺序"""
+        async with sessions() as session:
+            manager = AgentManager(session)
+            await manager.update_status("1", AgentStatus.BUSY)
+            await manager.terminate("1")
+            await asyncio.sleep(0)
+            hub.update_agent_state.assert_not_awaited()
+
+            await session.commit()
+            await asyncio.sleep(0.01)
+
+        statuses = [call.kwargs["status"] for call in hub.update_agent_state.await_args_list]
+        assert statuses == ["busy", "terminated"]
+        assert hub.update_agent_state.await_args.kwargs["session_id"] == "sess_1"
+
+    async def test_rolled_back_state_not_published(self, sessions, hub):
+        """测试回滚或未提交就关闭的变化不推送"""
+        async with sessions() as session:
+            await AgentManager(session).update_status("1", AgentStatus.ERROR, "boom")
+            await session.rollback()
+
+        async with sessions() as session:
+            await AgentManager(session).update_status("1", AgentStatus.BUSY)
+
+        async with sessions() as session:
+            # 同一会话多次构造 AgentManager 只注册一次监听
+            await AgentManager(session).update_status("1", AgentStatus.BUSY)
+            await AgentManager(session).update_status("1", AgentStatus.IDLE)
+            await session.commit()
+        await asyncio.sleep(0.01)
+
+        statuses = [call.kwargs["status"] for call in hub.update_agent_state.await_args_list]
+        assert statuses == ["busy", "idle"]
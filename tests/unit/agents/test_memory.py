@@ -0,0 +1,219 @@
+"""
+MemoryStore 缓存与覆盖写入单元测试
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backend.src.agents.memory import MemoryCache, MemoryStore
+from backend.src.models import Agent, AgentSession
+from backend.src.models.agent_memory import AgentMemory, MemoryType
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    """agent_memory 及其关联表所在的临时数据库"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'memory.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(AgentMemory.metadata.create_all, tables=[
+            Agent.__table__, AgentSession.__table__, AgentMemory.__table__
+        ])
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+def sessions(engine):
+    return async_sessionmaker(engine, expire_on_commit=False)
+
+
+@pytest.fixture
+def selects(engine):
+    """记录执行的 SELECT 语句数"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+
+@pytest.mark.unit
+class TestMemoryCache:
+    """记忆缓存测试"""
+
+    async def test_retrieve_served_from_cache_after_commit(self, sessions, selects):
+        """测试提交后的 store 直接写入缓存，retrieve 不再查询数据库"""
+        cache = MemoryCache()
+        async with sessions() as session:
+            store = MemoryStore(session, cache)
+            await store.store("a1", "ctx", {"topic": "notes"}, session_id="s1")
+            await session.commit()
+
+        selects.clear()
+        async with sessions() as session:
+            store = MemoryStore(session, cache)
+            assert await store.retrieve("a1", "ctx", session_id="s1") == {"topic": "notes"}
+            assert await store.retrieve("a1", "ctx") == {"topic": "notes"}
+        assert selects == []
+
+        # 未命中的结果（包括不存在）回填后也不再查询
+        async with sessions() as session:
+            store = MemoryStore(session, cache)
+            assert await store.retrieve("a1", "missing") is None
+            assert await store.retrieve("a1", "missing") is None
+        assert len(selects) == 1
+        assert cache.hits == 3
+
+    async def test_uncommitted_changes_not_cached(self, sessions):
+        """测试回滚或未提交关闭时缓存保持已提交的值"""
+        cache = MemoryCache()
+        async with sessions() as session:
+            await MemoryStore(session, cache).store("a1", "k", "v1")
+            await session.commit()
+
+        async with sessions() as session:
+            store = MemoryStore(session, cache)
+            await store.store("a1", "k", "v2")
+            # 本事务内读到自己的写入
+            assert await store.retrieve("a1", "k") == "v2"
+            await session.rollback()
+
+        async with sessions() as session:
+            store = MemoryStore(session, cache)
+            await store.store("a1", "k", "v3")
+        # 未提交即关闭
+
+        async with sessions() as session:
+            assert await MemoryStore(session, cache).retrieve("a1", "k") == "v1"
+            assert await MemoryStore(session, MemoryCache()).retrieve("a1", "k") == "v1"
+
+    async def test_delete_and_clear_session_invalidate(self, sessions):
+        """测试删除和清理会话记忆后缓存失效"""
+        cache = MemoryCache()
+        async with sessions() as session:
+            store = MemoryStore(session, cache)
+            await store.store("a1", "k", "long", memory_type=MemoryType.LONG_TERM)
+            await store.store("a1", "k", "short", session_id="s1")
+            await store.store("a1", "other", "x", session_id="s1")
+            await session.commit()
+
+        async with sessions() as session:
+            store = MemoryStore(session, cache)
+            assert await store.retrieve("a1", "k") == "short"
+            assert await store.delete("a1", "k", session_id="s1") is True
+            await session.commit()
+
+        async with sessions() as session:
+            store = MemoryStore(session, cache)
+            assert await store.retrieve("a1", "k", session_id="s1") is None
+            assert await store.retrieve("a1", "k") == "long"
+            assert await store.retrieve("a1", "other", session_id="s1") == "x"
+            assert await store.clear_session_memory("s1") == 1
+            await session.commit()
+
+        async with sessions() as session:
+            assert await MemoryStore(session, cache).retrieve("a1", "other", session_id="s1") is None
+
+    async def test_cached_entries_honor_expiry(self, sessions):
+        """测试缓存命中时仍检查过期时间"""
+        cache = MemoryCache()
+        async with sessions() as session:
+            store = MemoryStore(session, cache)
+            await store.store("a1", "k", "v", expires_at=datetime.now(timezone.utc) + timedelta(hours=1))
+            await store.store("a1", "old", "v", expires_at=datetime.now(timezone.utc) - timedelta(seconds=1))
+            await session.commit()
+
+        async with sessions() as session:
+            store = MemoryStore(session, cache)
+            assert await store.retrieve("a1", "k") == "v"
+            assert await store.retrieve("a1", "old") is None
+            # 从数据库读回的不带时区的时间同样生效
+            assert await MemoryStore(session, MemoryCache()).retrieve("a1", "old") is None
+
+    async def test_lru_bound(self, sessions):
+        """测试缓存条目数不超过上限"""
+        cache = MemoryCache(max_entries=2)
+        async with sessions() as session:
+            store = MemoryStore(session, cache)
+            for key in ("k1", "k2", "k3"):
+                await store.store("a1", key, key)
+            await session.commit()
+        assert len(cache) == 2
+        assert cache.get(("a1", None, "k1")) == (False, None)
+
+
+@pytest.mark.unit
+class TestMemoryUpsert:
+    """覆盖写入测试"""
+
+    async def test_store_overwrites_existing_key(self, sessions):
+        """测试重复 store 同一键只保留一行，最新值生效"""
+        async with sessions() as session:
+            store = MemoryStore(session, MemoryCache())
+            first = await store.store("a1", "k", "v1", session_id="s1")
+            second = await store.store("a1", "k", {"n": 2}, session_id="s1")
+            await session.commit()
+            assert second.id == first.id
+
+            count = await session.scalar(select(func.count()).select_from(AgentMemory))
+            assert count == 1
+            assert await MemoryStore(session, MemoryCache()).retrieve("a1", "k", session_id="s1") == {"n": 2}
+
+    async def test_existing_duplicates_resolved(self, sessions):
+        """测试历史重复行不再导致 retrieve 出错，store 时合并为一行"""
+        now = datetime.now(timezone.utc)
+        async with sessions() as session:
+            session.add_all([
+                AgentMemory(id="m1", agent_id="a1", memory_type="short_term", key="k",
+                            value="old", created_at=now - timedelta(minutes=1)),
+                AgentMemory(id="m2", agent_id="a1", memory_type="short_term", key="k",
+                            value="new", created_at=now),
+            ])
+            await session.commit()
+
+        async with sessions() as session:
+            store = MemoryStore(session, MemoryCache())
+            assert await store.retrieve("a1", "k") == "new"
+            await store.store("a1", "k", "newest")
+            await session.commit()
+            rows = (await session.execute(select(AgentMemory))).scalars().all()
+            assert [(row.id, row.value) for row in rows] == [("m2", "newest")]
+
+    async def test_overwrite_keeps_created_at_and_sets_updated_at(self, sessions):
+        """测试覆盖写入保留首次写入时间，并记录最后写入时间"""
+        async with sessions() as session:
+            store = MemoryStore(session, MemoryCache())
+            memory = await store.store("a1", "k", "v1")
+            created_at = memory.created_at
+            await store.store("a1", "k", "v2")
+            await session.commit()
+
+        assert memory.created_at == created_at
+        assert memory.updated_at > created_at
+
+
+@pytest.mark.unit
+class TestMemoryListeners:
+    """提交监听测试"""
+
+    async def test_listeners_registered_once_per_session(self, sessions):
+        """测试同一会话上多次创建 MemoryStore 只注册一次监听，暂存变化在实例间共享"""
+        cache = MemoryCache()
+        async with sessions() as session:
+            for n in range(5):
+                await MemoryStore(session, cache).store("a1", f"k{n}", n)
+            assert len(session.sync_session.dispatch.after_commit) == 1
+            assert len(session.sync_session.dispatch.after_transaction_end) == 1
+            # 其他实例也能看到本事务内的暂存变化，不读旧的缓存
+            assert MemoryStore(session, cache)._is_staged(("a1", None, "k0"))
+            await session.commit()
+
+        assert len(cache) == 5
+        assert cache.get(("a1", None, "k4")) == (True, ("4", None))
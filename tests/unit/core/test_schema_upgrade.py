@@ -0,0 +1,129 @@
+"""
+已有数据库的表结构升级单元测试
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import inspect, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backend.src.core.database import enable_incremental_vacuum, upgrade_schema
+from backend.src.models.agent_memory import AgentMemory
+from backend.src.models.agent_message import AgentMessage
+from backend.src.models.conversation import Conversation
+from backend.src.models.message import Message
+
+LEGACY_SCHEMA = [
+    "CREATE TABLE conversations (id VARCHAR PRIMARY KEY, user_id VARCHAR NOT NULL, title VARCHAR, "
+    "model VARCHAR NOT NULL, created_at DATETIME, updated_at DATETIME)",
+    "CREATE TABLE messages (id VARCHAR PRIMARY KEY, conversation_id VARCHAR NOT NULL, role VARCHAR NOT NULL, "
+    "content TEXT NOT NULL, token_count INTEGER, created_at DATETIME)",
+    "CREATE INDEX ix_messages_conversation_id ON messages (conversation_id)",
+    "INSERT INTO conversations VALUES ('c1', 'u1', 't', 'm', '2026-01-01 00:00:00', '2026-01-01 00:00:00')",
+    "INSERT INTO conversations VALUES ('c2', 'u1', 't', 'm', '2026-01-01 00:00:00', '2026-01-01 00:00:00')",
+    "INSERT INTO conversations VALUES ('c3', 'u1', 't', 'm', '2026-01-02 00:00:00', NULL)",
+    "INSERT INTO conversations VALUES ('c4', 'u1', 't', 'm', '2026-01-01 00:00:00', NULL)",
+    "INSERT INTO messages VALUES ('m1', 'c1', 'user', 'hello', 1, '2026-01-01 00:00:01')",
+    "INSERT INTO messages VALUES ('m2', 'c1', 'assistant', 'hi\n  there', 2, '2026-01-01 00:00:02')",
+    "INSERT INTO messages VALUES ('m3', 'c4', 'user', 'later', 1, '2026-01-03 00:00:00')",
+    "CREATE TABLE agent_messages (id VARCHAR(36) PRIMARY KEY, from_agent_id VARCHAR(36) NOT NULL, "
+    "to_agent_id VARCHAR(36) NOT NULL, message_type VARCHAR(20) NOT NULL, payload JSON NOT NULL, "
+    "status VARCHAR(20) NOT NULL, created_at DATETIME NOT NULL, processed_at DATETIME)",
+    "CREATE TABLE agent_memory (id VARCHAR(36) PRIMARY KEY, agent_id VARCHAR(36) NOT NULL, "
+    "session_id VARCHAR(36), memory_type VARCHAR(20) NOT NULL, key VARCHAR(255) NOT NULL, value TEXT, "
+    "is_encrypted BOOLEAN NOT NULL, created_at DATETIME NOT NULL, expires_at DATETIME)",
+]
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    """带旧版表结构的临时数据库"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'legacy.db'}")
+    async with engine.begin() as conn:
+        for statement in LEGACY_SCHEMA:
+            await conn.execute(text(statement))
+    yield engine
+    await engine.dispose()
+
+
+async def upgrade(engine):
+    async with engine.begin() as conn:
+        await conn.run_sync(Conversation.metadata.create_all, tables=[
+            Conversation.__table__, Message.__table__, AgentMessage.__table__, AgentMemory.__table__
+        ])
+        await conn.run_sync(upgrade_schema)
+
+
+@pytest.mark.unit
+class TestSchemaUpgrade:
+    """表结构升级测试"""
+
+    async def test_adds_conversation_columns_and_backfills(self, engine):
+        """测试为旧的 conversations 表补列、建索引并回填汇总字段"""
+        await upgrade(engine)
+        # 再次执行不报错，也不重复回填
+        await upgrade(engine)
+
+        async with engine.connect() as conn:
+            indexes = await conn.run_sync(lambda sync: inspect(sync).get_indexes("conversations"))
+        assert "ix_conversations_user_id_updated_at" in {index["name"] for index in indexes}
+
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        async with sessions() as session:
+            rows = (await session.execute(select(Conversation).order_by(Conversation.id))).scalars().all()
+        c1, c2, c3, c4 = rows
+        assert c1.message_count == 2
+        assert c1.preview == "hi there"
+        assert c1.last_message_at is not None
+        assert c2.message_count == 0
+        assert c2.preview is None and c2.last_message_at is None
+        # 空的 updated_at 依次取最后消息时间、创建时间
+        assert c3.updated_at == datetime(2026, 1, 2)
+        assert c4.updated_at == datetime(2026, 1, 3)
+        assert c1.updated_at == datetime(2026, 1, 1)
+
+    async def test_adds_agent_message_columns_and_inbox_index(self, engine):
+        """测试为旧的 agent_messages 表补齐 topic / 认领列和收件箱部分索引"""
+        await upgrade(engine)
+        await upgrade(engine)
+
+        async with engine.connect() as conn:
+            columns, indexes = await conn.run_sync(lambda sync: (
+                inspect(sync).get_columns("agent_messages"),
+                inspect(sync).get_indexes("agent_messages"),
+            ))
+        assert {"topic", "owner", "claimed_at"} <= {column["name"] for column in columns}
+        assert "ix_agent_messages_inbox" in {index["name"] for index in indexes}
+
+    async def test_adds_agent_memory_updated_at(self, engine):
+        """测试为旧的 agent_memory 表补齐 updated_at"""
+        await upgrade(engine)
+        await upgrade(engine)
+
+        async with engine.connect() as conn:
+            columns = await conn.run_sync(lambda sync: inspect(sync).get_columns("agent_memory"))
+        assert "updated_at" in {column["name"] for column in columns}
+
+    async def test_switches_existing_database_to_incremental_vacuum(self, engine):
+        """测试已有数据库一次性切换到 auto_vacuum=INCREMENTAL"""
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            assert (await conn.exec_driver_sql("PRAGMA auto_vacuum")).scalar() == 0
+            assert await conn.run_sync(enable_incremental_vacuum) is True
+            assert await conn.run_sync(enable_incremental_vacuum) is False
+            assert (await conn.exec_driver_sql("PRAGMA auto_vacuum")).scalar() == 2
+
+    async def test_replaces_message_history_index(self, engine):
+        """测试为旧的 messages 表建立 (conversation_id, created_at) 复合索引并删除单列索引"""
+        await upgrade(engine)
+        await upgrade(engine)
+
+        async with engine.connect() as conn:
+            indexes = await conn.run_sync(lambda sync: inspect(sync).get_indexes("messages"))
+            plan = (await conn.execute(text(
+                "EXPLAIN QUERY PLAN SELECT * FROM messages WHERE conversation_id = 'c1' "
+                "ORDER BY created_at DESC LIMIT 20"
+            ))).all()
+        assert {index["name"] for index in indexes} == {"ix_messages_conversation_id_created_at"}
+        assert "ix_messages_conversation_id_created_at" in " ".join(str(row[-1]) for row in plan)
@@ -0,0 +1,325 @@
+"""
+MessageBus 单元测试
+"""
+
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backend.src.message_bus import get_message_bus, message_bus
+from backend.src.message_bus.batcher import MessageBatcher
+from backend.src.message_bus.bus import MessageBus
+from backend.src.models.agent_message import AgentMessage, MessageStatus
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    """agent_messages 表所在的临时数据库"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'bus.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(AgentMessage.metadata.create_all, tables=[AgentMessage.__table__])
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+def sessions(engine):
+    return async_sessionmaker(engine, expire_on_commit=False)
+
+
+async def wait_for(predicate, timeout=3.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not met in time")
+        await asyncio.sleep(0.01)
+
+
+async def statuses(sessions):
+    async with sessions() as session:
+        rows = (await session.execute(select(AgentMessage))).scalars().all()
+    return {row.id: row.status for row in rows}
+
+
+async def expire_claims(sessions):
+    """把所有消息的认领时间改到很久以前，模拟认领实例已退出"""
+    async with sessions() as session:
+        await session.execute(update(AgentMessage).values(claimed_at=datetime(2000, 1, 1)))
+        await session.commit()
+
+
+@pytest.mark.unit
+class TestMessageBus:
+    """消息总线测试"""
+
+    async def test_shared_instance(self):
+        """测试 get_message_bus 返回进程内共享的实例"""
+        assert await get_message_bus() is message_bus
+        assert await get_message_bus() is await get_message_bus()
+
+    async def test_publish_persists_and_delivers(self, sessions):
+        """测试消息持久化后投递给订阅者并标记为已送达"""
+        bus = MessageBus(sessions, workers=2)
+        received = []
+
+        async def handler(message):
+            received.append(message)
+
+        await bus.subscribe("agent.2", handler)
+        await bus.start()
+        row = await bus.publish("agent.2", {"n": 1}, from_agent_id="1", to_agent_id="2")
+        await wait_for(lambda: received)
+        await bus.stop()
+
+        assert received == [{"n": 1}]
+        assert row.topic == "agent.2"
+        assert (await statuses(sessions)) == {row.id: MessageStatus.DELIVERED.value}
+
+    async def test_recovers_pending_on_start(self, sessions):
+        """测试重启后恢复 PENDING 消息并按原主题投递"""
+        first = MessageBus(sessions)
+        row = await first.publish("agent.2.request", {"q": "ping"}, from_agent_id="1", to_agent_id="2")
+        await first.flush()
+        # 进程在处理前退出，消息仍为 PENDING，认领不再续期
+        await expire_claims(sessions)
+
+        second = MessageBus(sessions)
+        received = []
+
+        async def handler(message):
+            received.append(message)
+
+        await second.subscribe("agent.2.request", handler)
+        assert await second.start() == 1
+        await wait_for(lambda: received)
+        await second.stop()
+
+        assert received == [{"q": "ping"}]
+        assert (await statuses(sessions))[row.id] == MessageStatus.DELIVERED.value
+
+    async def test_concurrent_recovery_claims_each_message_once(self, sessions):
+        """测试多个实例同时恢复时每条消息只被一个实例认领，运行中实例的消息不被接管"""
+        crashed, live = MessageBus(sessions), MessageBus(sessions)
+        for n in range(20):
+            await crashed.publish("agent.2.request", {"n": n}, from_agent_id="1", to_agent_id="2")
+        await crashed.flush()
+        await expire_claims(sessions)
+        await live.publish("agent.3.request", {"n": "live"}, from_agent_id="1", to_agent_id="3")
+        await live.flush()
+
+        recoverers = [MessageBus(sessions) for _ in range(4)]
+        counts = await asyncio.gather(*(bus.recover_pending() for bus in recoverers))
+
+        assert sum(counts) == 20
+        async with sessions() as session:
+            owners = dict((await session.execute(select(AgentMessage.id, AgentMessage.owner))).all())
+        assert set(owners.values()) <= {bus.instance_id for bus in recoverers} | {live.instance_id}
+        assert list(owners.values()).count(live.instance_id) == 1
+
+    async def test_renewed_claims_are_not_taken_over(self, sessions):
+        """测试续期后的消息不会被其他实例认领"""
+        owner = MessageBus(sessions, claim_ttl=60)
+        await owner.publish("agent.2.request", {"q": "ping"}, from_agent_id="1", to_agent_id="2")
+        await owner.flush()
+        await expire_claims(sessions)
+
+        assert await owner.renew_claims() == 1
+        assert await MessageBus(sessions, claim_ttl=60).recover_pending() == 0
+
+    async def test_workers_run_handlers_concurrently(self, sessions):
+        """测试多个 worker 并发执行慢处理器"""
+        bus = MessageBus(sessions, workers=4)
+        running, peak = 0, 0
+
+        async def slow_handler(message):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.05)
+            running -= 1
+
+        for topic in ("a", "b", "c", "d"):
+            await bus.subscribe(topic, slow_handler)
+        await bus.start()
+        for topic in ("a", "b", "c", "d"):
+            await bus.publish(topic, {}, persist=False)
+        await wait_for(lambda: bus.queue_depth == 0 and running == 0 and peak)
+        await bus.stop()
+
+        assert peak == 4
+
+
+@pytest.mark.unit
+class TestDispatch:
+    """按主题分发测试"""
+
+    async def test_ordering_within_topic(self, sessions):
+        """测试同一主题的消息按发布顺序逐条处理"""
+        bus = MessageBus(sessions, workers=4)
+        seen, in_flight, overlap = [], set(), False
+
+        async def handler(message):
+            nonlocal overlap
+            overlap = overlap or message["topic"] in in_flight
+            in_flight.add(message["topic"])
+            await asyncio.sleep(0.001 * (5 - message["n"]))
+            in_flight.discard(message["topic"])
+            seen.append((message["topic"], message["n"]))
+
+        for topic in ("a", "b"):
+            await bus.subscribe(topic, handler)
+        await bus.start()
+        for n in range(5):
+            for topic in ("a", "b"):
+                await bus.publish(topic, {"topic": topic, "n": n}, persist=False)
+        await wait_for(lambda: len(seen) == 10)
+        await bus.stop()
+
+        assert not overlap
+        for topic in ("a", "b"):
+            assert [n for t, n in seen if t == topic] == list(range(5))
+
+    async def test_slow_topic_does_not_block_others(self, sessions):
+        """测试慢主题不阻塞其他主题"""
+        bus = MessageBus(sessions, workers=2)
+        release = asyncio.Event()
+        fast = []
+
+        async def slow_handler(message):
+            await release.wait()
+
+        async def fast_handler(message):
+            fast.append(message["n"])
+
+        await bus.subscribe("slow", slow_handler)
+        await bus.subscribe("fast", fast_handler)
+        await bus.start()
+        await bus.publish("slow", {}, persist=False)
+        for n in range(3):
+            await bus.publish("fast", {"n": n}, persist=False)
+        await wait_for(lambda: len(fast) == 3)
+        release.set()
+        await bus.stop()
+
+        assert fast == [0, 1, 2]
+
+    async def test_failures_are_retried_then_dead_lettered(self, sessions):
+        """测试处理器超时重试，超过次数进入死信并标记消息失败"""
+        bus = MessageBus(sessions, handler_timeout=0.02, max_attempts=2, retry_backoff=0)
+        calls, ok, dead = [], [], []
+
+        async def hanging_handler(message):
+            calls.append(message)
+            await asyncio.sleep(1)
+
+        async def good_handler(message):
+            ok.append(message)
+
+        async def dead_letter_handler(dead_letter):
+            dead.append(dead_letter)
+
+        await bus.subscribe("agent.2", hanging_handler)
+        await bus.subscribe("agent.2", good_handler)
+        await bus.subscribe("bus.dead_letter", dead_letter_handler)
+        await bus.start()
+        row = await bus.publish("agent.2", {"n": 1}, from_agent_id="1", to_agent_id="2")
+        await wait_for(lambda: dead)
+        for _ in range(300):  # 死信先于状态更新发布，状态随下一批写入
+            if (await statuses(sessions)).get(row.id) == MessageStatus.FAILED.value:
+                break
+            await asyncio.sleep(0.01)
+        await bus.stop()
+
+        assert len(calls) == 2
+        assert ok == [{"n": 1}]
+        assert dead[0]["topic"] == "agent.2"
+        assert dead[0]["db_id"] == row.id
+        assert "timed out" in dead[0]["error"]
+        assert bus.get_dead_letters() == dead
+        assert (await statuses(sessions))[row.id] == MessageStatus.FAILED.value
+
+
+@pytest.mark.unit
+class TestBatchedPersistence:
+    """批量写入测试"""
+
+    async def test_batches_inserts_and_status_updates(self, engine, sessions):
+        """测试一批消息只产生一条 INSERT 和按状态分组的 UPDATE"""
+        statements = []
+
+        @event.listens_for(engine.sync_engine, "before_cursor_execute")
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement.split()[0].upper())
+
+        bus = MessageBus(sessions, workers=4, flush_interval=60)
+        handled = []
+
+        async def handler(message):
+            handled.append(message)
+
+        for to_agent_id in ("2", "3", "4"):
+            await bus.subscribe(f"agent.{to_agent_id}", handler)
+        rows = await bus.broadcast({"n": 1}, from_agent_id="1", target_agents=["2", "3", "4"])
+        await bus.flush()
+        await bus.start_processing()
+        await wait_for(lambda: len(handled) == 3 and bus.queue_depth == 0)
+        await bus.stop()
+
+        assert statements.count("INSERT") == 1
+        assert statements.count("UPDATE") == 1
+        assert set((await statuses(sessions)).values()) == {MessageStatus.DELIVERED.value}
+
+        statements.clear()
+        for row in rows:
+            await bus.mark_processed(row.id)
+        await bus.flush()
+        assert statements.count("UPDATE") == 1
+        assert set((await statuses(sessions)).values()) == {MessageStatus.PROCESSED.value}
+
+    async def test_status_change_before_flush_updates_pending_row(self, engine, sessions):
+        """测试写入前的状态变更直接合并到待插入的行"""
+        bus = MessageBus(sessions)
+        row = await bus.publish("agent.2", {}, from_agent_id="1", to_agent_id="2")
+        await bus.mark_processed(row.id)
+
+        pending = await bus.get_pending_messages("2")
+        assert pending == []
+        async with sessions() as session:
+            stored = await session.get(AgentMessage, row.id)
+        assert stored.status == MessageStatus.PROCESSED.value
+        assert stored.processed_at is not None
+
+    async def test_failing_row_is_isolated_then_dropped(self, sessions):
+        """测试整批失败时逐行写入，失败的行重试 max_retries 次后丢弃"""
+        bus = MessageBus(sessions)
+        batcher = MessageBatcher(sessions, max_retries=2)
+        first = bus._message_row("1", "2", "agent.2", {"n": 1})
+        batcher.add([dict(first)])
+        await batcher.flush()
+
+        # 重复的主键让整批 INSERT 失败
+        second = bus._message_row("1", "2", "agent.2", {"n": 2})
+        batcher.add([dict(first), second])
+        with pytest.raises(Exception):
+            await batcher.flush()
+        assert set(await statuses(sessions)) == {first["id"], second["id"]}
+        assert batcher.pending == 1 and batcher.dropped == 0
+
+        with pytest.raises(Exception):
+            await batcher.flush()
+        assert batcher.pending == 0 and batcher.dropped == 1
+        assert await batcher.flush() == 0
+
+    async def test_pending_writes_are_bounded(self, sessions):
+        """测试待写入的变化超过上限时丢弃最早的"""
+        bus = MessageBus(sessions)
+        batcher = MessageBatcher(sessions, max_pending=3)
+        rows = [bus._message_row("1", "2", "agent.2", {"n": n}) for n in range(5)]
+        batcher.add(rows)
+
+        assert batcher.pending == 3 and batcher.dropped == 2
+        await batcher.flush()
+        assert set(await statuses(sessions)) == {row["id"] for row in rows[2:]}
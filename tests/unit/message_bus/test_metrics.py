@@ -0,0 +1,87 @@
+"""
+MessageBus 延迟直方图与指标单元测试
+"""
+
+import asyncio
+
+import pytest
+
+from backend.src.message_bus.bus import MessageBus
+from backend.src.message_bus.metrics import LatencyHistogram
+
+
+@pytest.mark.unit
+class TestLatencyHistogram:
+    """延迟直方图测试"""
+
+    def test_percentiles_within_bucket_width(self):
+        """测试分位数估算落在真实值所在的桶内"""
+        histogram = LatencyHistogram()
+        for ms in range(1, 1001):
+            histogram.observe(ms / 1000)
+
+        assert histogram.count == 1000
+        assert 0.25 <= histogram.percentile(50) <= 0.5
+        assert 0.5 <= histogram.percentile(95) <= 1.0
+        assert 0.5 <= histogram.percentile(99) <= 1.0
+        assert histogram.percentile(100) == pytest.approx(1.0)
+
+    def test_snapshot_and_reset(self):
+        """测试快照以毫秒表示，reset 后清零"""
+        histogram = LatencyHistogram()
+        assert histogram.snapshot()["p99_ms"] == 0.0
+
+        histogram.observe(0.002)
+        histogram.observe(120.0)
+        snapshot = histogram.snapshot()
+        assert snapshot["count"] == 2
+        assert snapshot["max_ms"] == 120000.0
+        assert snapshot["buckets"]["2.5"] == 1
+        assert snapshot["buckets"]["+Inf"] == 1
+
+        histogram.reset()
+        assert histogram.snapshot()["count"] == 0
+
+
+@pytest.mark.unit
+class TestBusMetrics:
+    """总线指标测试"""
+
+    async def test_metrics_track_queue_and_latency(self):
+        """测试队列深度、计数和延迟随处理更新"""
+        bus = MessageBus(workers=1, max_attempts=1)
+
+        async def ok(message):
+            pass
+
+        async def broken(message):
+            raise RuntimeError("boom")
+
+        await bus.subscribe("agent.1", ok)
+        await bus.subscribe("agent.2", broken)
+        for topic in ("agent.1", "agent.1", "agent.2"):
+            await bus.publish(topic, {}, persist=False)
+
+        metrics = bus.get_metrics()
+        assert metrics["queue_depth"] == 3
+        assert metrics["active_topics"] == 2
+        assert metrics["topic_patterns"] == 2
+
+        await bus.start_processing()
+        try:
+            for _ in range(100):
+                if bus.get_metrics()["latency"]["dispatch"]["count"] == 3:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await bus.stop()
+
+        metrics = bus.get_metrics()
+        assert metrics["queue_depth"] == 0
+        # 死信本身也会发布一次（没有订阅者）
+        assert metrics["published"] == 4
+        assert metrics["delivered"] >= 2
+        assert metrics["failed"] == 1
+        assert metrics["dead_letters"] == 1
+        assert metrics["latency"]["dispatch"]["count"] >= 3
+        assert metrics["latency"]["handler"]["count"] == 3
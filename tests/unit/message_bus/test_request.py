@@ -0,0 +1,143 @@
+"""
+MessageBus 请求/响应单元测试
+"""
+
+import asyncio
+
+import pytest
+
+from backend.src.message_bus import (
+    MessageBus, NoResponderError, RequestFailedError, RequestTimeoutError
+)
+
+
+@pytest.fixture
+async def bus():
+    bus = MessageBus(workers=4, max_attempts=1)
+    await bus.start_processing()
+    yield bus
+    await bus.stop()
+
+
+@pytest.mark.unit
+class TestRequest:
+    """请求/响应测试"""
+
+    async def test_handler_return_value_is_reply(self, bus):
+        """测试处理器返回值作为回复"""
+        async def add(message):
+            return {"sum": message["a"] + message["b"]}
+
+        await bus.subscribe("calc.request", add)
+        assert await bus.request("calc.request", {"a": 1, "b": 2}, timeout=1) == {"sum": 3}
+        assert bus._requests == {}
+
+    async def test_deferred_reply(self, bus):
+        """测试稍后通过 reply() 回复，回复主题的订阅者也能收到"""
+        replies = []
+
+        async def worker(message):
+            asyncio.create_task(bus.reply(message, {"status": "done"}))
+
+        async def monitor(message):
+            replies.append(message)
+
+        await bus.subscribe("agent.2.request", worker)
+        await bus.subscribe("agent.2.response", monitor)
+        reply = await bus.request("agent.2.request", {"task": "x"}, timeout=1)
+
+        assert reply["status"] == "done"
+        assert reply["correlation_id"]
+        for _ in range(100):
+            if replies:
+                break
+            await asyncio.sleep(0.01)
+        assert replies == [reply]
+
+    async def test_concurrent_requests_matched_by_correlation_id(self, bus):
+        """测试并发请求按 correlation_id 各自收到回复"""
+        async def echo(message):
+            await asyncio.sleep(0.01 * (5 - message["n"]))
+            return message["n"]
+
+        await bus.subscribe("echo.*", echo)
+        results = await asyncio.gather(*(
+            bus.request(f"echo.{n % 2}", {"n": n}, timeout=1) for n in range(5)
+        ))
+        assert results == [0, 1, 2, 3, 4]
+
+    async def test_timeout(self, bus):
+        """测试超时未回复时抛出 RequestTimeoutError 并清理 future"""
+        async def silent(message):
+            return None
+
+        await bus.subscribe("silent.request", silent)
+        with pytest.raises(RequestTimeoutError):
+            await bus.request("silent.request", {}, timeout=0.05)
+        assert bus._requests == {}
+
+    async def test_no_responder_and_failure(self, bus):
+        """测试无订阅者立即失败，处理器失败时请求失败"""
+        with pytest.raises(NoResponderError):
+            await bus.request("nobody.request", {}, timeout=1)
+
+        async def broken(message):
+            raise ValueError("boom")
+
+        await bus.subscribe("broken.request", broken)
+        with pytest.raises(RequestFailedError):
+            await bus.request("broken.request", {}, timeout=1)
+
+    async def test_hash_monitors_do_not_answer_requests(self, bus):
+        """测试 # 通配的监听者不能抢答，也不会让请求失败"""
+        seen = []
+
+        async def monitor(message):
+            seen.append(message)
+            return {"from": "monitor"}
+
+        async def broken_monitor(message):
+            raise ValueError("boom")
+
+        async def worker(message):
+            await asyncio.sleep(0.01)
+            return {"from": "worker"}
+
+        await bus.subscribe("agent.#", monitor)
+        await bus.subscribe("#", broken_monitor)
+        with pytest.raises(NoResponderError):
+            await bus.request("agent.2.request", {}, timeout=1)
+
+        await bus.subscribe("agent.2.request", worker)
+        assert await bus.request("agent.2.request", {}, timeout=1) == {"from": "worker"}
+        assert seen
+
+    async def test_fails_when_a_responder_fails_without_reply(self, bus):
+        """测试没有回复且有应答方失败时请求立即失败"""
+        async def silent(message):
+            return None
+
+        async def broken(message):
+            raise ValueError("boom")
+
+        await bus.subscribe("task.request", silent)
+        await bus.subscribe("task.*", broken)
+        with pytest.raises(RequestFailedError):
+            await bus.request("task.request", {}, timeout=1)
+
+    async def test_slow_monitor_does_not_delay_reply(self, bus):
+        """测试回复不等待慢速的 # 监听者，监听者仍会执行完毕"""
+        finished = asyncio.Event()
+
+        async def slow_monitor(message):
+            await asyncio.sleep(0.5)
+            finished.set()
+
+        async def worker(message):
+            return {"ok": True}
+
+        await bus.subscribe("#", slow_monitor)
+        await bus.subscribe("slow.request", worker)
+        assert await bus.request("slow.request", {}, timeout=0.2) == {"ok": True}
+        assert not finished.is_set()
+        await asyncio.wait_for(finished.wait(), timeout=1)
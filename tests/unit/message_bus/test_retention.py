@@ -0,0 +1,138 @@
+"""
+agent_messages 保留任务与收件箱部分索引单元测试
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event, select, text, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backend.src.message_bus.bus import MessageBus
+from backend.src.message_bus.retention import MessageRetention, decode_archive
+from backend.src.models.agent_message import AgentMessage, AgentMessageArchive, MessageStatus
+
+
+@pytest.fixture
+async def sessions(tmp_path):
+    """开启增量 VACUUM 的临时数据库"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'retention.db'}")
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def incremental_vacuum(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        cursor.close()
+
+    async with engine.begin() as conn:
+        await conn.run_sync(
+            AgentMessage.metadata.create_all,
+            tables=[AgentMessage.__table__, AgentMessageArchive.__table__]
+        )
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+def message(index, status, age_days):
+    created_at = datetime.now(timezone.utc) - timedelta(days=age_days)
+    return AgentMessage(
+        id=f"msg_{index:04d}",
+        from_agent_id="1",
+        to_agent_id="2",
+        message_type="event",
+        topic="agent.2",
+        payload={"n": index, "text": "x" * 200},
+        status=status,
+        created_at=created_at,
+        processed_at=created_at if status == MessageStatus.PROCESSED.value else None
+    )
+
+
+@pytest.mark.unit
+class TestMessageRetention:
+    """保留任务测试"""
+
+    async def test_archives_old_finished_messages_in_chunks(self, sessions):
+        """测试只归档并删除过期的已结束投递的消息，按批写入压缩归档"""
+        async with sessions() as session:
+            session.add_all([message(i, MessageStatus.PROCESSED.value, 40) for i in range(5)])
+            session.add(message(5, MessageStatus.PROCESSED.value, 1))
+            session.add(message(6, MessageStatus.PENDING.value, 40))
+            session.add(message(7, MessageStatus.FAILED.value, 40))
+            await session.commit()
+
+        retention = MessageRetention(sessions, retention_days=30, chunk_size=2)
+        result = await retention.run_once()
+
+        assert result == {"archived": 6, "chunks": 3, "vacuumed": True}
+        async with sessions() as session:
+            remaining = (await session.execute(select(AgentMessage.id).order_by(AgentMessage.id))).scalars().all()
+            archives = (await session.execute(select(AgentMessageArchive))).scalars().all()
+            free_pages = (await session.execute(text("PRAGMA freelist_count"))).scalar()
+
+        assert remaining == ["msg_0005", "msg_0006"]
+        assert sorted(archive.message_count for archive in archives) == [2, 2, 2]
+        restored = sorted(
+            (row for archive in archives for row in decode_archive(archive.data)),
+            key=lambda row: row["id"]
+        )
+        assert [row["id"] for row in restored] == [f"msg_{i:04d}" for i in (0, 1, 2, 3, 4, 7)]
+        assert restored[0]["payload"]["n"] == 0
+        assert free_pages == 0
+
+        assert (await retention.run_once()) == {"archived": 0, "chunks": 0, "vacuumed": False}
+
+    async def test_archives_messages_handled_by_the_bus(self, sessions):
+        """测试经总线投递（DELIVERED）和处理失败（FAILED）的消息到期后被清理，PENDING 保留"""
+        bus = MessageBus(sessions, max_attempts=1, retry_backoff=0)
+
+        async def handler(message):
+            pass
+
+        async def broken(message):
+            raise ValueError("boom")
+
+        await bus.subscribe("agent.2", handler)
+        await bus.subscribe("agent.3", broken)
+        await bus.start_processing()
+        delivered = await bus.publish("agent.2", {"n": 1}, from_agent_id="1", to_agent_id="2")
+        failed = await bus.publish("agent.3", {"n": 2}, from_agent_id="1", to_agent_id="3")
+        for _ in range(300):
+            if bus.queue_depth == 0 and bus.get_metrics()["failed"] == 1:
+                break
+            await asyncio.sleep(0.01)
+        await bus.stop()
+        pending = await bus.publish("agent.4", {"n": 3}, from_agent_id="1", to_agent_id="4")
+        await bus.flush()
+
+        async with sessions() as session:
+            await session.execute(
+                update(AgentMessage).values(created_at=datetime.now(timezone.utc) - timedelta(days=40))
+            )
+            await session.commit()
+
+        result = await MessageRetention(sessions, retention_days=30).run_once()
+        assert result["archived"] == 2
+        async with sessions() as session:
+            remaining = (await session.execute(select(AgentMessage.id))).scalars().all()
+        assert remaining == [pending.id]
+        assert {delivered.id, failed.id}.isdisjoint(remaining)
+
+    async def test_pending_query_uses_partial_index(self, sessions):
+        """测试收件箱查询使用部分索引"""
+        bus = MessageBus(sessions)
+        async with sessions() as session:
+            session.add(message(1, MessageStatus.PENDING.value, 0))
+            session.add(message(2, MessageStatus.PROCESSED.value, 0))
+            await session.commit()
+
+            plan = (await session.execute(text(
+                "EXPLAIN QUERY PLAN SELECT * FROM agent_messages "
+                "WHERE to_agent_id = '2' AND status IN ('pending', 'delivered') "
+                "ORDER BY created_at DESC LIMIT 50"
+            ))).all()
+        assert "ix_agent_messages_inbox" in " ".join(str(row[-1]) for row in plan)
+
+        pending = await bus.get_pending_messages("2")
+        assert [row.id for row in pending] == ["msg_0001"]
@@ -0,0 +1,108 @@
+"""
+TopicRouter 通配符路由单元测试
+"""
+
+import asyncio
+
+import pytest
+
+from backend.src.message_bus.bus import MessageBus
+from backend.src.message_bus.router import TopicRouter
+
+
+def h(name):
+    async def handler(message):
+        pass
+    handler.__qualname__ = name
+    return handler
+
+
+def names(handlers):
+    return sorted(handler.__qualname__ for handler in handlers)
+
+
+@pytest.mark.unit
+class TestTopicRouter:
+    """主题 trie 测试"""
+
+    def test_exact_and_wildcards(self):
+        """测试精确匹配、* 和 # 通配符"""
+        router = TopicRouter()
+        router.add("agent.1", h("exact"))
+        router.add("agent.*", h("star"))
+        router.add("*.*.request", h("any_request"))
+        router.add("agent.#", h("agent_all"))
+        router.add("#", h("everything"))
+
+        assert names(router.match("agent.1")) == ["agent_all", "everything", "exact", "star"]
+        assert names(router.match("agent.2.request")) == ["agent_all", "any_request", "everything"]
+        assert names(router.match("agent")) == ["agent_all", "everything"]
+        assert names(router.match("task.done")) == ["everything"]
+
+    def test_hash_in_the_middle(self):
+        """测试 # 位于中间时匹配零或多段，且不重复返回"""
+        router = TopicRouter()
+        handler = h("mid")
+        router.add("agent.#.response", handler)
+        router.add("a.#.#", h("double"))
+
+        assert router.match("agent.response") == [handler]
+        assert router.match("agent.1.x.response") == [handler]
+        assert router.match("agent.1.request") == []
+        assert names(router.match("a.b.c")) == ["double"]
+
+    def test_responders_exclude_hash_patterns(self):
+        """测试应答方只包含模式中不含 # 的订阅"""
+        router = TopicRouter()
+        router.add("agent.2.request", h("exact"))
+        router.add("agent.*.request", h("star"))
+        router.add("agent.#", h("monitor"))
+        router.add("#.request", h("tail"))
+
+        assert names(router.match("agent.2.request")) == ["exact", "monitor", "star", "tail"]
+        assert names(router.responders("agent.2.request")) == ["exact", "star"]
+        assert router.responders("agent.3") == []
+
+    def test_cache_invalidated_on_change(self):
+        """测试订阅变更后缓存的匹配结果失效"""
+        router = TopicRouter()
+        star = h("star")
+        router.add("agent.*", star)
+        assert router.match("agent.1") == [star]
+
+        exact = h("exact")
+        router.add("agent.1", exact)
+        assert names(router.match("agent.1")) == ["exact", "star"]
+
+        assert router.remove("agent.*", star)
+        assert not router.remove("agent.*", star)
+        assert router.match("agent.1") == [exact]
+        assert router.patterns() == ["agent.1"]
+
+    def test_cache_is_bounded(self):
+        """测试缓存按 LRU 限制大小"""
+        router = TopicRouter(cache_size=2)
+        router.add("#", h("all"))
+        for topic in ("a", "b", "c"):
+            router.match(topic)
+        assert list(router._cache) == ["b", "c"]
+
+    async def test_bus_delivers_to_pattern_subscribers(self):
+        """测试消息总线按通配符订阅投递"""
+        bus = MessageBus(workers=2)
+        seen = []
+
+        async def monitor(message):
+            seen.append(message["n"])
+
+        await bus.subscribe("agent.*", monitor)
+        await bus.start_processing()
+        for n, topic in enumerate(("agent.1", "agent.2", "agent.2.request")):
+            await bus.publish(topic, {"n": n}, persist=False)
+        for _ in range(100):
+            if bus.queue_depth == 0 and len(seen) == 2:
+                break
+            await asyncio.sleep(0.01)
+        await bus.stop()
+
+        assert sorted(seen) == [0, 1]
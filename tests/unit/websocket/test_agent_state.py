@@ -0,0 +1,133 @@
+"""
+智能体状态快照与增量流单元测试
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from backend.src.websocket.agent_state import AgentStateTracker
+from backend.src.websocket.hub import ConnectionHub
+
+
+class FakeWebSocket:
+    """记录发送内容的假 WebSocket"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+    async def close(self, code=1000):
+        pass
+
+
+@pytest.mark.unit
+class TestAgentStateTracker:
+    """状态快照测试"""
+
+    async def test_deltas_coalesced_per_agent(self):
+        """测试合并窗口内同一智能体的多次变化只推送最新状态"""
+        deltas = []
+        tracker = AgentStateTracker(deltas.append, coalesce_window=0.02)
+
+        tracker.apply("1", "idle", session_id="s1", started_at="2026-01-01T00:00:00")
+        tracker.apply("1", "busy")
+        tracker.apply("2", "idle", session_id="s2")
+        tracker.apply("1", "idle")
+        await asyncio.sleep(0.05)
+
+        assert len(deltas) == 1
+        assert deltas[0]["type"] == "status_delta"
+        assert deltas[0]["seq"] == 4
+        assert deltas[0]["agents"] == [
+            {"agent_id": "1", "status": "idle", "session_id": "s1", "started_at": "2026-01-01T00:00:00"},
+            {"agent_id": "2", "status": "idle", "session_id": "s2", "started_at": None},
+        ]
+
+    async def test_snapshot_excludes_terminated(self):
+        """测试快照只包含活动智能体"""
+        tracker = AgentStateTracker(lambda delta: None)
+        tracker.load([
+            {"agent_id": "1", "status": "idle", "session_id": "s1"},
+            {"agent_id": "2", "status": "busy", "session_id": "s2"},
+        ])
+        tracker.apply("2", "terminated")
+        tracker.close()
+
+        snapshot = tracker.snapshot()
+        assert snapshot["type"] == "initial_state"
+        assert snapshot["epoch"] == tracker.epoch
+        assert snapshot["seq"] == 3
+        assert [agent["agent_id"] for agent in snapshot["agents"]] == ["1"]
+
+    async def test_errored_agents_leave_snapshot(self):
+        """测试进入 error 的智能体与已终止的一样不再出现在快照中，但会续传下发"""
+        tracker = AgentStateTracker(lambda delta: None)
+        tracker.load([{"agent_id": "1", "status": "idle"}, {"agent_id": "2", "status": "busy"}])
+        seq = tracker.seq
+        tracker.apply("2", "error")
+        tracker.close()
+
+        assert [agent["agent_id"] for agent in tracker.snapshot()["agents"]] == ["1"]
+        assert tracker.resume(tracker.epoch, seq)["agents"][0]["status"] == "error"
+
+    async def test_resume_sends_only_changes_since_seq(self):
+        """测试续传只补发 since 之后变化过的智能体（包括已终止的）"""
+        tracker = AgentStateTracker(lambda delta: None)
+        tracker.load([{"agent_id": str(i), "status": "idle"} for i in range(5)])
+        seq = tracker.seq
+        tracker.apply("3", "busy")
+        tracker.apply("4", "terminated")
+        tracker.close()
+
+        resumed = tracker.resume(tracker.epoch, seq)
+        assert resumed["type"] == "resumed"
+        assert resumed["seq"] == seq + 2
+        assert {agent["agent_id"]: agent["status"] for agent in resumed["agents"]} == {
+            "3": "busy", "4": "terminated"
+        }
+        assert tracker.resume(tracker.epoch, tracker.seq)["agents"] == []
+
+    async def test_resume_falls_back_to_snapshot(self):
+        """测试 epoch 不匹配或 seq 已被清理时回退为完整快照"""
+        tracker = AgentStateTracker(lambda delta: None, max_tombstones=1)
+        tracker.apply("1", "idle")
+        tracker.apply("2", "terminated")
+        tracker.apply("3", "terminated")
+        tracker.close()
+
+        assert tracker.resume("other-epoch", 1)["type"] == "initial_state"
+        assert tracker.resume(tracker.epoch, None)["type"] == "initial_state"
+        # 墓碑 "2" 已被清理，从 seq 1 续传会漏掉它
+        assert tracker.resume(tracker.epoch, 1)["type"] == "initial_state"
+        assert tracker.resume(tracker.epoch, 2)["type"] == "resumed"
+
+    async def test_hub_pushes_deltas_to_clients(self):
+        """测试 hub 把合并后的增量推送给所有连接"""
+        saved = ConnectionHub._instance
+        ConnectionHub._instance = None
+        hub = ConnectionHub()
+        ConnectionHub._instance = saved
+        hub.agent_states.coalesce_window = 0.02
+
+        ws = FakeWebSocket()
+        await hub.connect("c1", ws)
+        await hub.update_agent_state("7", "idle", session_id="s7")
+        await hub.update_agent_state("7", "busy")
+        await asyncio.sleep(0.05)
+
+        deltas = [message for message in ws.sent if message["type"] == "status_delta"]
+        assert len(deltas) == 1
+        assert deltas[0]["agents"] == [
+            {"agent_id": "7", "status": "busy", "session_id": "s7", "started_at": None}
+        ]
+        assert hub.agent_states.snapshot()["agents"] == deltas[0]["agents"]
+
+        await hub.disconnect("c1")
+        await hub.stop()
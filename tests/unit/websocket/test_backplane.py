@@ -0,0 +1,140 @@
+"""
+ConnectionHub 跨进程 backplane 单元测试
+
+每个 hub 实例代表一个 worker，各自持有独立的 backplane，
+通过真实的 Unix socket / SQLite 文件互相转发广播。
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from backend.src.websocket.backplane import (
+    InProcessBackplane, SQLiteBackplane, UnixSocketBackplane, backplane_from_url
+)
+from backend.src.websocket.hub import ConnectionHub
+
+
+class FakeWebSocket:
+    """记录发送内容的假 WebSocket"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+    async def close(self, code=1000):
+        pass
+
+
+async def start_workers(backplanes):
+    """为每个 backplane 启动一个 hub，并各连接一个订阅 a1 的客户端"""
+    saved = ConnectionHub._instance
+    workers = []
+    for index, backplane in enumerate(backplanes):
+        ConnectionHub._instance = None
+        hub = ConnectionHub(backplane=backplane)
+        await hub.start()
+        ws = FakeWebSocket()
+        await hub.connect(f"w{index}", ws, agent_id="a1")
+        workers.append((hub, ws, f"w{index}"))
+    ConnectionHub._instance = saved
+    return workers
+
+
+async def wait_for(predicate, timeout=3.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not met in time")
+        await asyncio.sleep(0.01)
+
+
+async def stop_workers(workers):
+    for hub, _, client_id in workers:
+        await hub.disconnect(client_id)
+        await hub.stop()
+
+
+@pytest.mark.unit
+class TestBackplane:
+    """多 worker 广播测试"""
+
+    @pytest.mark.parametrize("kind", ["unix", "sqlite"])
+    async def test_broadcast_reaches_every_worker_once(self, kind, tmp_path):
+        """测试一个 worker 的广播恰好送达每个 worker 的客户端一次"""
+        if kind == "unix":
+            backplanes = [UnixSocketBackplane(str(tmp_path / "hub.sock")) for _ in range(3)]
+        else:
+            backplanes = [SQLiteBackplane(str(tmp_path / "hub.db"), poll_interval=0.01) for _ in range(3)]
+        workers = await start_workers(backplanes)
+        try:
+            hub0 = workers[0][0]
+            assert await hub0.broadcast({"type": "message", "n": 1}) == 1
+            assert await hub0.broadcast_to_agent("a1", {"type": "status", "agent_id": "a1"}) == 1
+            assert await workers[2][0].broadcast_to_agent("a2", {"type": "status", "agent_id": "a2"}) == 0
+
+            await wait_for(lambda: all(len(ws.sent) == 2 for _, ws, _ in workers))
+            await asyncio.sleep(0.1)
+            for _, ws, _ in workers:
+                assert ws.sent == [{"type": "message", "n": 1}, {"type": "status", "agent_id": "a1"}]
+        finally:
+            await stop_workers(workers)
+
+    async def test_unix_broker_failover(self, tmp_path):
+        """测试 broker 所在 worker 退出后由其他 worker 接任"""
+        path = str(tmp_path / "hub.sock")
+        backplanes = [UnixSocketBackplane(path, reconnect_interval=0.05) for _ in range(3)]
+        workers = await start_workers(backplanes)
+        try:
+            broker = next(w for w in workers if w[0].backplane.is_broker)
+            workers.remove(broker)
+            await stop_workers([broker])
+
+            async def delivered():
+                await workers[0][0].broadcast({"type": "message"})
+                await asyncio.sleep(0.05)
+                return len(workers[1][1].sent) > 0
+
+            for _ in range(60):
+                if await delivered():
+                    break
+            assert workers[1][1].sent
+            assert any(hub.backplane.is_broker for hub, _, _ in workers)
+        finally:
+            await stop_workers(workers)
+
+    def test_backplane_from_url(self):
+        """测试按配置创建 backplane"""
+        assert isinstance(backplane_from_url("local"), InProcessBackplane)
+        assert isinstance(backplane_from_url("unix:/tmp/hub.sock"), UnixSocketBackplane)
+        assert isinstance(backplane_from_url("sqlite:/tmp/hub.db"), SQLiteBackplane)
+        with pytest.raises(ValueError):
+            backplane_from_url("redis://localhost")
+
+    async def test_broker_disconnects_peer_that_stops_reading(self, tmp_path, caplog):
+        """测试 broker 断开不读数据的 worker，其他 worker 照常收到广播"""
+        path = str(tmp_path / "hub.sock")
+        backplanes = [UnixSocketBackplane(path, max_buffer=64 * 1024) for _ in range(2)]
+        workers = await start_workers(backplanes)
+        broker = next(hub.backplane for hub, _, _ in workers if hub.backplane.is_broker)
+        # 连接后从不读取的 worker
+        _, stuck = await asyncio.open_unix_connection(path)
+        try:
+            await wait_for(lambda: len(broker._peers) == 3)
+            sender = workers[0][0]
+            frame = {"type": "message", "text": "x" * 4096}
+            for _ in range(500):
+                await sender.broadcast(frame)
+
+            await wait_for(lambda: len(broker._peers) == 2)
+            await wait_for(lambda: len(workers[1][1].sent) == 500)
+            assert "not reading" in caplog.text
+        finally:
+            stuck.close()
+            await stop_workers(workers)
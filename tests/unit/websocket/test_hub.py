@@ -0,0 +1,327 @@
+"""
+ConnectionHub 出站队列、慢消费者策略与心跳单元测试
+"""
+
+import asyncio
+import json
+
+import pytest
+from unittest.mock import patch
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backend.src.models.ws_connection import WSConnection
+from backend.src.websocket import connection as connection_module
+from backend.src.websocket.connection import SLOW_CONSUMER_CLOSE_CODE, SlowConsumerPolicy
+from backend.src.websocket.hub import IDLE_CLOSE_CODE, ConnectionHub
+
+
+class FakeWebSocket:
+    """记录发送内容的假 WebSocket，可通过 gate 模拟慢客户端"""
+
+    def __init__(self, slow: bool = False):
+        self.sent = []
+        self.frames = []
+        self.accepted = 0
+        self.closed_with = None
+        self.gate = asyncio.Event()
+        if not slow:
+            self.gate.set()
+
+    async def accept(self):
+        self.accepted += 1
+
+    async def send_text(self, text):
+        await self.gate.wait()
+        self.frames.append(text)
+        self.sent.append(json.loads(text))
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+@pytest.fixture
+def make_hub():
+    """创建独立的 hub 实例（绕过全局单例）"""
+    saved = ConnectionHub._instance
+
+    def factory(**kwargs):
+        ConnectionHub._instance = None
+        return ConnectionHub(**kwargs)
+
+    yield factory
+    ConnectionHub._instance = saved
+
+
+async def settle():
+    """让写任务运行"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def status(agent_id, new_status):
+    return {"type": "status", "agent_id": agent_id, "new_status": new_status}
+
+
+@pytest.mark.unit
+class TestConnectionHub:
+    """出站队列测试"""
+
+    async def test_slow_client_does_not_block_others(self, make_hub):
+        """测试慢客户端不影响其他客户端接收广播"""
+        hub = make_hub(max_queue=10)
+        slow, fast = FakeWebSocket(slow=True), FakeWebSocket()
+        await hub.connect("slow", slow)
+        await hub.connect("fast", fast)
+
+        assert await hub.broadcast({"type": "message", "n": 1}) == 2
+        await settle()
+
+        assert fast.sent == [{"type": "message", "n": 1}]
+        assert slow.sent == []
+
+        slow.gate.set()
+        await settle()
+        assert slow.sent == [{"type": "message", "n": 1}]
+        await hub.disconnect("slow")
+        await hub.disconnect("fast")
+
+    async def test_drop_oldest_policy(self, make_hub):
+        """测试队列满时丢弃最旧消息"""
+        hub = make_hub(max_queue=2, policy=SlowConsumerPolicy.DROP_OLDEST)
+        ws = FakeWebSocket(slow=True)
+        await hub.connect("c", ws)
+
+        await hub.send_to("c", {"type": "message", "n": 0})
+        await settle()  # 写任务取出第 0 条并阻塞在发送上
+        for n in range(1, 4):
+            await hub.send_to("c", {"type": "message", "n": n})
+        ws.gate.set()
+        await settle()
+
+        # 第 0 条已被写任务取出，1 被挤掉
+        assert [m["n"] for m in ws.sent] == [0, 2, 3]
+        await hub.disconnect("c")
+
+    async def test_coalesce_status_policy(self, make_hub):
+        """测试队列满时同一 agent 的状态更新被合并为最新一条"""
+        hub = make_hub(max_queue=2, policy=SlowConsumerPolicy.COALESCE)
+        ws = FakeWebSocket(slow=True)
+        await hub.connect("c", ws)
+
+        await hub.send_to("c", status("a1", "starting"))
+        await settle()
+        await hub.send_to("c", status("a1", "running"))
+        await hub.send_to("c", status("a2", "idle"))
+        await hub.send_to("c", status("a1", "error"))
+        ws.gate.set()
+        await settle()
+
+        assert [(m["agent_id"], m["new_status"]) for m in ws.sent] == [
+            ("a1", "starting"), ("a1", "error"), ("a2", "idle")
+        ]
+        await hub.disconnect("c")
+
+    async def test_disconnect_policy(self, make_hub):
+        """测试队列满时断开慢客户端"""
+        hub = make_hub(max_queue=1, policy=SlowConsumerPolicy.DISCONNECT)
+        ws = FakeWebSocket(slow=True)
+        await hub.connect("c", ws)
+        await settle()
+
+        assert await hub.send_to("c", {"type": "message"})
+        assert not await hub.send_to("c", {"type": "message"})
+        ws.gate.set()
+        await settle()
+
+        assert ws.closed_with == SLOW_CONSUMER_CLOSE_CODE
+        assert not await hub.send_to("c", {"type": "message"})
+        await hub.disconnect("c")
+
+    async def test_status_update_sent_once_to_subscribers(self, make_hub):
+        """测试订阅者只收到一次状态更新"""
+        hub = make_hub()
+        ws = FakeWebSocket()
+        await hub.connect("c", ws, agent_id="a1")
+
+        await hub.send_status_update("a1", "idle", "running")
+        await settle()
+
+        assert len(ws.sent) == 1
+        await hub.disconnect("c")
+
+    async def test_broadcast_serializes_once(self, make_hub):
+        """测试广播只序列化一次，所有连接发送同一帧"""
+        hub = make_hub()
+        sockets = [FakeWebSocket() for _ in range(3)]
+        for index, ws in enumerate(sockets):
+            await hub.connect(f"c{index}", ws)
+
+        with patch.object(connection_module, "dumps", wraps=connection_module.dumps) as dumps:
+            await hub.broadcast({"type": "message", "text": "你好"})
+        await settle()
+
+        assert dumps.call_count == 1
+        assert all(ws.frames[0] is sockets[0].frames[0] for ws in sockets)
+        assert sockets[0].sent == [{"type": "message", "text": "你好"}]
+        for index in range(3):
+            await hub.disconnect(f"c{index}")
+
+
+@pytest.mark.unit
+class TestSubscriptions:
+    """订阅索引测试"""
+
+    async def test_multi_agent_subscriptions(self, make_hub):
+        """测试一个客户端可订阅多个 agent，且订阅变更不触碰连接"""
+        hub = make_hub()
+        ws = FakeWebSocket()
+        await hub.connect("c", ws, agent_id="a1")
+
+        assert hub.subscribe("c", "a2")
+        assert hub.get_subscriptions("c") == {"a1", "a2"}
+        assert await hub.broadcast_to_agent("a2", {"type": "message"}) == 1
+
+        hub.unsubscribe("c", "a1")
+        assert hub.get_subscriptions("c") == {"a2"}
+        assert hub.get_subscriber_count("a1") == 0
+        assert await hub.broadcast_to_agent("a1", {"type": "message"}) == 0
+        assert ws.accepted == 1
+        await hub.disconnect("c")
+
+    async def test_subscribe_requires_connection(self, make_hub):
+        """测试未连接的客户端不能订阅"""
+        hub = make_hub()
+        assert not hub.subscribe("ghost", "a1")
+        assert hub.get_subscriber_count("a1") == 0
+
+    async def test_disconnect_clears_both_indexes(self, make_hub):
+        """测试断开连接时清理双向索引"""
+        hub = make_hub()
+        await hub.connect("c1", FakeWebSocket(), agent_id="a1")
+        await hub.connect("c2", FakeWebSocket(), agent_id="a1")
+        hub.subscribe("c1", "a2")
+
+        await hub.disconnect("c1")
+
+        assert hub.get_subscriptions("c1") == set()
+        assert hub.get_subscriber_count("a1") == 1
+        assert "a2" not in hub._agent_subscribers
+        await hub.disconnect("c2")
+
+
+@pytest.fixture
+async def ws_sessions(tmp_path):
+    """ws_connections 表所在的临时数据库"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'ws.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(WSConnection.metadata.create_all, tables=[WSConnection.__table__])
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.mark.unit
+class TestHeartbeat:
+    """服务端心跳与连接统计测试"""
+
+    async def test_reaps_idle_and_pings_others(self, make_hub):
+        """测试回收空闲连接，其余连接收到 ping"""
+        hub = make_hub(idle_timeout=10, session_factory=None)
+        idle, alive = FakeWebSocket(), FakeWebSocket()
+        await hub.connect("idle", idle, agent_id="a1")
+        await hub.connect("alive", alive, agent_id="a1")
+        hub._connections["idle"].last_seen -= 60
+        hub.touch("alive", 16)
+
+        assert await hub.heartbeat() == 1
+        await settle()
+
+        assert idle.closed_with == IDLE_CLOSE_CODE
+        assert hub.get_connection_count() == 1
+        assert hub.get_subscriber_count("a1") == 1
+        assert [m["type"] for m in alive.sent] == ["ping"]
+        assert hub.get_metrics()["reaped"] == 1
+        await hub.disconnect("alive")
+
+    async def test_unanswered_pings_are_reaped_even_if_sends_succeed(self, make_hub):
+        """测试写入成功但从不回复 pong 的连接（如半开连接）会被回收，回复 pong 的保留"""
+        hub = make_hub(idle_timeout=10, session_factory=None)
+        zombie, client = FakeWebSocket(), FakeWebSocket()
+        await hub.connect("zombie", zombie)
+        await hub.connect("client", client)
+
+        for _ in range(3):
+            assert await hub.heartbeat() == 0
+            await settle()
+            hub.touch("client", 16)  # 回复 pong
+        assert [m["type"] for m in zombie.sent] == ["ping"] * 3
+
+        for connection in hub._connections.values():
+            connection.last_seen -= 60
+        hub.touch("client", 16)
+        assert await hub.heartbeat() == 1
+        await settle()
+        assert zombie.closed_with == IDLE_CLOSE_CODE
+        assert client.closed_with is None
+        await hub.disconnect("client")
+
+    async def test_connection_stats_and_metrics(self, make_hub):
+        """测试每个连接的收发统计汇总到 hub 指标"""
+        hub = make_hub(session_factory=None)
+        sockets = [FakeWebSocket() for _ in range(2)]
+        for index, ws in enumerate(sockets):
+            await hub.connect(f"c{index}", ws)
+        hub.touch("c0", 10)
+
+        await hub.broadcast({"type": "message", "text": "你好"})
+        await settle()
+        frame_size = len(sockets[0].frames[0].encode("utf-8"))
+
+        stats = hub._connections["c0"].stats()
+        assert stats["messages_sent"] == 1
+        assert stats["bytes_sent"] == frame_size
+        assert stats["messages_received"] == 1
+        assert stats["bytes_received"] == 10
+        assert stats["queue_depth"] == 0
+
+        await hub.disconnect("c1")
+        metrics = hub.get_metrics(include_connections=True)
+        assert metrics["connections"] == 1
+        assert metrics["messages_sent"] == 2  # 已断开连接的统计仍计入总数
+        assert metrics["bytes_sent"] == 2 * frame_size
+        assert [client["client_id"] for client in metrics["clients"]] == ["c0"]
+        await hub.disconnect("c0")
+
+    async def test_connections_persisted_in_batches(self, make_hub, ws_sessions):
+        """测试连接记录随心跳批量写入 ws_connections"""
+        hub = make_hub(session_factory=ws_sessions)
+        await hub.connect("c1", FakeWebSocket(), agent_id="a1")
+        await hub.connect("c2", FakeWebSocket())
+        await hub.connect("short", FakeWebSocket())
+        await hub.disconnect("short")  # 未写入前就断开的连接不落库
+
+        await hub.heartbeat()
+        await hub.disconnect("c2")
+        await hub.sync_connections()
+
+        async with ws_sessions() as session:
+            rows = (await session.execute(select(WSConnection))).scalars().all()
+        assert {row.client_id: row.is_active for row in rows} == {"c1": True, "c2": False}
+        assert next(row for row in rows if row.client_id == "c1").agent_id == "a1"
+        await hub.disconnect("c1")
+
+
+@pytest.mark.unit
+class TestMetricsEndpoint:
+    """/ws/metrics 接口测试"""
+
+    def test_requires_authentication(self):
+        """测试未登录时拒绝访问连接指标"""
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        from backend.src.websocket.handlers import router
+
+        app = FastAPI()
+        app.include_router(router)
+        response = TestClient(app).get("/ws/metrics", params={"include_connections": True})
+        assert response.status_code == 401